@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import base64
+import json
+import os
+import socketserver
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from nacl.signing import SigningKey
+
+from agent_client import AgentClient, AgentUnavailable
+from crypto_utils import b64d, b64e, derive_user_id, signing_key_from_b64
+from flows import login_flow
+from storage import ensure_parent_dir, signing_key_from_file
+
+TOKEN_REFRESH_MARGIN = 30.0  # seconds before expiry at which a cached token is renewed
+
+
+def token_expiry(access_token: str, default_ttl: float) -> float:
+    """Epoch seconds at which the token expires: JWT `exp` if readable, else now + default_ttl."""
+    try:
+        payload_b64 = access_token.split(".")[1]
+        payload_b64 += "=" * (-len(payload_b64) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload_b64))
+        return float(claims["exp"])
+    except Exception:
+        return time.time() + default_ttl
+
+
+class SigningAgent:
+    """
+    Holds unlocked signing keys and their current tokens in memory so that
+    short-lived CLI commands can skip key loading and the login round-trips.
+    """
+
+    def __init__(self, token_ttl: float = 300.0, on_log: Optional[Callable[[str], None]] = None) -> None:
+        self._token_ttl = token_ttl
+        self._log = on_log or (lambda _: None)
+        self._keys: Dict[str, SigningKey] = {}
+        self._key_files: Dict[str, str] = {}  # resolved key file path -> userId
+        self._tokens: Dict[Tuple[str, str], Tuple[Dict[str, Any], float]] = {}  # (userId, baseUrl) -> (login output, expiry)
+        self._lock = threading.Lock()
+        self._login_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+    def add(self, key_file: Optional[str] = None, signing_key_b64: Optional[str] = None) -> str:
+        if key_file:
+            with self._lock:
+                if key_file in self._key_files:
+                    return self._key_files[key_file]
+            signing_key, _ = signing_key_from_file(Path(key_file))
+        elif signing_key_b64:
+            signing_key = signing_key_from_b64(signing_key_b64)
+        else:
+            raise ValueError("add needs keyFile or signingKeyB64")
+        user_id = derive_user_id(signing_key.verify_key.encode())
+        with self._lock:
+            self._keys[user_id] = signing_key
+            if key_file:
+                self._key_files[key_file] = user_id
+        self._log(f"added key userId={user_id}")
+        return user_id
+
+    def remove(self, user_id: str) -> None:
+        with self._lock:
+            self._keys.pop(user_id, None)
+            self._key_files = {k: v for k, v in self._key_files.items() if v != user_id}
+            self._tokens = {k: v for k, v in self._tokens.items() if k[0] != user_id}
+
+    def list(self) -> list:
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "userId": user_id,
+                    "keyFiles": [k for k, v in self._key_files.items() if v == user_id],
+                    "tokens": {base: round(exp - now) for (uid, base), (_, exp) in self._tokens.items() if uid == user_id},
+                }
+                for user_id in self._keys
+            ]
+
+    def _key(self, user_id: str) -> SigningKey:
+        with self._lock:
+            signing_key = self._keys.get(user_id)
+        if signing_key is None:
+            raise KeyError(f"no key loaded for userId {user_id}")
+        return signing_key
+
+    def sign(self, user_id: str, payload_b64: str) -> str:
+        return b64e(self._key(user_id).sign(b64d(payload_b64)).signature)
+
+    def login(self, base_url: str, key_file: Optional[str] = None, signing_key_b64: Optional[str] = None, refresh: bool = False) -> Dict[str, Any]:
+        user_id = self.add(key_file=key_file, signing_key_b64=signing_key_b64)
+        cache_key = (user_id, base_url)
+        with self._lock:
+            login_lock = self._login_locks.setdefault(cache_key, threading.Lock())
+        with login_lock:
+            with self._lock:
+                cached = self._tokens.get(cache_key)
+            if cached and not refresh and cached[1] - TOKEN_REFRESH_MARGIN > time.time():
+                return cached[0]
+            login_out = login_flow(base_url, self._key(user_id))
+            expiry = token_expiry(login_out["auth"]["accessToken"], self._token_ttl)
+            with self._lock:
+                self._tokens[cache_key] = (login_out, expiry)
+            self._log(f"logged in userId={user_id} baseUrl={base_url}")
+            return login_out
+
+    def handle(self, request: Dict[str, Any]) -> Any:
+        op = request.get("op")
+        if op == "add":
+            return self.add(request.get("keyFile"), request.get("signingKeyB64"))
+        if op == "list":
+            return self.list()
+        if op == "remove":
+            return self.remove(request["userId"])
+        if op == "sign":
+            return self.sign(request["userId"], request["payloadB64"])
+        if op == "login":
+            return self.login(request["baseUrl"], request.get("keyFile"), request.get("signingKeyB64"), bool(request.get("refresh")))
+        raise ValueError(f"unknown op: {op}")
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            return
+        server: "_AgentServer" = self.server  # type: ignore[assignment]
+        try:
+            request = json.loads(line)
+            if request.get("op") == "stop":
+                reply = {"ok": True, "result": None}
+                threading.Thread(target=server.shutdown, daemon=True).start()
+            else:
+                reply = {"ok": True, "result": server.agent.handle(request)}
+        except Exception as e:
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+class _AgentServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, agent: SigningAgent) -> None:
+        self.agent = agent
+        super().__init__(str(socket_path), _Handler)
+
+
+def run_agent(socket_path: Path, key_files=(), token_ttl: float = 300.0, debug: bool = False) -> int:
+    def log(msg: str):
+        if debug:
+            print(f"[agent] {msg}", flush=True)
+
+    agent = SigningAgent(token_ttl=token_ttl, on_log=log)
+    for key_file in key_files:
+        agent.add(key_file=str(Path(key_file).expanduser().resolve()))
+
+    ensure_parent_dir(socket_path)
+    if socket_path.exists():
+        try:
+            AgentClient(socket_path, timeout=2.0).list()
+        except AgentUnavailable:
+            socket_path.unlink()  # stale socket from a previous agent
+        else:
+            raise RuntimeError(f"an agent is already listening on {socket_path}")
+    old_umask = os.umask(0o177)  # socket is created 0600
+    try:
+        server = _AgentServer(socket_path, agent)
+    finally:
+        os.umask(old_umask)
+    print(f"agent listening on {socket_path}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        socket_path.unlink(missing_ok=True)
+    return 0
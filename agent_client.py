@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import json
+import socket
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Kept free of requests/PyNaCl imports: short-lived commands talk to the
+# agent precisely to avoid loading them.
+
+
+class AgentUnavailable(RuntimeError):
+    pass
+
+
+class AgentError(RuntimeError):
+    pass
+
+
+class AgentClient:
+    def __init__(self, socket_path: Path, timeout: float = 30.0) -> None:
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def call(self, op: str, **params: Any) -> Any:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.settimeout(self.timeout)
+                s.connect(str(self.socket_path))
+                s.sendall(json.dumps({"op": op, **params}).encode("utf-8") + b"\n")
+                with s.makefile("rb") as f:
+                    line = f.readline()
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise AgentUnavailable(f"no agent listening on {self.socket_path}") from e
+        except OSError as e:  # timed out, no permission on the socket, ...
+            raise AgentUnavailable(f"agent on {self.socket_path} unreachable: {e}") from e
+        if not line:
+            raise AgentUnavailable(f"agent on {self.socket_path} closed the connection")
+        try:
+            reply = json.loads(line)
+        except ValueError as e:
+            raise AgentUnavailable(f"agent on {self.socket_path} sent a malformed reply") from e
+        if not isinstance(reply, dict):
+            raise AgentUnavailable(f"agent on {self.socket_path} sent a malformed reply")
+        if not reply.get("ok"):
+            raise AgentError(reply.get("error", "agent request failed"))
+        return reply.get("result")
+
+    def add(self, key_file: Optional[Path] = None, signing_key_b64: Optional[str] = None) -> str:
+        return self.call("add", keyFile=str(key_file.expanduser().resolve()) if key_file else None, signingKeyB64=signing_key_b64)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return self.call("list")
+
+    def remove(self, user_id: str) -> None:
+        self.call("remove", userId=user_id)
+
+    def sign(self, user_id: str, payload_b64: str) -> str:
+        return self.call("sign", userId=user_id, payloadB64=payload_b64)
+
+    def login(self, base_url: str, key_file: Optional[Path] = None, signing_key_b64: Optional[str] = None, refresh: bool = False) -> Dict[str, Any]:
+        """Return login_flow-shaped output, served from the agent's token cache when possible."""
+        return self.call(
+            "login",
+            baseUrl=base_url,
+            keyFile=str(key_file.expanduser().resolve()) if key_file else None,
+            signingKeyB64=signing_key_b64,
+            refresh=refresh,
+        )
+
+    def stop(self) -> None:
+        self.call("stop")
+
+
+def agent_if_running(socket_path: Optional[Path]) -> Optional[AgentClient]:
+    if socket_path is None or not socket_path.exists():
+        return None
+    return AgentClient(socket_path)
@@ -1,43 +1,54 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import requests
 
+from transport import Transport, as_transport, get_default_transport
+
 
 @dataclass
 class MadelinClient:
     base_url: str
-    session: requests.Session = field(default_factory=requests.Session)
+    transport: Transport = field(default_factory=get_default_transport)
+    session: Optional[requests.Session] = None  # pre-Transport API; wrapped in a Transport of its own
+
+    def __post_init__(self) -> None:
+        self.transport = as_transport(self.session if self.session is not None else self.transport)
 
     def register(self, public_key_b64: str) -> Dict[str, Any]:
-        r = self.session.post(
+        r = self.transport.request(
+            "POST",
             f"{self.base_url}/auth/register",
             json={"publicKey": public_key_b64},
-            timeout=20,
+            endpoint="auth.register",
+            idempotent=True,
         )
         r.raise_for_status()
         return r.json()
 
     def create_challenge(self, public_key_b64: str) -> Dict[str, Any]:
-        r = self.session.post(
+        r = self.transport.request(
+            "POST",
             f"{self.base_url}/auth/challenge",
             json={"publicKey": public_key_b64},
-            timeout=20,
+            endpoint="auth.challenge",
+            idempotent=True,
         )
         r.raise_for_status()
         return r.json()
 
     def verify_challenge(self, public_key_b64: str, challenge_id: str, signature_b64: str) -> Dict[str, Any]:
-        r = self.session.post(
+        r = self.transport.request(
+            "POST",
             f"{self.base_url}/auth/verify",
             json={
                 "publicKey": public_key_b64,
                 "challengeId": challenge_id,
                 "signature": signature_b64,
             },
-            timeout=20,
+            endpoint="auth.verify",
         )
         r.raise_for_status()
         return r.json()
@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from crypto_utils import b64d, b64e, decode_aad_meta, encode_aad_meta
+from storage import load_cache, save_json_atomic
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+# Receivers refuse anything bigger, so a hostile sender can't make them seek terabytes into a sparse file.
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+MAX_ATTACHMENT_SIZE = 4 * 1024 * 1024 * 1024
+
+
+class AttachmentError(ValueError):
+    pass
+
+
+def parse_attachment_aad(aad: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Attachment chunks/manifests carry their routing data in `aad` metadata; plain messages don't."""
+    meta = decode_aad_meta(aad)
+    return meta if meta is not None and "att" in meta else None
+
+
+def _int_field(data: Dict[str, Any], key: str) -> int:
+    value = data.get(key)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise AttachmentError(f"{key!r} must be an integer, got {value!r}")
+    return value
+
+
+def _check_manifest(manifest: Any) -> Dict[str, Any]:
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("name"), str) or not isinstance(manifest.get("sha256"), str):
+        raise AttachmentError("malformed manifest")
+    if not 0 <= _int_field(manifest, "size") <= MAX_ATTACHMENT_SIZE or _int_field(manifest, "chunks") < 0:
+        raise AttachmentError(f"manifest out of range: size={manifest['size']} chunks={manifest['chunks']}")
+    return manifest
+
+
+def _message_id(attachment_id: str, part: str) -> str:
+    # Retried or resumed chunks of one send keep their id, so the server drops the duplicates.
+    return b64e(hashlib.sha256(f"{attachment_id}:{part}".encode()).digest()[:16])
+
+
+class _MappedFile:
+    """Read-only view of a file; mmap when possible so chunks are sliced, not read whole."""
+
+    def __init__(self, path: Path) -> None:
+        self._f = path.open("rb")
+        self.size = os.fstat(self._f.fileno()).st_size
+        self._map = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self._view = memoryview(self._map) if self._map is not None else None
+
+    def slices(self, chunk_size: int) -> Iterator[memoryview]:
+        for offset in range(0, self.size, chunk_size):
+            yield self.view(offset, chunk_size)
+
+    def view(self, offset: int, length: int) -> memoryview:
+        assert self._view is not None
+        return self._view[offset : offset + length]
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._view.release()
+            self._map.close()
+        self._f.close()
+
+
+def send_attachment(
+    path: Path,
+    push: Callable[[Dict[str, Any]], Any],
+    target: str,
+    ttl_seconds: int,
+    crypto_suite: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    concurrency: int = 4,
+    state_dir: Optional[Path] = None,
+    on_log: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Push `path` as fixed-size chunk messages (at most `concurrency` in flight)
+    followed by a manifest. Only one chunk per worker is held in memory.
+
+    Every send gets a fresh attachment id, so sending the same file again
+    delivers it again instead of being deduplicated by the server. The id
+    of an unfinished send is kept in `state_dir` (keyed by file hash,
+    `target` and chunk size), so re-running after a failure resumes it:
+    chunks already accepted are skipped and the manifest goes out once
+    every chunk is in. Resuming is the sender's job; receivers never ask
+    for missing chunks.
+    """
+    log = on_log or (lambda _: None)
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError(f"chunk size must be between 1 and {MAX_CHUNK_SIZE} bytes")
+    source = _MappedFile(path)
+    if source.size > MAX_ATTACHMENT_SIZE:
+        source.close()
+        raise ValueError(f"{path} is larger than the {MAX_ATTACHMENT_SIZE} bytes receivers accept")
+    try:
+        digest = hashlib.sha256()
+        for view in source.slices(chunk_size):
+            with view:
+                digest.update(view)
+        sha256 = digest.hexdigest()
+        send_key = hashlib.sha256(f"{target}:{sha256}:{chunk_size}".encode()).hexdigest()[:32]
+        total = -(-source.size // chunk_size)
+
+        state_path = state_dir / f"{send_key}.json" if state_dir else None
+        state = load_cache(state_path) if state_path else {}
+        # Older state files predate per-send ids and used the send key itself.
+        attachment_id = state.get("attachmentId") or (send_key if state else os.urandom(16).hex())
+        thread_id = b64e(bytes.fromhex(attachment_id)[:16])
+        sent = set(state.get("sent", []))
+        lock = threading.Lock()
+        missing = [seq for seq in range(total) if seq not in sent]
+        log(f"attachment {attachment_id}: {total} chunks, {len(missing)} to send")
+
+        def push_chunk(seq: int) -> Optional[str]:
+            with source.view(seq * chunk_size, chunk_size) as view:
+                ciphertext = b64e(view)
+            payload = {
+                "messageId": _message_id(attachment_id, str(seq)),
+                "threadId": thread_id,
+                "nonce": b64e(os.urandom(16)),
+                "ciphertext": ciphertext,
+                "aad": encode_aad_meta({"att": attachment_id, "seq": seq, "n": total, "cs": chunk_size}),
+                "cryptoSuite": crypto_suite,
+                "ttlSeconds": ttl_seconds,
+            }
+            try:
+                push(payload)
+            except Exception as e:
+                return repr(e)
+            with lock:
+                sent.add(seq)
+                if state_path:
+                    save_json_atomic(state_path, {"attachmentId": attachment_id, "sent": sorted(sent)})
+            return None
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            errors = list(pool.map(push_chunk, missing))
+    finally:
+        source.close()
+
+    failed = [seq for seq, error in zip(missing, errors) if error is not None]
+    result = {
+        "attachmentId": attachment_id,
+        "name": path.name,
+        "size": source.size,
+        "sha256": sha256,
+        "chunks": total,
+        "sent": len(missing) - len(failed),
+        "skipped": total - len(missing),
+        "failed": failed,
+    }
+    if failed:
+        log(f"attachment {attachment_id}: {len(failed)} chunks failed, first error {next(e for e in errors if e)}")
+        return result
+
+    manifest = {"name": path.name, "size": source.size, "sha256": sha256, "chunks": total, "chunkSize": chunk_size}
+    push(
+        {
+            "messageId": _message_id(attachment_id, "manifest"),
+            "threadId": thread_id,
+            "nonce": b64e(os.urandom(16)),
+            "ciphertext": b64e(json.dumps(manifest).encode("utf-8")),
+            "aad": encode_aad_meta({"att": attachment_id, "manifest": 1}),
+            "cryptoSuite": crypto_suite,
+            "ttlSeconds": ttl_seconds,
+        }
+    )
+    if state_path:
+        state_path.unlink(missing_ok=True)
+    return result
+
+
+def describe_attachment(info: Dict[str, Any]) -> str:
+    if "error" in info:
+        return f"[file] {info['name']} ({info['size']} bytes) rejected: {info['error']}"
+    return f"[file] {info['name']} ({info['size']} bytes) saved to {info['path']}"
+
+
+class AttachmentAssembler:
+    """
+    Writes incoming chunks straight to `<download_dir>/.partial/<id>.part` at
+    their offsets and tracks progress next to it, so memory stays at one pulled
+    page and partial downloads survive restarts. Missing chunks are only
+    reported (`pending()`), never requested; the sender resumes or resends.
+    Completed files are verified against the manifest hash and moved into
+    `download_dir`.
+    """
+
+    def __init__(self, download_dir: Path, on_log: Optional[Callable[[str], None]] = None) -> None:
+        self.download_dir = download_dir
+        self.partial_dir = download_dir / ".partial"
+        self.log = on_log or (lambda _: None)
+        self._lock = threading.Lock()
+
+    def absorb(self, items: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str], List[Dict[str, Any]]]:
+        """Consume attachment items; returns (other items, consumed ids, completed attachments)."""
+        rest: List[Dict[str, Any]] = []
+        consumed: List[str] = []
+        completed: List[Dict[str, Any]] = []
+        with self._lock:
+            for item in items:
+                meta = parse_attachment_aad(item.get("aad"))
+                if meta is None:
+                    rest.append(item)
+                    continue
+                # Malformed items are logged and acked anyway: one bad sender must not stall the mailbox.
+                try:
+                    done = self._store(meta, item)
+                except (ValueError, TypeError, KeyError) as e:
+                    self.log(f"attachment item {item.get('id')} from {item.get('senderUserId')} dropped: {e}")
+                    done = None
+                if item.get("id"):
+                    consumed.append(item["id"])
+                if done:
+                    completed.append(done)
+        return rest, consumed, completed
+
+    def _store(self, meta: Dict[str, Any], item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        attachment_id = meta["att"]
+        if not isinstance(attachment_id, str) or not attachment_id or not all(c in "0123456789abcdef" for c in attachment_id):
+            raise AttachmentError(f"bad attachment id {attachment_id!r}")  # never let it pick a path
+        self.partial_dir.mkdir(parents=True, exist_ok=True)
+        state_path = self.partial_dir / f"{attachment_id}.json"
+        part_path = self.partial_dir / f"{attachment_id}.part"
+        state = load_cache(state_path) or {"received": [], "sender": item.get("senderUserId")}
+        if "manifest" in meta:
+            state["manifest"] = _check_manifest(json.loads(b64d(item.get("ciphertext") or "")))
+        else:
+            seq, n, cs = _int_field(meta, "seq"), _int_field(meta, "n"), _int_field(meta, "cs")
+            if not 0 < cs <= MAX_CHUNK_SIZE or not 0 <= seq < n or seq * cs >= MAX_ATTACHMENT_SIZE:
+                raise AttachmentError(f"chunk out of range: seq={seq} n={n} cs={cs}")
+            if state.get("n", n) != n:
+                raise AttachmentError(f"chunk count changed from {state['n']} to {n}")
+            data = b64d(item.get("ciphertext") or "")
+            if len(data) > cs:
+                raise AttachmentError(f"chunk {seq} is {len(data)} bytes, over its {cs} byte chunk size")
+            state["n"] = n
+            with open(part_path, "r+b" if part_path.exists() else "w+b") as f:
+                f.seek(seq * cs)
+                f.write(data)
+            if seq not in state["received"]:
+                state["received"].append(seq)
+        manifest = state.get("manifest")
+        if manifest and len(state["received"]) >= manifest["chunks"]:
+            return self._finish(attachment_id, state, part_path, state_path)
+        save_json_atomic(state_path, state)
+        return None
+
+    def _finish(self, attachment_id: str, state: Dict[str, Any], part_path: Path, state_path: Path) -> Dict[str, Any]:
+        manifest = state["manifest"]
+        part_path.touch()
+        with open(part_path, "r+b") as f:
+            f.truncate(manifest["size"])
+        digest = hashlib.sha256()
+        with open(part_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        info = {"attachmentId": attachment_id, "name": manifest["name"], "size": manifest["size"], "sender": state.get("sender")}
+        if digest.hexdigest() != manifest["sha256"]:
+            # Keep nothing we can't trust; the sender can resend the whole file.
+            part_path.unlink(missing_ok=True)
+            state_path.unlink(missing_ok=True)
+            self.log(f"attachment {attachment_id}: checksum mismatch, discarded")
+            return {**info, "error": "checksum mismatch"}
+        name = Path(manifest["name"]).name or "attachment"
+        target = self.download_dir / name
+        stem, suffix, n = target.stem, target.suffix, 1
+        while target.exists():
+            target = self.download_dir / f"{stem} ({n}){suffix}"
+            n += 1
+        os.replace(part_path, target)
+        state_path.unlink(missing_ok=True)
+        return {**info, "path": str(target)}
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """Partially received attachments and the chunk numbers still missing."""
+        out = []
+        for state_path in sorted(self.partial_dir.glob("*.json")):
+            state = load_cache(state_path)
+            total = (state.get("manifest") or {}).get("chunks", state.get("n"))
+            missing = sorted(set(range(total)) - set(state.get("received", []))) if total is not None else None
+            out.append({"attachmentId": state_path.stem, "name": (state.get("manifest") or {}).get("name"), "missing": missing})
+        return out
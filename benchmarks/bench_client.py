@@ -0,0 +1,242 @@
+"""
+Client throughput/latency benchmarks against the local fake server.
+
+Measures login latency, push throughput, pull+ack drain throughput (using the
+same drain_pages/render path as the console receiver loops) for MailboxClient
+and GroupClient, and Socket.IO wake-up latency for RealtimeClient. Results are
+written to benchmarks/results/ and can be compared against a baseline:
+
+    python benchmarks/bench_client.py [--messages 2000] [--baseline benchmarks/results/<file>.json]
+
+Metrics ending in `_per_s` are better when higher, `_ms` when lower.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from nacl.signing import SigningKey  # noqa: E402
+
+from fake_server import FakeMadelinServer  # noqa: E402
+from flows import login_flow  # noqa: E402
+from group_client import GroupClient  # noqa: E402
+from messaging import MailboxClient, drain_pages, make_plaintext_payload, process_group_pull_items, process_pull_items  # noqa: E402
+from metrics import percentiles_ms  # noqa: E402
+from transport import Transport  # noqa: E402
+
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    pct = percentiles_ms(samples)
+    if not pct:
+        return {}
+    return {
+        "p50_ms": pct["p50Ms"],
+        "p95_ms": pct["p95Ms"],
+        "p99_ms": pct["p99Ms"],
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+    }
+
+
+def _timed(fn: Callable[[], Any]) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def _identity(base_url: str, transport: Transport) -> Dict[str, Any]:
+    signing_key = SigningKey.generate()
+    login_out = login_flow(base_url, signing_key, transport=transport)
+    return {"key": signing_key, "userId": login_out["keys"]["userId"], "token": login_out["auth"]["accessToken"]}
+
+
+def bench_login(base_url: str, transport: Transport, iterations: int) -> Dict[str, float]:
+    signing_key = SigningKey.generate()
+    login_flow(base_url, signing_key, transport=transport)  # warm connection + registration
+    samples = [_timed(lambda: login_flow(base_url, signing_key, transport=transport)) for _ in range(iterations)]
+    return _percentiles(samples)
+
+
+def _push_all(send: Callable[[int], Any], count: int, concurrency: int) -> float:
+    if concurrency <= 1:
+        return _timed(lambda: [send(i) for i in range(count)])
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return _timed(lambda: list(pool.map(send, range(count))))
+
+
+def _drain(pull, render, acks, stream: bool = False) -> int:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return drain_pages(pull, render, acks, stream=stream)
+
+
+def bench_direct(base_url: str, transport: Transport, messages: int, concurrency: int, limit: int, stream: bool = False) -> Dict[str, float]:
+    sender, receiver = _identity(base_url, transport), _identity(base_url, transport)
+    out_box = MailboxClient(base_url, sender["token"], transport=transport)
+    in_box = MailboxClient(base_url, receiver["token"], transport=transport)
+
+    def send(i: int) -> Any:
+        return out_box.push(receiver["userId"], make_plaintext_payload(f"message {i}", 0))
+
+    push_seq = _push_all(send, messages, 1)
+    push_par = _push_all(send, messages, concurrency)
+    t0 = time.perf_counter()
+    drained = _drain(
+        lambda cursor: (in_box.pull_stream if stream else in_box.pull)(cursor, limit),
+        process_pull_items,
+        [in_box.ack_delivered, in_box.ack_read, in_box.delete],
+        stream,
+    )
+    drain_s = time.perf_counter() - t0
+    return {
+        "push_per_s": round(messages / push_seq, 1),
+        f"push_c{concurrency}_per_s": round(messages / push_par, 1),
+        "drain_per_s": round(drained / drain_s, 1) if drain_s else 0.0,
+        "drained": drained,
+    }
+
+
+def bench_group(base_url: str, transport: Transport, messages: int, concurrency: int, limit: int, stream: bool = False) -> Dict[str, float]:
+    owner, member = _identity(base_url, transport), _identity(base_url, transport)
+    owner_gc = GroupClient(base_url, owner["token"], transport=transport)
+    member_gc = GroupClient(base_url, member["token"], transport=transport)
+    group_id = owner_gc.create_group("bench", [member["userId"]], True)["groupId"]
+
+    def send(i: int) -> Any:
+        payload = make_plaintext_payload(f"message {i}", 0)
+        payload["groupId"] = group_id
+        return owner_gc.group_push(payload)
+
+    push_seq = _push_all(send, messages, 1)
+    push_par = _push_all(send, messages, concurrency)
+    t0 = time.perf_counter()
+    drained = _drain(
+        lambda cursor: (member_gc.group_pull_stream if stream else member_gc.group_pull)(group_id, cursor, limit),
+        process_group_pull_items,
+        [member_gc.group_ack_delivered, member_gc.group_ack_read, member_gc.group_delete],
+        stream,
+    )
+    drain_s = time.perf_counter() - t0
+    return {
+        "push_per_s": round(messages / push_seq, 1),
+        f"push_c{concurrency}_per_s": round(messages / push_par, 1),
+        "drain_per_s": round(drained / drain_s, 1) if drain_s else 0.0,
+        "drained": drained,
+    }
+
+
+def bench_realtime(base_url: str, transport: Transport, iterations: int) -> Dict[str, float]:
+    from realtime import RealtimeClient
+
+    sender, receiver = _identity(base_url, transport), _identity(base_url, transport)
+    arrived = threading.Event()
+    rx = RealtimeClient(base_url, receiver["userId"], receiver["token"], on_direct=lambda _: arrived.set())
+    tx = RealtimeClient(base_url, sender["userId"], sender["token"], on_direct=lambda _: None)
+    rx.connect()
+    tx.connect()
+    time.sleep(0.5)  # let registration land
+    samples = []
+    try:
+        for i in range(iterations):
+            arrived.clear()
+            t0 = time.perf_counter()
+            tx.notify_send(receiver["userId"], {"messageId": str(i)})
+            if arrived.wait(timeout=5):
+                samples.append(time.perf_counter() - t0)
+    finally:
+        tx.close()
+        rx.close()
+    result = _percentiles(samples)
+    result["lost"] = iterations - len(samples)
+    return result
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for scenario, metrics in current["results"].items():
+        base_metrics = baseline.get("results", {}).get(scenario, {})
+        for name, value in metrics.items():
+            base = base_metrics.get(name)
+            if not isinstance(base, (int, float)) or not base:
+                continue
+            change = (value - base) / base
+            worse = change < -tolerance if name.endswith("_per_s") else change > tolerance if name.endswith("_ms") else False
+            marker = "REGRESSION" if worse else ""
+            print(f"{scenario:10} {name:18} {base:>12} -> {value:>12} ({change:+.1%}) {marker}")
+            if worse:
+                regressions.append(f"{scenario}.{name}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=50, help="Pull page size")
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--wakeups", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated server round trip in seconds (default: 0)")
+    parser.add_argument("--stream", action="store_true", help="Drain with streamed (item-by-item) pull parsing")
+    parser.add_argument("--no-realtime", action="store_true")
+    parser.add_argument("--output", type=Path, help="Result file (default: benchmarks/results/bench-<timestamp>.json)")
+    parser.add_argument("--baseline", type=Path, help="Compare against an earlier result file")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown before flagging (default: 0.15)")
+    args = parser.parse_args()
+
+    server = FakeMadelinServer(latency=args.latency)
+    base_url = server.start()
+    transport = Transport()
+    try:
+        results = {
+            "login": bench_login(base_url, transport, args.logins),
+            "direct": bench_direct(base_url, transport, args.messages, args.concurrency, args.limit, args.stream),
+            "group": bench_group(base_url, transport, args.messages, args.concurrency, args.limit, args.stream),
+        }
+        if not args.no_realtime:
+            results["realtime"] = bench_realtime(base_url, transport, args.wakeups)
+    finally:
+        transport.close()
+        server.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {k: str(v) for k, v in vars(args).items()},
+        },
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    for scenario, metrics in results.items():
+        print(f"{scenario:10} " + "  ".join(f"{k}={v}" for k, v in metrics.items()))
+    print("results written to", output)
+
+    if args.baseline:
+        regressions = compare(report, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        if regressions:
+            print("regressions:", ", ".join(regressions), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
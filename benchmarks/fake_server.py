@@ -0,0 +1,617 @@
+"""
+Local stand-in for the Madelin server, for benchmarks and manual testing.
+
+Implements /auth/*, /mailbox/*, /groups/*, /group-mailbox/* in memory, and the
+Socket.IO `app:user:register` / `app:user:send` relay (delivering `app:direct`
+and friends to the target user's room). HTTP/1.1 keep-alive is supported so
+connection pooling behaves like it would against the real server.
+
+    python benchmarks/fake_server.py [--port 8080] [--fail-rate 0.05] [--latency 0.03] [--rate-limit 50]
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from uuid import uuid4
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from nacl.exceptions import BadSignatureError  # noqa: E402
+from nacl.signing import VerifyKey  # noqa: E402
+
+from crypto_utils import b64d, b64e, build_payload, derive_user_id  # noqa: E402
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _make_token(user_id: str, ttl: float) -> str:
+    def part(obj: Dict[str, Any]) -> str:
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).decode().rstrip("=")
+
+    return ".".join([part({"alg": "none"}), part({"sub": user_id, "exp": int(time.time() + ttl), "jti": uuid4().hex}), "fake"])
+
+
+class Mailbox:
+    """Ordered per-owner queue with cursor pagination (cursor = base64 `ISO_DATE|id`)."""
+
+    def __init__(self) -> None:
+        self.items: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, item: Dict[str, Any]) -> None:
+        self.items[item["id"]] = item
+
+    def page(self, cursor: Optional[str], limit: int) -> Dict[str, Any]:
+        ids = list(self.items)
+        start = 0
+        if cursor:
+            try:
+                after_id = b64d(cursor).decode().split("|", 1)[1]
+                start = ids.index(after_id) + 1
+            except (ValueError, IndexError):
+                start = 0
+        page = [self.items[i] for i in ids[start:start + limit]]
+        next_cursor = None
+        if page and start + limit < len(ids):
+            last = page[-1]
+            next_cursor = b64e(f"{last['createdAt']}|{last['id']}".encode())
+        return {"items": page, "nextCursor": next_cursor}
+
+    def mark(self, ids: List[str], field: str) -> None:
+        now = _now_iso()
+        for i in ids:
+            if i in self.items:
+                self.items[i][field] = now
+
+    def delete(self, ids: List[str]) -> None:
+        for i in ids:
+            self.items.pop(i, None)
+
+
+class FakeState:
+    def __init__(self, token_ttl: float) -> None:
+        self.token_ttl = token_ttl
+        self.lock = threading.RLock()
+        self.challenges: Dict[str, Tuple[str, str, bytes]] = {}  # id -> (userId, publicKey, nonce)
+        self.users: Dict[str, str] = {}  # userId -> publicKey
+        self.tokens: Dict[str, str] = {}  # token -> userId
+        self.mailboxes: Dict[str, Mailbox] = {}
+        self.group_mailboxes: Dict[Tuple[str, str], Mailbox] = {}  # (groupId, userId)
+        self.groups: Dict[str, Dict[str, Any]] = {}
+        self.seen_messages: Dict[Tuple[str, str], Dict[str, Any]] = {}  # (senderUserId, messageId) -> stored copy
+        self.counters: Dict[str, int] = {}
+        self.removals: Dict[str, List[Tuple[str, str]]] = {}  # userId -> [(removedAt, groupId)] for updatedSince
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    # auth
+    def register(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        pk_b64 = body["publicKey"]
+        user_id = derive_user_id(b64d(pk_b64))
+        with self.lock:
+            self.users[user_id] = pk_b64
+        return {"userId": user_id}
+
+    def challenge(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        pk_b64 = body["publicKey"]
+        user_id = derive_user_id(b64d(pk_b64))
+        nonce = uuid4().bytes + uuid4().bytes
+        challenge_id = uuid4().hex
+        with self.lock:
+            if user_id not in self.users:
+                raise HttpError(404, "unknown public key")
+            self.challenges[challenge_id] = (user_id, pk_b64, nonce)
+        return {"userId": user_id, "challengeId": challenge_id, "nonce": b64e(nonce)}
+
+    def verify(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            entry = self.challenges.pop(body["challengeId"], None)
+        if entry is None or entry[1] != body["publicKey"]:
+            raise HttpError(400, "unknown challenge")
+        user_id, pk_b64, nonce = entry
+        try:
+            VerifyKey(b64d(pk_b64)).verify(build_payload(user_id, body["challengeId"], nonce), b64d(body["signature"]))
+        except BadSignatureError:
+            raise HttpError(401, "bad signature")
+        token = _make_token(user_id, self.token_ttl)
+        with self.lock:
+            self.tokens[token] = user_id
+        return {"accessToken": token, "tokenType": "Bearer", "expiresIn": int(self.token_ttl)}
+
+    def authenticate(self, authorization: Optional[str]) -> str:
+        token = (authorization or "").removeprefix("Bearer ").strip()
+        with self.lock:
+            user_id = self.tokens.get(token)
+        if user_id is None:
+            raise HttpError(401, "invalid token")
+        try:
+            exp = json.loads(base64.urlsafe_b64decode(token.split(".")[1] + "=="))["exp"]
+        except Exception:
+            exp = 0
+        if exp < time.time():
+            raise HttpError(401, "token expired")
+        return user_id
+
+    # messages
+    def _store_item(self, sender: str, body: Dict[str, Any], extra: Dict[str, Any]) -> Dict[str, Any]:
+        item = {
+            "id": uuid4().hex,
+            "senderUserId": sender,
+            "messageId": body.get("messageId"),
+            "threadId": body.get("threadId"),
+            "nonce": body.get("nonce"),
+            "ciphertext": body.get("ciphertext"),
+            "aad": body.get("aad", ""),
+            "cryptoSuite": body.get("cryptoSuite", 0),
+            "ttlSeconds": body.get("ttlSeconds", 0),
+            "createdAt": _now_iso(),
+            **extra,
+        }
+        return item
+
+    def push(self, sender: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        recipient = body.get("recipientUserId")
+        if not recipient:
+            raise HttpError(400, "recipientUserId required")
+        key = (sender, body.get("messageId") or uuid4().hex)
+        with self.lock:
+            if key in self.seen_messages:  # idempotent resend
+                return {"id": self.seen_messages[key]["id"], "duplicate": True}
+            item = self._store_item(sender, body, {"recipientUserId": recipient})
+            self.mailboxes.setdefault(recipient, Mailbox()).add(item)
+            self.seen_messages[key] = item
+        return {"id": item["id"]}
+
+    def group_push(self, sender: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        group_id = body.get("groupId")
+        key = (sender, body.get("messageId") or uuid4().hex)
+        with self.lock:
+            group = self._group(group_id)
+            if sender not in group["members"]:
+                raise HttpError(403, "not a member")
+            if key in self.seen_messages:
+                return {"id": self.seen_messages[key]["id"], "duplicate": True}
+            item = self._store_item(sender, body, {"groupId": group_id})
+            for member in group["members"]:
+                if member != sender:
+                    self.group_mailboxes.setdefault((group_id, member), Mailbox()).add(dict(item))
+            self.seen_messages[key] = item
+        return {"id": item["id"]}
+
+    # groups
+    def _group(self, group_id: Optional[str]) -> Dict[str, Any]:
+        group = self.groups.get(group_id or "")
+        if group is None:
+            raise HttpError(404, "group not found")
+        return group
+
+    @staticmethod
+    def _group_view(group: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "groupId": group["groupId"],
+            "name": group["name"],
+            "ownerUserId": group["ownerUserId"],
+            "isOpen": group["isOpen"],
+            "memberCount": len(group["members"]),
+            "createdAt": group["createdAt"],
+            "updatedAt": group["updatedAt"],
+        }
+
+    def create_group(self, owner: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        now = _now_iso()
+        group = {
+            "groupId": uuid4().hex,
+            "name": body.get("name") or "",
+            "ownerUserId": owner,
+            "isOpen": bool(body.get("isOpen", False)),
+            "members": {owner, *(body.get("memberUserIds") or [])},
+            "pending": set(),
+            "createdAt": now,
+            "updatedAt": now,
+        }
+        with self.lock:
+            self.groups[group["groupId"]] = group
+        return self._group_view(group)
+
+    def mine(self, user_id: str, query: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Groups owned/joined, paged by `cursor`/`limit`; `updatedSince` returns only changes plus removals."""
+        query = query or {}
+        since = query.get("updatedSince")
+        with self.lock:
+            mine = sorted(
+                (g for g in self.groups.values() if user_id in g["members"]),
+                key=lambda g: g["groupId"],
+            )
+            if since:
+                mine = [g for g in mine if g["updatedAt"] >= since]
+            removed = sorted({gid for ts, gid in self.removals.get(user_id, []) if ts >= since}) if since else []
+            start = int(query.get("cursor") or 0)
+            limit = int(query.get("limit") or len(mine) or 1)
+            page = mine[start : start + limit]
+            out: Dict[str, Any] = {
+                "owned": [self._group_view(g) for g in page if g["ownerUserId"] == user_id],
+                "memberOf": [self._group_view(g) for g in page if g["ownerUserId"] != user_id],
+                "nextCursor": str(start + limit) if start + limit < len(mine) else None,
+                "serverTime": _now_iso(),
+            }
+        if since:
+            out["updatedSince"] = since
+            out["removed"] = removed
+        return out
+
+    def members(self, user_id: str, group_id: Optional[str], query: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        query = query or {}
+        with self.lock:
+            group = self._group(group_id)
+            if user_id not in group["members"]:
+                raise HttpError(403, "not a member")
+            members = sorted(group["members"])
+            start = int(query.get("cursor") or 0)
+            limit = int(query.get("limit") or len(members) or 1)
+            out = {
+                "groupId": group["groupId"],
+                "members": members[start : start + limit],
+                "nextCursor": str(start + limit) if start + limit < len(members) else None,
+            }
+            if group["ownerUserId"] == user_id and start == 0:
+                out["pending"] = sorted(group["pending"])
+        return out
+
+    def etag(self, user_id: str, name: str, group_id: Optional[str]) -> str:
+        """Validator over the full (unpaged) resource, so any page-1 request can be revalidated."""
+        with self.lock:
+            if name == "mine":
+                view = sorted((g["groupId"], g["updatedAt"]) for g in self.groups.values() if user_id in g["members"])
+            else:
+                group = self._group(group_id)
+                view = [sorted(group["members"]), sorted(group["pending"]) if group["ownerUserId"] == user_id else []]
+        return '"' + hashlib.sha1(json.dumps(view).encode()).hexdigest()[:20] + '"'
+
+    def group_action(self, user_id: str, group_id: str, action: str, target: Optional[str] = None) -> Dict[str, Any]:
+        with self.lock:
+            group = self._group(group_id)
+            if action == "join":
+                (group["members"] if group["isOpen"] else group["pending"]).add(user_id)
+                status = "member" if user_id in group["members"] else "pending"
+            elif action in {"accept", "reject"}:
+                if group["ownerUserId"] != user_id:
+                    raise HttpError(403, "owner only")
+                if target not in group["pending"]:
+                    raise HttpError(404, "no pending request")
+                group["pending"].discard(target)
+                if action == "accept":
+                    group["members"].add(target)
+                status = "accepted" if action == "accept" else "rejected"
+            elif action == "leave":
+                group["members"].discard(user_id)
+                self.removals.setdefault(user_id, []).append((_now_iso(), group_id))
+                status = "left"
+            elif action == "delete":
+                if group["ownerUserId"] != user_id:
+                    raise HttpError(403, "owner only")
+                del self.groups[group_id]
+                for member in group["members"]:
+                    self.removals.setdefault(member, []).append((_now_iso(), group_id))
+                return {"deleted": group_id}
+            else:
+                raise HttpError(404, "unknown action")
+            group["updatedAt"] = _now_iso()
+        return {"groupId": group_id, "status": status}
+
+
+_ROUTES = [
+    ("GET", re.compile(r"^/groups/mine$"), "mine"),
+    ("GET", re.compile(r"^/groups/members$"), "members"),
+    ("POST", re.compile(r"^/groups$"), "create_group"),
+    ("DELETE", re.compile(r"^/groups/(?P<group_id>[^/]+)$"), "delete_group"),
+    ("POST", re.compile(r"^/groups/(?P<group_id>[^/]+)/(?P<action>join|leave)$"), "group_self"),
+    ("POST", re.compile(r"^/groups/(?P<group_id>[^/]+)/requests/(?P<target>[^/]+)/(?P<action>accept|reject)$"), "group_admin"),
+]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    server: "FakeMadelinServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode("utf-8") if status != 304 else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self) -> None:
+        url = urlsplit(self.path)
+        if url.path.startswith("/socket.io/") and self.server.sio_app is not None:
+            self._run_wsgi(self.server.sio_app)
+            return
+        raw = self._read_body()
+        state = self.server.state
+        state.count(f"{self.command} {url.path}")
+        try:
+            if self.server.latency:
+                time.sleep(self.server.latency)  # stand-in for a WAN round trip
+            if self.server.fail_rate and random.random() < self.server.fail_rate:
+                raise HttpError(502, "injected failure")
+            retry_after = self.server.throttle(self.headers.get("Authorization") or self.client_address[0])
+            if retry_after is not None:
+                state.count("429")
+                self._send_json(429, {"error": "rate limited"}, {"Retry-After": str(retry_after)})
+                return
+            body = json.loads(raw) if raw else {}
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            headers: Dict[str, str] = {}
+            if self.command == "GET" and url.path in {"/groups/mine", "/groups/members"} and not query.get("cursor"):
+                user_id = state.authenticate(self.headers.get("Authorization"))
+                headers["ETag"] = state.etag(user_id, url.path.rsplit("/", 1)[-1], query.get("groupId"))
+                if self.headers.get("If-None-Match") == headers["ETag"]:
+                    self._send_json(304, None, headers)
+                    return
+            result = self._route(self.command, url.path, body, query)
+        except HttpError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except (KeyError, ValueError) as e:
+            self._send_json(400, {"error": f"bad request: {e}"})
+        else:
+            self._send_json(200, result, headers)
+
+    def _route(self, method: str, path: str, body: Dict[str, Any], query: Dict[str, str]) -> Any:
+        state = self.server.state
+        if method == "POST" and path == "/auth/register":
+            return state.register(body)
+        if method == "POST" and path == "/auth/challenge":
+            return state.challenge(body)
+        if method == "POST" and path == "/auth/verify":
+            return state.verify(body)
+
+        user_id = state.authenticate(self.headers.get("Authorization"))
+        limit = int(query.get("limit") or 50)
+        if path.startswith("/mailbox/"):
+            with state.lock:
+                box = state.mailboxes.setdefault(user_id, Mailbox())
+                if method == "GET" and path == "/mailbox/pull":
+                    return box.page(query.get("cursor"), limit)
+                if path == "/mailbox/ack/delivered":
+                    return box.mark(body["ids"], "deliveredAt") or {"ok": True}
+                if path == "/mailbox/ack/read":
+                    return box.mark(body["ids"], "readAt") or {"ok": True}
+                if path == "/mailbox/delete":
+                    return box.delete(body["ids"]) or {"ok": True}
+            if path == "/mailbox/push":
+                return state.push(user_id, body)
+            if path == "/mailbox/push-batch" and self.server.batch:
+                return {"items": [state.push(user_id, item) for item in body["items"]]}
+            raise HttpError(404, "not found")
+        if path.startswith("/group-mailbox/"):
+            if path == "/group-mailbox/push":
+                return state.group_push(user_id, body)
+            if path == "/group-mailbox/push-batch" and self.server.batch:
+                return {"items": [state.group_push(user_id, item) for item in body["items"]]}
+            with state.lock:
+                if method == "GET" and path == "/group-mailbox/pull":
+                    group_id = query.get("groupId") or ""
+                    state._group(group_id)
+                    return state.group_mailboxes.setdefault((group_id, user_id), Mailbox()).page(query.get("cursor"), limit)
+                if path not in {"/group-mailbox/ack/delivered", "/group-mailbox/ack/read", "/group-mailbox/delete"}:
+                    raise HttpError(404, "not found")
+                boxes = [b for (g, u), b in state.group_mailboxes.items() if u == user_id]
+                for box in boxes:
+                    if path == "/group-mailbox/ack/delivered":
+                        box.mark(body["ids"], "deliveredAt")
+                    elif path == "/group-mailbox/ack/read":
+                        box.mark(body["ids"], "readAt")
+                    else:
+                        box.delete(body["ids"])
+                return {"ok": True}
+        for route_method, pattern, name in _ROUTES:
+            m = pattern.match(path)
+            if route_method != method or not m:
+                continue
+            params = m.groupdict()
+            if name == "mine":
+                return state.mine(user_id, query)
+            if name == "members":
+                return state.members(user_id, query.get("groupId"), query)
+            if name == "create_group":
+                return state.create_group(user_id, body)
+            if name == "delete_group":
+                return state.group_action(user_id, params["group_id"], "delete")
+            if name == "group_self":
+                return state.group_action(user_id, params["group_id"], params["action"])
+            return state.group_action(user_id, params["group_id"], params["action"], params["target"])
+        raise HttpError(404, "not found")
+
+    def _run_wsgi(self, app: Any) -> None:
+        """Minimal WSGI bridge so python-socketio can share this HTTP/1.1 server."""
+        url = urlsplit(self.path)
+        body = self._read_body()
+        environ = {
+            "REQUEST_METHOD": self.command,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": url.path,
+            "QUERY_STRING": url.query,
+            "CONTENT_TYPE": self.headers.get("Content-Type", ""),
+            "CONTENT_LENGTH": str(len(body)),
+            "SERVER_NAME": self.server.server_address[0],
+            "SERVER_PORT": str(self.server.server_address[1]),
+            "SERVER_PROTOCOL": self.request_version,
+            "REMOTE_ADDR": self.client_address[0],
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+            "gunicorn.socket": self.connection,  # lets simple-websocket take over for upgrades
+        }
+        for key, value in self.headers.items():
+            name = "HTTP_" + key.upper().replace("-", "_")
+            if name not in ("HTTP_CONTENT_TYPE", "HTTP_CONTENT_LENGTH"):
+                environ[name] = value
+        response: Dict[str, Any] = {}
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info: Any = None):
+            response["status"], response["headers"] = status, headers
+            return lambda data: None
+
+        try:
+            chunks = app(environ, start_response)
+            payload = b"".join(chunks)
+        except StopIteration:
+            # engine.io signals the end of a websocket session this way
+            self.close_connection = True
+            return
+        code, _, reason = response["status"].partition(" ")
+        self.send_response(int(code), reason)
+        for key, value in response["headers"]:
+            if key.lower() != "content-length":
+                self.send_header(key, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_DELETE = _dispatch
+
+
+def _build_socketio(state: FakeState) -> Any:
+    try:
+        import socketio  # type: ignore
+    except ImportError:  # pragma: no cover - dependency notice
+        return None
+    sio = socketio.Server(async_mode="threading", cors_allowed_origins="*")
+
+    @sio.event
+    def connect(sid, environ, auth=None):  # type: ignore
+        token = (auth or {}).get("token") if isinstance(auth, dict) else None
+        try:
+            state.authenticate(f"Bearer {token or ''}")
+        except HttpError:
+            return False
+        return True
+
+    @sio.on("app:user:register")
+    def _register(sid, data):  # type: ignore
+        sio.enter_room(sid, data.get("userId"))
+
+    @sio.on("app:user:send")
+    def _send(sid, data):  # type: ignore
+        sio.emit(data.get("event", "app:direct"), data.get("data"), room=data.get("toUserId"))
+
+    return socketio.WSGIApp(sio, socketio_path="socket.io")
+
+
+class FakeMadelinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        token_ttl: float = 3600.0,
+        fail_rate: float = 0.0,
+        verbose: bool = False,
+        latency: float = 0.0,
+        batch: bool = True,
+        rate_limit: int = 0,
+    ) -> None:
+        self.state = FakeState(token_ttl)
+        self.batch = batch
+        self.rate_limit = rate_limit
+        self._windows: Dict[str, List[float]] = {}  # caller -> [window start, requests in window]
+        self._windows_lock = threading.Lock()
+        self.fail_rate = fail_rate
+        self.latency = latency
+        self.verbose = verbose
+        self.sio_app = _build_socketio(self.state)
+        self._thread: Optional[threading.Thread] = None
+        super().__init__((host, port), _Handler)
+
+    def throttle(self, caller: str) -> Optional[int]:
+        """Fixed one-second window per caller; returns Retry-After seconds once it is used up."""
+        if not self.rate_limit:
+            return None
+        now = time.monotonic()
+        with self._windows_lock:
+            window = self._windows.setdefault(caller, [now, 0])
+            if now - window[0] >= 1.0:
+                window[0], window[1] = now, 0
+            window[1] += 1
+            if window[1] <= self.rate_limit:
+                return None
+            return max(1, math.ceil(window[0] + 1.0 - now))
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--token-ttl", type=float, default=3600.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of REST calls answered with 502")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every REST response (simulated RTT)")
+    parser.add_argument("--no-batch", action="store_true", help="Answer the push-batch endpoints with 404, like older servers")
+    parser.add_argument("--rate-limit", type=int, default=0, help="REST calls allowed per second per token before answering 429")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    server = FakeMadelinServer(
+        args.host, args.port, args.token_ttl, args.fail_rate, args.verbose, args.latency, not args.no_batch, args.rate_limit
+    )
+    print(f"fake Madelin server on {server.base_url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
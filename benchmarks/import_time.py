@@ -0,0 +1,108 @@
+"""
+CLI startup benchmark.
+
+Runs each command shape in a fresh interpreter, reports the median wall time
+and fails (exit 1) when a command imports modules it should not need or
+exceeds its time budget. Run from the repo root:
+
+    python benchmarks/import_time.py [--runs 7] [--json]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ["requests", "urllib3", "socketio", "engineio", "nacl", "mnemonic"]
+
+# name -> (argv, modules that must stay unloaded, budget in seconds)
+CASES = {
+    "init": (["init", "--base-url", "http://127.0.0.1:1", "--config-file", "{tmp}/config.json"], HEAVY_MODULES, 0.25),
+    "help": (["--help"], HEAVY_MODULES, 0.15),
+    "mailbox --help": (["mailbox", "--help"], HEAVY_MODULES, 0.15),
+    "group --help": (["group", "--help"], HEAVY_MODULES, 0.15),
+    "groupchat --help": (["groupchat", "--help"], HEAVY_MODULES, 0.15),
+}
+
+_PROBE = """
+import contextlib, io, json, sys, time
+t0 = time.perf_counter()
+import main
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        main.main({argv!r})
+    except SystemExit:
+        pass
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"elapsed": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def run_case(argv: List[str], runs: int) -> Dict[str, object]:
+    wall: List[float] = []
+    inproc: List[float] = []
+    modules: List[str] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        argv = [a.replace("{tmp}", tmp) for a in argv]
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            out = subprocess.run(
+                [sys.executable, "-c", _PROBE.format(argv=argv)],
+                cwd=ROOT,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            wall.append(time.perf_counter() - t0)
+            data = json.loads(out.stdout.strip().splitlines()[-1])
+            inproc.append(data["elapsed"])
+            modules = data["modules"]
+    return {
+        "wall_median": statistics.median(wall),
+        "import_median": statistics.median(inproc),
+        "modules": modules,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--json", action="store_true", dest="as_json")
+    args = parser.parse_args()
+
+    report = {}
+    failures = []
+    for name, (argv, forbidden, budget) in CASES.items():
+        res = run_case(argv, args.runs)
+        loaded = [m for m in forbidden if m in res["modules"]]
+        report[name] = {
+            "wall_median_s": round(res["wall_median"], 4),
+            "in_process_median_s": round(res["import_median"], 4),
+            "budget_s": budget,
+            "unexpected_modules": loaded,
+        }
+        if loaded:
+            failures.append(f"{name}: imported {', '.join(loaded)}")
+        if res["import_median"] > budget:
+            failures.append(f"{name}: {res['import_median']:.3f}s over budget {budget:.3f}s")
+
+    if args.as_json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name, row in report.items():
+            print(f"{name:20} wall={row['wall_median_s']:.3f}s in-process={row['in_process_median_s']:.3f}s budget={row['budget_s']:.2f}s")
+    for f in failures:
+        print("FAIL", f, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,7 +4,7 @@ import argparse
 from pathlib import Path
 from typing import Optional, Sequence
 
-from settings import DEFAULT_CONFIG_PATH, DEFAULT_KEY_PATH
+from settings import DEFAULT_AGENT_SOCKET, DEFAULT_CACHE_DIR, DEFAULT_CONFIG_PATH, DEFAULT_DOWNLOAD_DIR, DEFAULT_KEY_PATH, DEFAULT_OUTBOX_DIR, DEFAULT_POOL_SIZE, DEFAULT_STATS_PATH
 
 
 def parse_args(argv: Optional[Sequence[str]]) -> argparse.Namespace:
@@ -13,7 +13,7 @@ def parse_args(argv: Optional[Sequence[str]]) -> argparse.Namespace:
     login_parent = argparse.ArgumentParser(add_help=False)
     login_parent.add_argument(
         "--base-url",
-        help="Base URL for the Madelin API. If omitted, uses config file from `init`.",
+        help="Base URL for the Madelin API; comma-separate replicas to fail over between. If omitted, uses config file from `init`.",
     )
     login_parent.add_argument(
         "--key-file",
@@ -28,11 +28,65 @@ def parse_args(argv: Optional[Sequence[str]]) -> argparse.Namespace:
         help=f"Path to store/load config (default: {DEFAULT_CONFIG_PATH})",
     )
     login_parent.add_argument("--signing-key-b64", help="Base64-encoded 32-byte Ed25519 seed")
+    login_parent.add_argument(
+        "--agent-socket",
+        type=Path,
+        default=DEFAULT_AGENT_SOCKET,
+        help=f"Signing agent socket; used for login when present (default: {DEFAULT_AGENT_SOCKET})",
+    )
+    login_parent.add_argument("--no-agent", action="store_true", help="Ignore a running signing agent")
+    login_parent.add_argument(
+        "--pool-size",
+        type=int,
+        default=DEFAULT_POOL_SIZE,
+        help=f"HTTP connections kept per host (default: {DEFAULT_POOL_SIZE})",
+    )
+    login_parent.add_argument("--no-keep-alive", action="store_true", help="Close HTTP connections after each request")
+    login_parent.add_argument(
+        "--compact",
+        action="store_true",
+        help="Offer MessagePack bodies for pull/push (falls back to JSON; needs 'msgpack')",
+    )
+    login_parent.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on 127.0.0.1:<port>/metrics")
+    login_parent.add_argument("--metrics-json", type=Path, help="Write collected metrics as JSON to this file on exit")
+    login_parent.add_argument("--trace", type=Path, help="Record timed spans and write a Chrome trace JSON here on exit")
+    login_parent.add_argument("--profile", type=Path, help="Run the command under cProfile (all threads) and write pstats here")
+    login_parent.add_argument("--connect-timeout", type=float, help="HTTP connect timeout in seconds for every endpoint (read timeouts keep their per-endpoint defaults)")
+    login_parent.add_argument("--read-timeout", type=float, help="HTTP read timeout in seconds for every endpoint (connect timeouts keep their per-endpoint defaults)")
+    login_parent.add_argument("--max-attempts", type=int, default=3, help="Attempts for idempotent requests such as pull/ack/delete (default: 3)")
+    login_parent.add_argument(
+        "--rate-limit",
+        type=float,
+        help="Starting requests/s per endpoint; adapts to 429s either way (default: unlimited until throttled)",
+    )
+    login_parent.add_argument("--rate-burst", type=float, default=10.0, help="Requests allowed back-to-back under --rate-limit (default: 10)")
+
+    attach_parent = argparse.ArgumentParser(add_help=False)
+    attach_parent.add_argument(
+        "--download-dir",
+        type=Path,
+        default=DEFAULT_DOWNLOAD_DIR,
+        help=f"Where received attachments are reassembled (default: {DEFAULT_DOWNLOAD_DIR})",
+    )
+    attach_parent.add_argument("--chunk-size", type=int, default=256 * 1024, help="Attachment chunk size in bytes (default: 262144)")
+
+    stats_parent = argparse.ArgumentParser(add_help=False)
+    stats_parent.add_argument(
+        "--stats-file",
+        type=Path,
+        default=DEFAULT_STATS_PATH,
+        help=f"Delivery-latency samples kept across sessions (default: {DEFAULT_STATS_PATH})",
+    )
 
     sub = parser.add_subparsers(dest="command", required=True)
 
     init_cmd = sub.add_parser("init", help="Set and store the base URL securely")
-    init_cmd.add_argument("--base-url", required=True, help="Base URL for the Madelin API")
+    init_cmd.add_argument(
+        "--base-url",
+        required=True,
+        action="append",
+        help="Base URL for the Madelin API; repeat (or comma-separate) to list replicas, primary first",
+    )
     init_cmd.add_argument(
         "--config-file",
         type=Path,
@@ -55,12 +109,26 @@ def parse_args(argv: Optional[Sequence[str]]) -> argparse.Namespace:
         action="store_true",
         help="Persist mnemonic alongside keys (default: do not store mnemonic)",
     )
+    register_cmd.add_argument(
+        "--count",
+        type=int,
+        default=1,
+        help="Provision N identities in bulk (keys written to --key-dir; mnemonic options not allowed)",
+    )
+    register_cmd.add_argument(
+        "--key-dir",
+        type=Path,
+        default=DEFAULT_KEY_PATH.parent / "bulk",
+        help=f"Directory for bulk key files (default: {DEFAULT_KEY_PATH.parent / 'bulk'})",
+    )
+    register_cmd.add_argument("--processes", type=int, help="Worker processes for bulk key derivation (default: CPU count)")
+    register_cmd.add_argument("--concurrency", type=int, default=16, help="Parallel register requests in bulk mode (default: 16)")
     register_cmd.add_argument("--json", action="store_true", dest="as_json", help="Print full JSON output")
 
     login_cmd = sub.add_parser("login", parents=[login_parent], help="Login using saved or provided signing key")
     login_cmd.add_argument("--json", action="store_true", dest="as_json", help="Print full JSON output")
 
-    mailbox_cmd = sub.add_parser("mailbox", parents=[login_parent], help="Interactive mailbox sender/receiver")
+    mailbox_cmd = sub.add_parser("mailbox", parents=[login_parent, attach_parent, stats_parent], help="Interactive mailbox sender/receiver")
     mailbox_cmd.add_argument("--user-id", help="Override self userId (otherwise derived from key/login)")
     mailbox_cmd.add_argument("--to-user-id", help="Recipient userId to send messages to")
     mailbox_cmd.add_argument("--limit", type=int, default=50, help="Pull page size (default: 50)")
@@ -68,18 +136,38 @@ def parse_args(argv: Optional[Sequence[str]]) -> argparse.Namespace:
     mailbox_cmd.add_argument("--ttl-seconds", type=int, default=3600, help="TTL for pushed messages (default: 3600)")
     mailbox_cmd.add_argument("--crypto-suite", type=int, default=0, help="Crypto suite id (default: 0)")
     mailbox_cmd.add_argument("--no-socket", action="store_true", help="Disable Socket.IO realtime notifications")
+    mailbox_cmd.add_argument("--ui", action="store_true", help="Full-screen terminal UI: scrollback, status bar and a separate input line")
+    mailbox_cmd.add_argument("--coalesce-ms", type=float, default=50.0, help="Batch messages typed/pasted within this window into one request (0 = off, default: 50)")
+    mailbox_cmd.add_argument("--measure-latency", action="store_true", help="Stamp sent messages with the send time so receivers can measure delivery latency")
+    mailbox_cmd.add_argument("--stream", action="store_true", help="Parse pulled pages item by item as they download (bounds memory for big pages)")
     mailbox_cmd.add_argument("--debug", action="store_true", help="Log requests/responses for debugging")
+    mailbox_cmd.add_argument(
+        "--outbox-dir",
+        type=Path,
+        default=DEFAULT_OUTBOX_DIR,
+        help=f"Spool directory for unsent messages (default: {DEFAULT_OUTBOX_DIR})",
+    )
+
+    cache_parent = argparse.ArgumentParser(add_help=False)
+    cache_parent.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=DEFAULT_CACHE_DIR,
+        help=f"Local group/member directory (default: {DEFAULT_CACHE_DIR})",
+    )
+    cache_parent.add_argument("--cache-max-age", type=float, default=60.0, help="Serve cached listings younger than this many seconds (default: 60)")
+    cache_parent.add_argument("--refresh", action="store_true", help="Revalidate cached listings with the server now")
 
     group_cmd = sub.add_parser("group", parents=[login_parent], help="Group management and group mailbox")
     group_cmd.add_argument("--json", action="store_true", dest="as_json", help="Print full JSON output")
     group_sub = group_cmd.add_subparsers(dest="group_action", required=True)
 
-    group_list = group_sub.add_parser("list", parents=[login_parent], help="List groups")
-    group_list_mine = group_sub.add_parser("list-mine", parents=[login_parent], help="List groups you own or are member of")
-    group_list_members = group_sub.add_parser("members", parents=[login_parent], help="List members of a group")
+    group_list = group_sub.add_parser("list", parents=[login_parent, cache_parent], help="List groups")
+    group_list_mine = group_sub.add_parser("list-mine", parents=[login_parent, cache_parent], help="List groups you own or are member of")
+    group_list_members = group_sub.add_parser("members", parents=[login_parent, cache_parent], help="List members of a group")
     group_list_members.add_argument("group_id")
 
-    group_create = group_sub.add_parser("create", parents=[login_parent], help="Create group")
+    group_create = group_sub.add_parser("create", parents=[login_parent, cache_parent], help="Create group")
     group_create.add_argument("--name", help="Group name")
     group_create.add_argument("--member", action="append", dest="members", help="Member userId (repeatable)")
     group_create.add_argument(
@@ -91,40 +179,102 @@ def parse_args(argv: Optional[Sequence[str]]) -> argparse.Namespace:
         help="Create group as open (omit flag to leave as default/closed)",
     )
 
-    group_delete = group_sub.add_parser("delete", parents=[login_parent], help="Delete group")
+    group_delete = group_sub.add_parser("delete", parents=[login_parent, cache_parent], help="Delete group")
     group_delete.add_argument("group_id")
 
-    group_join = group_sub.add_parser("join", parents=[login_parent], help="Request to join group")
-    group_join.add_argument("group_id")
+    bulk_parent = argparse.ArgumentParser(add_help=False)
+    bulk_parent.add_argument("--concurrency", type=int, default=8, help="Parallel requests for bulk operations (default: 8)")
 
-    group_accept = group_sub.add_parser("accept", parents=[login_parent], help="Accept pending user (admin)")
-    group_accept.add_argument("group_id")
-    group_accept.add_argument("user_id")
+    group_join = group_sub.add_parser("join", parents=[login_parent, cache_parent, bulk_parent], help="Request to join group")
+    join_target = group_join.add_mutually_exclusive_group(required=True)
+    join_target.add_argument("group_id", nargs="?")
+    join_target.add_argument("--groups-file", type=Path, help="Join every groupId listed in this file (one per line)")
 
-    group_reject = group_sub.add_parser("reject", parents=[login_parent], help="Reject pending user (admin)")
-    group_reject.add_argument("group_id")
-    group_reject.add_argument("user_id")
+    group_accept = group_sub.add_parser("accept", parents=[login_parent, cache_parent, bulk_parent], help="Accept pending user (admin)")
+    group_reject = group_sub.add_parser("reject", parents=[login_parent, cache_parent, bulk_parent], help="Reject pending user (admin)")
+    for admin_cmd in (group_accept, group_reject):
+        admin_cmd.add_argument("group_id")
+        admin_target = admin_cmd.add_mutually_exclusive_group(required=True)
+        admin_target.add_argument("user_id", nargs="?")
+        admin_target.add_argument("--users-file", type=Path, help="Apply to every userId listed in this file (one per line)")
+        admin_target.add_argument("--all-pending", action="store_true", help="Apply to every pending join request")
 
-    group_leave = group_sub.add_parser("leave", parents=[login_parent], help="Leave group")
+    group_leave = group_sub.add_parser("leave", parents=[login_parent, cache_parent], help="Leave group")
     group_leave.add_argument("group_id")
 
-    group_push = group_sub.add_parser("push", parents=[login_parent], help="Send message to group mailbox")
+    group_push = group_sub.add_parser("push", parents=[login_parent, attach_parent], help="Send message to group mailbox")
     group_push.add_argument("group_id")
-    group_push.add_argument("--text", required=True, help="Plaintext to send (demo)")
+    push_body = group_push.add_mutually_exclusive_group(required=True)
+    push_body.add_argument("--text", help="Plaintext to send (demo)")
+    push_body.add_argument("--file", type=Path, help="Send a file as chunked attachment messages (re-run after a failure to send only the missing chunks)")
+    group_push.add_argument("--concurrency", type=int, default=4, help="Chunks pushed in parallel (default: 4)")
+    group_push.add_argument(
+        "--outbox-dir",
+        type=Path,
+        default=DEFAULT_OUTBOX_DIR,
+        help=f"Where unfinished attachment sends are tracked so a re-run can finish them (default: {DEFAULT_OUTBOX_DIR})",
+    )
     group_push.add_argument("--crypto-suite", type=int, default=0, help="Crypto suite id")
+    group_push.add_argument("--measure-latency", action="store_true", help="Stamp sent messages with the send time so receivers can measure delivery latency")
     group_push.add_argument("--ttl-seconds", type=int, default=0, help="TTL for message (0 = no expiry)")
 
-    group_pull = group_sub.add_parser("pull", parents=[login_parent], help="Pull messages from group mailbox")
+    group_pull = group_sub.add_parser("pull", parents=[login_parent, attach_parent, stats_parent], help="Pull messages from group mailbox")
     group_pull.add_argument("group_id")
     group_pull.add_argument("--cursor", help="Cursor for pagination")
     group_pull.add_argument("--limit", type=int, default=50, help="Page size (default: 50)")
 
-    group_chat = sub.add_parser("groupchat", parents=[login_parent], help="Interactive group mailbox chat")
+    group_chat = sub.add_parser("groupchat", parents=[login_parent, attach_parent, stats_parent], help="Interactive group mailbox chat")
     group_chat.add_argument("--group-id", help="Group ID to chat in (prompt if omitted)")
     group_chat.add_argument("--limit", type=int, default=50, help="Pull page size (default: 50)")
     group_chat.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between polls (default: 2)")
     group_chat.add_argument("--ttl-seconds", type=int, default=0, help="TTL for pushed messages (0 = no expiry)")
     group_chat.add_argument("--crypto-suite", type=int, default=1, help="Crypto suite id (default: 1)")
+    group_chat.add_argument("--ui", action="store_true", help="Full-screen terminal UI: scrollback, status bar and a separate input line")
+    group_chat.add_argument("--coalesce-ms", type=float, default=50.0, help="Batch messages typed/pasted within this window into one request (0 = off, default: 50)")
+    group_chat.add_argument("--measure-latency", action="store_true", help="Stamp sent messages with the send time so receivers can measure delivery latency")
+    group_chat.add_argument("--stream", action="store_true", help="Parse pulled pages item by item as they download (bounds memory for big pages)")
     group_chat.add_argument("--debug", action="store_true", help="Log requests/responses for debugging")
+    group_chat.add_argument(
+        "--outbox-dir",
+        type=Path,
+        default=DEFAULT_OUTBOX_DIR,
+        help=f"Spool directory for unsent messages (default: {DEFAULT_OUTBOX_DIR})",
+    )
+
+    loadgen_cmd = sub.add_parser("loadgen", parents=[login_parent], help="Drive a server with simulated users and report throughput")
+    loadgen_cmd.add_argument("--users", type=int, default=10, help="Simulated identities (default: 10)")
+    loadgen_cmd.add_argument("--groups", type=int, default=2, help="Open groups to spread users over (default: 2)")
+    loadgen_cmd.add_argument("--rate", type=float, default=20.0, help="Messages pushed per second, all users combined (default: 20)")
+    loadgen_cmd.add_argument("--duration", type=float, default=30.0, help="Seconds to generate traffic (default: 30)")
+    loadgen_cmd.add_argument("--workers", type=int, default=32, help="Concurrent requests in flight (default: 32)")
+    loadgen_cmd.add_argument("--group-ratio", type=float, default=0.5, help="Share of messages sent to groups (default: 0.5)")
+    loadgen_cmd.add_argument("--drain-interval", type=float, default=1.0, help="Seconds between mailbox drains per user (default: 1)")
+    loadgen_cmd.add_argument("--limit", type=int, default=50, help="Pull page size (default: 50)")
+    loadgen_cmd.add_argument("--key-dir", type=Path, help="Reuse identities from `register --count` (index.json) instead of throwaway keys")
+    loadgen_cmd.add_argument(
+        "--sockets",
+        action="store_true",
+        help="Hold a websocket per user on one asyncio loop and measure app:direct wake-ups (needs aiohttp)",
+    )
+    loadgen_cmd.add_argument("--json", action="store_true", dest="as_json", help="Print full JSON output")
+
+    endpoints_cmd = sub.add_parser("endpoints", parents=[login_parent], help="Probe the configured replicas and show their ranking")
+    endpoints_cmd.add_argument("--json", action="store_true", dest="as_json", help="Print full JSON output")
+
+    stats_cmd = sub.add_parser("stats", parents=[stats_parent], help="Show delivery latency measured by earlier sessions")
+    stats_cmd.add_argument("--reset", action="store_true", help="Delete the collected samples")
+    stats_cmd.add_argument("--json", action="store_true", dest="as_json", help="Print full JSON output")
+
+    agent_cmd = sub.add_parser("agent", parents=[login_parent], help="Resident signing agent holding keys and tokens")
+    agent_cmd.add_argument("--json", action="store_true", dest="as_json", help="Print full JSON output")
+    agent_sub = agent_cmd.add_subparsers(dest="agent_action", required=True)
+    agent_start = agent_sub.add_parser("start", parents=[login_parent], help="Run the agent (foreground unless --detach)")
+    agent_start.add_argument("--add-key", action="append", type=Path, default=[], dest="add_keys", help="Key file to load at start (repeatable)")
+    agent_start.add_argument("--token-ttl", type=float, default=300.0, help="Token lifetime when the JWT has no exp (default: 300)")
+    agent_start.add_argument("--detach", action="store_true", help="Start in the background and return once listening")
+    agent_start.add_argument("--debug", action="store_true", help="Log agent activity")
+    agent_sub.add_parser("stop", parents=[login_parent], help="Stop the running agent")
+    agent_sub.add_parser("add", parents=[login_parent], help="Load --key-file (or --signing-key-b64) into the agent")
+    agent_sub.add_parser("list", parents=[login_parent], help="List identities held by the agent")
 
     return parser.parse_args(argv)
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import codecs
+import json
+import re
+import threading
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+import requests
+
+from crypto_utils import b64e
+
+JSON_TYPE = "application/json"
+MSGPACK_TYPE = "application/msgpack"
+
+# Message fields that are base64 strings in JSON and raw bytes in MessagePack.
+BINARY_FIELDS = ("messageId", "threadId", "nonce", "ciphertext", "aad")
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_STRUCTURAL = re.compile(r'[{}\[\]"]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r"[,}\]\s]")
+
+
+def get_msgpack():
+    try:
+        import msgpack  # type: ignore
+    except ImportError as exc:  # pragma: no cover - dependency notice
+        raise RuntimeError("Dependency missing: install 'msgpack' for --compact") from exc
+    return msgpack
+
+
+def _to_wire(item: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(item)
+    for key in BINARY_FIELDS:
+        value = out.get(key)
+        if isinstance(value, str) and value:
+            out[key] = _wire_bytes(value)
+    return out
+
+
+def _wire_bytes(value: str) -> Any:
+    """Raw bytes for canonical base64; anything else (e.g. bare JSON aad) is sent as the string it is."""
+    try:
+        raw = base64.b64decode(value.encode("ascii"), validate=True)
+    except (binascii.Error, UnicodeError):
+        return value
+    return raw if b64e(raw) == value else value
+
+
+def _from_wire(item: Any) -> Any:
+    if not isinstance(item, dict):
+        return item
+    for key in BINARY_FIELDS:
+        value = item.get(key)
+        if isinstance(value, (bytes, bytearray)):
+            item[key] = b64e(bytes(value))
+    return item
+
+
+class _JsonItemStream:
+    """
+    Incremental reader for `{"items": [...], ...}` bodies: yields each element
+    of `field` as soon as its closing brace has arrived, and collects the other
+    top-level keys into `meta`. Only the current element is ever buffered;
+    long strings (ciphertext) are skipped with one regex search per chunk.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], field: str = "items") -> None:
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self.field = field
+        self.meta: Dict[str, Any] = {}
+
+    def _fill(self) -> bool:
+        """Append the next piece of input; False once the body is exhausted."""
+        if self._eof:
+            return False
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                self._buf += text
+                return True
+        self._eof = True
+        self._buf += self._decoder.decode(b"", final=True)
+        return False
+
+    def _peek(self) -> str:
+        """Next non-whitespace character (not consumed); '' at end of input."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _take(self, expected: str) -> str:
+        c = self._peek()
+        if c not in expected or not c:
+            raise ValueError(f"malformed JSON stream: expected one of {expected!r}, got {c!r}")
+        self._pos += 1
+        return c
+
+    def _value_end(self) -> int:
+        """Index just past the JSON value starting at `_pos`, reading more input as needed."""
+        buf_start = self._pos
+        first = self._buf[buf_start]
+        if first not in '{["':
+            while True:
+                m = _SCALAR_END.search(self._buf, buf_start)
+                if m is not None:
+                    return m.start()
+                if not self._fill():
+                    return len(self._buf)
+        depth, in_string, i = 0, False, buf_start
+        while True:
+            if in_string:
+                m = _STRING_SPECIAL.search(self._buf, i)
+                if m is not None and m.group() == "\\" and m.end() < len(self._buf):
+                    i = m.end() + 1
+                    continue
+                if m is not None and m.group() == '"':
+                    in_string, i = False, m.end()
+                    if depth == 0:
+                        return i
+                    continue
+                if m is not None:
+                    i = m.start()  # backslash at the end of the buffer: wait for the escaped char
+                else:
+                    i = len(self._buf)
+            else:
+                m = _STRUCTURAL.search(self._buf, i)
+                if m is not None:
+                    c, i = m.group(), m.end()
+                    if c == '"':
+                        in_string = True
+                    elif c in "{[":
+                        depth += 1
+                    else:
+                        depth -= 1
+                        if depth == 0:
+                            return i
+                    continue
+                i = len(self._buf)
+            if not self._fill():
+                raise ValueError("malformed JSON stream: truncated value")
+
+    def _value(self) -> Any:
+        if not self._peek():
+            raise ValueError("malformed JSON stream: truncated body")
+        self._buf, self._pos = self._buf[self._pos :], 0  # drop what has been consumed
+        end = self._value_end()
+        value = json.loads(self._buf[:end])
+        self._pos = end
+        return value
+
+    def __iter__(self) -> Iterator[Any]:
+        self._take("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._value()
+            self._take(":")
+            if key == self.field and self._peek() == "[":
+                self._pos += 1
+                if self._peek() == "]":
+                    self._pos += 1
+                else:
+                    while True:
+                        yield self._value()
+                        if self._take(",]") == "]":
+                            break
+            else:
+                self.meta[key] = self._value()
+            if self._take(",}") == "}":
+                return
+
+
+class StreamedPage:
+    """
+    A pull response consumed while it downloads. Iterating yields items one
+    at a time and closes the response at the end; the other top-level fields
+    (`nextCursor`, ...) are complete once iteration has finished.
+    """
+
+    def __init__(self, r: requests.Response, items: Iterator[Any], meta: Dict[str, Any]) -> None:
+        self._r = r
+        self._items = items
+        self.meta = meta
+        self.count = 0
+
+    def __iter__(self) -> Iterator[Any]:
+        try:
+            for item in self._items:
+                self.count += 1
+                yield item
+        finally:
+            self._r.close()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.meta.get(key, default)
+
+    def close(self) -> None:
+        self._r.close()
+
+    def __enter__(self) -> "StreamedPage":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class PayloadCodec:
+    """
+    Negotiates the body encoding for pull/push.
+
+    With `compact` on, requests advertise MessagePack; once the server answers
+    in MessagePack, push bodies are sent that way too (binary fields as raw
+    bytes). A 415 reply switches the host back to JSON. Decoded bodies always
+    look like today's JSON (base64 strings), so callers are unaffected.
+    """
+
+    def __init__(self, compact: bool = False) -> None:
+        self.compact = compact
+        self._msgpack = get_msgpack() if compact else None
+        self._server_msgpack: Dict[str, Optional[bool]] = {}
+        self._lock = threading.Lock()
+
+    def accept_header(self) -> str:
+        if self._msgpack is None:
+            return JSON_TYPE
+        return f"{MSGPACK_TYPE}, {JSON_TYPE};q=0.9"
+
+    def uses_msgpack(self, host: str) -> bool:
+        with self._lock:
+            return self._msgpack is not None and bool(self._server_msgpack.get(host))
+
+    def mark(self, host: str, supported: bool) -> None:
+        with self._lock:
+            self._server_msgpack[host] = supported
+
+    def encode(self, host: str, body: Any) -> Dict[str, Any]:
+        """Return request kwargs carrying `body` in the negotiated encoding."""
+        if not self.uses_msgpack(host):
+            return {"json": body}
+        if isinstance(body, dict):
+            wire: Any = _to_wire(body)
+        elif isinstance(body, list):
+            wire = [_to_wire(b) if isinstance(b, dict) else b for b in body]
+        else:
+            wire = body
+        return {"data": self._msgpack.packb(wire, use_bin_type=True), "headers": {"Content-Type": MSGPACK_TYPE}}
+
+    def observe(self, host: str, r: requests.Response) -> None:
+        if self._msgpack is None:
+            return
+        content_type = r.headers.get("Content-Type", "")
+        if content_type.startswith(MSGPACK_TYPE):
+            self.mark(host, True)
+
+    def decode(self, r: requests.Response) -> Any:
+        content_type = r.headers.get("Content-Type", "")
+        if self._msgpack is not None and content_type.startswith(MSGPACK_TYPE):
+            data = self._msgpack.unpackb(r.content, raw=False)
+            if isinstance(data, dict) and isinstance(data.get("items"), list):
+                data["items"] = [_from_wire(item) for item in data["items"]]
+                return data
+            return _from_wire(data)
+        return r.json()
+
+    def decode_stream(self, r: requests.Response, field: str = "items", chunk_size: int = STREAM_CHUNK_SIZE) -> StreamedPage:
+        """Like `decode`, but JSON bodies are parsed item by item (request with `stream=True`)."""
+        content_type = r.headers.get("Content-Type", "")
+        if self._msgpack is not None and content_type.startswith(MSGPACK_TYPE):
+            data = self.decode(r)  # MessagePack has no incremental path here; already compact on the wire
+            return StreamedPage(r, iter(data.pop(field, None) or []), data)
+        reader = _JsonItemStream(r.iter_content(chunk_size), field)
+        return StreamedPage(r, iter(reader), reader.meta)
@@ -2,18 +2,26 @@ from __future__ import annotations
 
 import os
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
+from endpoints import split_base_urls
 from storage import load_config
 
 
-def resolve_base_url(arg_base_url: Optional[str], config_path: Path) -> str:
+def resolve_base_urls(arg_base_url: Optional[str], config_path: Path) -> List[str]:
+    """Every configured replica, primary first; `--base-url`/MADELIN_BASE_URL may be comma-separated."""
     if arg_base_url:
-        return arg_base_url
+        return split_base_urls(arg_base_url)
     cfg = load_config(config_path)
+    if cfg.get("base_urls"):
+        return list(cfg["base_urls"])
     if "base_url" in cfg:
-        return cfg["base_url"]
+        return [cfg["base_url"]]
     env_base = os.environ.get("MADELIN_BASE_URL")
     if env_base:
-        return env_base
+        return split_base_urls(env_base)
     raise RuntimeError("Base URL not configured. Run `python3 main.py init --base-url <url>` first.")
+
+
+def resolve_base_url(arg_base_url: Optional[str], config_path: Path) -> str:
+    return resolve_base_urls(arg_base_url, config_path)[0]
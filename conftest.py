@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterator
+
+import pytest
+
+from benchmarks.fake_server import FakeMadelinServer
+
+
+@pytest.fixture
+def fake_server() -> Iterator[FakeMadelinServer]:
+    """In-memory stand-in for the API (benchmarks/fake_server.py) on a free local port."""
+    server = FakeMadelinServer()
+    server.start()
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+@pytest.fixture
+def make_user(fake_server: FakeMadelinServer) -> Callable[[], Dict[str, Any]]:
+    """Registers and logs in a fresh identity; returns {"userId", "token", "signingKey"}."""
+    from nacl.signing import SigningKey
+
+    from flows import login_flow
+
+    def make() -> Dict[str, Any]:
+        key = SigningKey.generate()
+        out = login_flow(fake_server.base_url, key)
+        return {"userId": out["keys"]["userId"], "token": out["auth"]["accessToken"], "signingKey": key}
+
+    return make
@@ -1,15 +1,24 @@
 from __future__ import annotations
 
 import threading
-from typing import Optional
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
 
 import requests
 
+from attachments import DEFAULT_CHUNK_SIZE, AttachmentAssembler, describe_attachment, send_attachment
 from crypto_utils import derive_user_id, signing_key_from_b64
+from delivery import DeliveryStats, format_summary
 from flows import login_flow
-from messaging import MailboxClient, make_plaintext_payload, process_pull_items
+from messaging import MailboxClient, drain_pages, make_plaintext_payload, process_pull_items
+from metrics import AUTH_REFRESHES, MESSAGES_SENT
+from outbox import Outbox
 from realtime import RealtimeClient
+from settings import DEFAULT_DOWNLOAD_DIR, DEFAULT_OUTBOX_DIR, DEFAULT_STATS_PATH
 from storage import signing_key_from_file
+from tracing import span
+from transport import get_default_transport
+from tui import ChatScreen
 
 
 def _load_signing_key(signing_key_b64: Optional[str], key_file):
@@ -30,6 +39,15 @@ def run_mailbox_console(
     use_socket: bool,
     signing_key_b64: Optional[str],
     debug: bool = False,
+    outbox_dir: Path = DEFAULT_OUTBOX_DIR,
+    download_dir: Path = DEFAULT_DOWNLOAD_DIR,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ui: bool = False,
+    coalesce_window: float = 0.05,
+    stream: bool = False,
+    measure_latency: bool = False,
+    stats_path: Path = DEFAULT_STATS_PATH,
+    relogin: Optional[Callable[[], Dict[str, Any]]] = None,
 ) -> int:
     signing_key, material = _load_signing_key(signing_key_b64=signing_key_b64, key_file=key_file)
     login_out = login_flow(base_url, signing_key)
@@ -46,91 +64,224 @@ def run_mailbox_console(
 
     prompt_text = f"{user_id}> "
 
+    screen = ChatScreen(f"mailbox {user_id} -> {to_user_id}", prompt_text) if ui else None
+
+    def say(msg: str):
+        if screen:
+            screen.append(msg)
+        else:
+            print(msg)
+
     def log(msg: str):
         if debug:
-            print(f"[debug] {msg}")
+            say(f"[debug] {msg}")
 
     log(f"base_url={base_url} user_id={user_id} to_user_id={to_user_id} key_file={key_file}")
 
-    mailbox = MailboxClient(base_url, token)
+    transport = get_default_transport()
+    mailbox = MailboxClient(base_url, token, transport=transport)
     trigger = threading.Event()
     trigger.set()  # initial pull to catch backlog
+    socket_woke = threading.Event()  # tells delivery stats which pulls a realtime event caused
+    delivery = DeliveryStats()
+    wake = {"trigger": "poll"}
     stop = threading.Event()
+    auth_lock = threading.Lock()
     rt_client = None
 
     def on_direct(data):
         log(f"app:direct payload={data}")
+        socket_woke.set()
         trigger.set()
 
-    def refresh_auth():
+    def refresh_auth(stale_token: str):
         nonlocal token, mailbox, rt_client
-        login_data = login_flow(base_url, signing_key)
-        token = login_data["auth"]["accessToken"]
-        mailbox.token = token
-        log("Refreshed auth token after 401")
-        if rt_client:
+        with auth_lock, span("refresh_auth"):
+            if token != stale_token:
+                return  # another thread already refreshed
+            # Through the agent when there is one, so it drops the token the server just refused.
+            login_data = relogin() if relogin else login_flow(base_url, signing_key)
+            token = login_data["auth"]["accessToken"]
+            mailbox.token = token
+            AUTH_REFRESHES.inc()
+            log("Refreshed auth token after 401")
+            if rt_client:
+                rt_client.close()
+                rt_client = RealtimeClient(transport.resolve(base_url), user_id, token, on_direct=on_direct, on_log=log)
+                rt_client.connect()
+
+    def reconnect_socket():
+        nonlocal rt_client
+        with auth_lock:
+            if rt_client is None or stop.is_set():
+                return
             rt_client.close()
-            rt_client = RealtimeClient(base_url, user_id, token, on_direct=on_direct, on_log=log)
-            rt_client.connect()
+            rt_client = RealtimeClient(transport.resolve(base_url), user_id, token, on_direct=on_direct, on_log=log)
+            try:
+                rt_client.connect()
+            except Exception as e:
+                log(f"socket reconnect failed: {e!r}")  # the next 401 refresh_auth reconnects with a fresh token
+        trigger.set()  # pick up anything the old replica's socket didn't announce
+
+    def on_endpoint_switch(old: str, new: str):
+        log(f"API replica {old} -> {new}")
+        # Called from whichever request noticed; don't make it wait for a socket handshake.
+        threading.Thread(target=reconnect_socket, daemon=True).start()
 
     def call_with_reauth(fn, *args, **kwargs):
-        try:
-            log(f"Calling {fn.__name__} args={args} kwargs={kwargs}")
-            return fn(*args, **kwargs)
-        except requests.HTTPError as e:
-            if e.response is not None and e.response.status_code == 401:
-                refresh_auth()
-                log(f"Retrying {fn.__name__} after 401")
+        used_token = token
+        with span(f"call {fn.__name__}"):
+            try:
+                log(f"Calling {fn.__name__} args={args} kwargs={kwargs}")
                 return fn(*args, **kwargs)
-            raise
+            except requests.HTTPError as e:
+                if e.response is not None and e.response.status_code == 401:
+                    refresh_auth(used_token)
+                    log(f"Retrying {fn.__name__} after 401")
+                    return fn(*args, **kwargs)
+                raise
 
     if use_socket:
         rt_client = RealtimeClient(
-            base_url,
+            transport.resolve(base_url),
             user_id,
             token,
             on_direct=on_direct,
             on_log=log,
         )
         rt_client.connect()
+        if transport.endpoints is not None:
+            transport.endpoints.on_switch(on_endpoint_switch)
+
+    assembler = AttachmentAssembler(download_dir, on_log=log)
+
+    emit = (lambda sender, text: screen.append(text, sender)) if screen else None
+
+    def render(items):
+        delivery.record(items, "direct", wake["trigger"], lambda item: item.get("senderUserId"))
+        rest, ids, completed = assembler.absorb(items)
+        for info in completed:
+            if screen:
+                screen.append(describe_attachment(info), info["sender"])
+            else:
+                print(f"\n{info['sender']}> {describe_attachment(info)}")
+        return ids + process_pull_items(rest, emit=emit)
+
+    pull = mailbox.pull_stream if stream else mailbox.pull
+
+    def drain():
+        drain_pages(
+            lambda cursor: call_with_reauth(pull, cursor=cursor, limit=limit),
+            render,
+            [
+                lambda ids: call_with_reauth(mailbox.ack_delivered, ids),
+                lambda ids: call_with_reauth(mailbox.ack_read, ids),
+                lambda ids: call_with_reauth(mailbox.delete, ids),
+            ],
+            should_stop=stop.is_set,
+            on_log=log,
+            kind="direct",
+            stream=stream,
+        )
 
     def receiver_loop():
         while not stop.is_set():
             trigger.wait()  # block until notified
             trigger.clear()
-            cursor = None
-            while not stop.is_set():
-                pulled = call_with_reauth(mailbox.pull, cursor=cursor, limit=limit)
-                items = pulled.get("items", [])
-                log(f"pulled {len(items)} items cursor={cursor} next={pulled.get('nextCursor')}")
-                ids = process_pull_items(items)
-                if ids:
-                    call_with_reauth(mailbox.ack_delivered, ids)
-                    call_with_reauth(mailbox.ack_read, ids)
-                    call_with_reauth(mailbox.delete, ids)
-
-                cursor = pulled.get("nextCursor")
-                if not cursor or not items:
-                    break
+            wake["trigger"] = "socket" if socket_woke.is_set() else "poll"
+            socket_woke.clear()
+            try:
+                with span("receive_cycle"):
+                    drain()
+            except Exception as e:
+                # keep the receiver alive; try again after poll_interval
+                log(f"receive failed: {e!r}")
+                stop.wait(poll_interval)
+                trigger.set()
+
+    def send_entry(entry):
+        call_with_reauth(mailbox.push, recipient_user_id=entry["recipientUserId"], payload=entry["payload"])
+
+    def on_sent(entry):
+        MESSAGES_SENT.inc(kind="direct")
+        payload = entry["payload"]
+        log(f"pushed messageId={payload['messageId']} threadId={payload['threadId']}")
+        if rt_client:
+            rt_client.notify_send(entry["recipientUserId"], {"messageId": payload["messageId"], "threadId": payload["threadId"]})
+
+    def send_entries(entries):
+        call_with_reauth(mailbox.push_many, [(entry["recipientUserId"], entry["payload"]) for entry in entries], ordered=True)
+
+    outbox = Outbox(
+        outbox_dir / user_id / "direct",
+        send=send_entry,
+        on_sent=on_sent,
+        on_log=log,
+        send_many=send_entries if coalesce_window > 0 else None,
+        coalesce_window=coalesce_window,
+    )
+    outbox.start()
+
+    def send_file(path: Path):
+        try:
+            result = send_attachment(
+                path,
+                lambda payload: call_with_reauth(mailbox.push, recipient_user_id=to_user_id, payload=payload),
+                target=to_user_id,
+                ttl_seconds=ttl_seconds,
+                crypto_suite=crypto_suite,
+                chunk_size=chunk_size,
+                state_dir=outbox_dir / user_id / "attachments",
+                on_log=log,
+            )
+        except OSError as e:
+            say(f"cannot send {path}: {e}")
+            return
+        if result["failed"]:
+            say(f"{path.name}: {len(result['failed'])}/{result['chunks']} chunks failed; /send again to resume")
+            return
+        MESSAGES_SENT.inc(kind="direct")
+        say(f"sent {path.name} ({result['size']} bytes, {result['chunks']} chunks)")
+        if rt_client:
+            rt_client.notify_send(to_user_id, {"attachmentId": result["attachmentId"]})
 
     receiver = threading.Thread(target=receiver_loop, daemon=True)
     receiver.start()
 
+    def handle_line(text: str) -> bool:
+        if text.lower() in {"exit", "quit"}:
+            return False
+        if text == "/stats":
+            for line in format_summary(delivery.summary()):
+                say(line)
+            return True
+        if text.startswith("/send "):
+            path = Path(text[len("/send "):].strip()).expanduser()
+            if screen:
+                threading.Thread(target=send_file, args=(path,), daemon=True).start()  # keep the UI responsive
+            else:
+                send_file(path)
+        elif text:
+            payload = make_plaintext_payload(text, ttl_seconds, crypto_suite=crypto_suite, stamp=measure_latency)
+            outbox.enqueue({"recipientUserId": to_user_id, "payload": payload})
+            if screen:
+                screen.append(text, user_id)
+        return True
+
     try:
-        while True:
-            text = input(prompt_text).strip()
-            if text.lower() in {"exit", "quit"}:
-                break
-            if text:
-                payload = make_plaintext_payload(text, ttl_seconds, crypto_suite=crypto_suite)
-                call_with_reauth(mailbox.push, recipient_user_id=to_user_id, payload=payload)
-                log(f"pushed messageId={payload['messageId']} threadId={payload['threadId']}")
-                if rt_client:
-                    rt_client.notify_send(to_user_id, {"messageId": payload["messageId"], "threadId": payload["threadId"]})
+        if screen:
+            screen.run(handle_line)
+        else:
+            while handle_line(input(prompt_text).strip()):
+                pass
     finally:
+        outbox.flush(timeout=5)
+        outbox.stop()
         stop.set()
         trigger.set()
         receiver.join(timeout=2)
+        if delivery.summary():
+            delivery.save(stats_path)
         if rt_client:
             rt_client.close()
 
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import base64
+import binascii
 import hashlib
-from typing import Optional, Tuple
+import json
+from typing import Any, Dict, Optional, Tuple
 
 import base58
 from nacl.signing import SigningKey
@@ -18,6 +20,23 @@ def b64d(s: str) -> bytes:
     return base64.b64decode(s.encode("ascii"))
 
 
+def encode_aad_meta(meta: Dict[str, Any]) -> str:
+    """Metadata JSON for a message's `aad`, base64 like the other binary fields so MessagePack can carry it."""
+    return b64e(json.dumps(meta, separators=(",", ":"), sort_keys=True).encode("utf-8"))
+
+
+def decode_aad_meta(aad: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Inverse of `encode_aad_meta`; None for empty or opaque aad. Bare JSON is accepted too."""
+    if not aad:
+        return None
+    try:
+        raw = aad if aad.startswith("{") else base64.b64decode(aad.encode("ascii"), validate=True).decode("utf-8")
+        meta = json.loads(raw)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+    return meta if isinstance(meta, dict) else None
+
+
 def derive_user_id(public_key_32: bytes) -> str:
     """sha256(publicKey) -> bs58.encode(hash)"""
     if len(public_key_32) != 32:
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from crypto_utils import decode_aad_meta
+from metrics import DELIVERY_LATENCY, percentiles_ms
+from storage import load_cache, save_json_atomic
+
+SeriesKey = Tuple[str, str, str]  # (kind, peer, trigger)
+
+
+def sent_at(item: Dict[str, Any]) -> Optional[float]:
+    """Send time stamped by `make_plaintext_payload(..., stamp=True)`, if any."""
+    meta = decode_aad_meta(item.get("aad"))
+    value = meta.get("sentAt") if meta else None
+    return float(value) if isinstance(value, (int, float)) else None
+
+
+class DeliveryStats:
+    """
+    Push-to-render latency of timestamped messages, per (kind, peer, trigger):
+      - peer is the sender for direct messages and the group for group ones
+      - trigger is "socket" when a realtime event woke the pull, else "poll"
+    The last `window` samples of each series are kept for percentiles and
+    every sample also lands in the `madelin_delivery_seconds` histogram
+    (by kind and trigger only).
+    Sender and receiver clocks are compared as-is; skew below zero is clamped.
+    """
+
+    def __init__(self, window: int = 1000) -> None:
+        self.window = window
+        self._series: Dict[SeriesKey, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        items: Iterable[Dict[str, Any]],
+        kind: str,
+        trigger: str,
+        peer: Callable[[Dict[str, Any]], Optional[str]],
+    ) -> int:
+        """Observe every stamped item; returns how many were."""
+        now = time.time()
+        seen = 0
+        for item in items:
+            stamp = sent_at(item)
+            if stamp is None:
+                continue
+            latency = max(0.0, now - stamp)
+            key = (kind, peer(item) or "unknown", trigger)
+            DELIVERY_LATENCY.observe(latency, kind=kind, trigger=trigger)  # no peer label: one series per sender is unbounded
+            with self._lock:
+                self._series.setdefault(key, deque(maxlen=self.window)).append(latency)
+            seen += 1
+        return seen
+
+    def summary(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            series = {key: list(samples) for key, samples in self._series.items()}
+        return [
+            {"kind": kind, "peer": peer, "trigger": trigger, "count": len(samples), **percentiles_ms(samples, digits=1)}
+            for (kind, peer, trigger), samples in sorted(series.items())
+            if samples
+        ]
+
+    def save(self, path: Path) -> None:
+        """Merge this session's samples into `path`, keeping the newest `window` per series."""
+        merged = load_stats(path, self.window)
+        with self._lock:
+            for key, samples in self._series.items():
+                merged._series.setdefault(key, deque(maxlen=self.window)).extend(samples)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        save_json_atomic(
+            path,
+            {
+                "updatedAt": time.time(),
+                "series": [
+                    {"kind": kind, "peer": peer, "trigger": trigger, "samples": [round(s, 4) for s in samples]}
+                    for (kind, peer, trigger), samples in sorted(merged._series.items())
+                ],
+            },
+        )
+
+
+def load_stats(path: Path, window: int = 1000) -> DeliveryStats:
+    stats = DeliveryStats(window)
+    for row in load_cache(path).get("series", []):
+        key = (row["kind"], row["peer"], row["trigger"])
+        stats._series[key] = deque(row.get("samples", []), maxlen=window)
+    return stats
+
+
+def format_summary(rows: List[Dict[str, Any]]) -> List[str]:
+    if not rows:
+        return ["no timestamped messages received yet (senders need --measure-latency)"]
+    lines = [f"{'kind':6} {'trigger':7} {'count':>6} {'p50ms':>9} {'p95ms':>9} {'p99ms':>9} {'maxms':>9}  peer"]
+    for row in rows:
+        lines.append(
+            f"{row['kind']:6} {row['trigger']:7} {row['count']:>6} {row['p50Ms']:>9} {row['p95Ms']:>9} "
+            f"{row['p99Ms']:>9} {row['maxMs']:>9}  {row['peer']}"
+        )
+    return lines
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+def split_base_urls(value: str) -> List[str]:
+    """`https://a,https://b` -> ["https://a", "https://b"]; trailing slashes dropped, duplicates removed in order."""
+    urls: List[str] = []
+    for part in value.split(","):
+        url = part.strip().rstrip("/")
+        if url and url not in urls:
+            urls.append(url)
+    return urls
+
+
+class EndpointPool:
+    """
+    Replicas of one API. Clients keep building URLs from `logical` (the first
+    configured URL); the transport rewrites them to `current()`:
+      - replicas are ranked by smoothed probe latency
+      - the current replica is kept until it fails or another one probes
+        `switch_margin` faster, so a login's challenge/verify, the token it
+        yields and the realtime socket all stay on one server
+      - a replica that fails to connect sits out for `down_for` seconds
+    `on_switch` callbacks run (old, new) whenever the current replica changes.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        probe: Callable[[str], float],
+        probe_interval: float = 60.0,
+        down_for: float = 30.0,
+        switch_margin: float = 0.3,
+        smoothing: float = 0.3,
+    ) -> None:
+        if not urls:
+            raise ValueError("at least one base URL is required")
+        self.urls = list(urls)
+        self.logical = self.urls[0]
+        self._probe = probe
+        self.probe_interval = probe_interval
+        self.down_for = down_for
+        self.switch_margin = switch_margin
+        self.smoothing = smoothing
+        self._latency: Dict[str, Optional[float]] = {url: None for url in self.urls}
+        self._down_until: Dict[str, float] = {url: 0.0 for url in self.urls}
+        self._current = self.logical
+        self._probed_at = 0.0
+        self._probing = False
+        self._listeners: List[Callable[[str, str], None]] = []
+        self._lock = threading.Lock()
+
+    def owns(self, url: str) -> bool:
+        return url == self.logical or url.startswith(self.logical + "/")
+
+    def rewrite(self, url: str, base: str) -> str:
+        return base + url[len(self.logical):]
+
+    def current(self) -> str:
+        with self._lock:
+            return self._current
+
+    def on_switch(self, listener: Callable[[str, str], None]) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _is_up(self, url: str, now: float) -> bool:
+        return self._down_until[url] <= now
+
+    def _ranked(self, now: float) -> List[str]:
+        # Unprobed replicas sort after probed ones; configured order breaks ties.
+        return sorted(
+            self.urls,
+            key=lambda u: (not self._is_up(u, now), self._latency[u] is None, self._latency[u] or 0.0, self.urls.index(u)),
+        )
+
+    def candidates(self) -> List[str]:
+        """Current replica first, then the rest by rank; replicas marked down come last but are still tried."""
+        with self._lock:
+            now = time.monotonic()
+            ranked = self._ranked(now)
+            if self._is_up(self._current, now):
+                ranked.remove(self._current)
+                ranked.insert(0, self._current)
+            return ranked
+
+    def _switch(self, new: str) -> None:
+        with self._lock:
+            old, self._current = self._current, new
+            listeners = list(self._listeners) if old != new else []
+        for listener in listeners:
+            listener(old, new)
+
+    def mark_failed(self, url: str) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._down_until[url] = now + self.down_for
+            self._latency[url] = None
+            failed_current = url == self._current
+            best = self._ranked(now)[0]
+        if failed_current:
+            self._switch(best)
+
+    def mark_ok(self, url: str) -> None:
+        """A request succeeded on `url`; make it current if the one we had is down."""
+        with self._lock:
+            now = time.monotonic()
+            self._down_until[url] = 0.0
+            move = url != self._current and not self._is_up(self._current, now)
+        if move:
+            self._switch(url)
+
+    def probe_all(self, fan_out: Optional[Callable[..., List[Optional[float]]]] = None) -> Dict[str, Optional[float]]:
+        """Probe every replica (through `fan_out` when given), update the ranking and maybe switch."""
+
+        def one(url: str) -> Optional[float]:
+            try:
+                return self._probe(url)
+            except Exception:
+                return None
+
+        results = fan_out(one, self.urls) if fan_out else [one(url) for url in self.urls]
+        with self._lock:
+            now = time.monotonic()
+            self._probed_at = now
+            self._probing = False
+            for url, seconds in zip(self.urls, results):
+                if seconds is None:
+                    self._down_until[url] = now + self.down_for
+                    self._latency[url] = None
+                    continue
+                previous = self._latency[url]
+                self._latency[url] = seconds if previous is None else previous + self.smoothing * (seconds - previous)
+                self._down_until[url] = 0.0
+            best = self._ranked(now)[0]
+            current_latency = self._latency[self._current]
+            best_latency = self._latency[best]
+            move = best != self._current and (
+                not self._is_up(self._current, now)
+                or current_latency is None
+                or (best_latency is not None and best_latency < current_latency * (1 - self.switch_margin))
+            )
+        if move:
+            self._switch(best)
+        return dict(zip(self.urls, results))
+
+    def maybe_reprobe(self, fan_out: Optional[Callable[..., List[Optional[float]]]] = None) -> None:
+        """Re-rank in the background once the last probe is older than `probe_interval`."""
+        with self._lock:
+            if self._probing or time.monotonic() - self._probed_at < self.probe_interval:
+                return
+            self._probing = True
+        threading.Thread(target=self.probe_all, args=(fan_out,), daemon=True, name="endpoint-probe").start()
+
+    def status(self) -> List[Dict[str, object]]:
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "url": url,
+                    "current": url == self._current,
+                    "up": self._is_up(url, now),
+                    "latencyMs": round(self._latency[url] * 1000, 2) if self._latency[url] is not None else None,
+                }
+                for url in self._ranked(now)
+            ]
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import requests
+
+
+def read_id_file(path: Path) -> List[str]:
+    """One id per line; blank lines and `#` comments are skipped, duplicates dropped in order."""
+    ids: List[str] = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        value = line.split("#", 1)[0].strip()
+        if value and value not in ids:
+            ids.append(value)
+    return ids
+
+
+def _describe_error(e: Exception) -> str:
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        try:
+            detail = e.response.json().get("error")
+        except ValueError:
+            detail = None
+        return f"HTTP {e.response.status_code}" + (f": {detail}" if detail else "")
+    return repr(e)
+
+
+def bulk_group_action(
+    ids: List[str],
+    action: Callable[[str], Any],
+    concurrency: int = 8,
+) -> Dict[str, Any]:
+    """
+    Run `action(id)` for every id with at most `concurrency` calls in flight on
+    the shared transport. One failure never stops the rest; every id gets a row.
+    """
+    def run(item_id: str) -> Dict[str, Any]:
+        try:
+            return {"id": item_id, "ok": True, "result": action(item_id)}
+        except Exception as e:
+            return {"id": item_id, "ok": False, "error": _describe_error(e)}
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(ids) or 1))) as pool:
+        items = list(pool.map(run, ids))
+    elapsed = time.perf_counter() - t0
+    succeeded = sum(1 for item in items if item["ok"])
+    return {
+        "requested": len(ids),
+        "succeeded": succeeded,
+        "failed": len(ids) - succeeded,
+        "seconds": round(elapsed, 3),
+        "items": items,
+    }
@@ -1,22 +1,29 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests
 
+from codec import StreamedPage
+from transport import UNSUPPORTED_STATUS, Transport, as_transport, get_default_transport
+
 
 @dataclass
 class GroupClient:
     base_url: str
     token: str
-    session: requests.Session = field(default_factory=requests.Session)
+    transport: Transport = field(default_factory=get_default_transport)
+    session: Optional[requests.Session] = None  # pre-Transport API; wrapped in a Transport of its own
+
+    def __post_init__(self) -> None:
+        self.transport = as_transport(self.session if self.session is not None else self.transport)
 
     def _headers(self) -> Dict[str, str]:
         return {"Authorization": f"Bearer {self.token}"}
 
     def list_groups(self) -> List[Dict[str, Any]]:
-        r = self.session.get(f"{self.base_url}/groups/mine", headers=self._headers(), timeout=20)
+        r = self.transport.request("GET", f"{self.base_url}/groups/mine", headers=self._headers(), endpoint="groups.mine", idempotent=True)
         r.raise_for_status()
         data = r.json()
         return data if isinstance(data, list) else data.get("items", data)
@@ -29,107 +36,192 @@ class GroupClient:
             payload["memberUserIds"] = member_user_ids
         if is_open is not None:
             payload["isOpen"] = is_open
-        r = self.session.post(f"{self.base_url}/groups", json=payload, headers=self._headers(), timeout=20)
+        r = self.transport.request("POST", f"{self.base_url}/groups", json=payload, headers=self._headers(), endpoint="groups.create")
         r.raise_for_status()
         return r.json()
 
     def list_mine(self) -> Dict[str, Any]:
-        r = self.session.get(f"{self.base_url}/groups/mine", headers=self._headers(), timeout=20)
+        r = self.transport.request("GET", f"{self.base_url}/groups/mine", headers=self._headers(), endpoint="groups.mine", idempotent=True)
         r.raise_for_status()
         return r.json()
 
     def list_members(self, group_id: str) -> Dict[str, Any]:
-        r = self.session.get(
+        r = self.transport.request(
+            "GET",
             f"{self.base_url}/groups/members",
             params={"groupId": group_id},
             headers=self._headers(),
-            timeout=20,
+            endpoint="groups.members",
+            idempotent=True,
         )
         r.raise_for_status()
         return r.json()
 
+    def _conditional_get(
+        self, path: str, params: Dict[str, Any], endpoint: str, etag: Optional[str]
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """GET with If-None-Match; returns (None, etag) when the server answers 304 Not Modified."""
+        headers = self._headers()
+        if etag:
+            headers["If-None-Match"] = etag
+        r = self.transport.request(
+            "GET",
+            f"{self.base_url}{path}",
+            params={k: v for k, v in params.items() if v is not None},
+            headers=headers,
+            endpoint=endpoint,
+            idempotent=True,
+        )
+        if r.status_code == 304:
+            return None, etag
+        r.raise_for_status()
+        return r.json(), r.headers.get("ETag")
+
+    def list_mine_page(
+        self,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        etag: Optional[str] = None,
+        updated_since: Optional[str] = None,
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        params = {"cursor": cursor, "limit": limit, "updatedSince": updated_since}
+        return self._conditional_get("/groups/mine", params, "groups.mine", etag)
+
+    def list_members_page(
+        self,
+        group_id: str,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        etag: Optional[str] = None,
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        params = {"groupId": group_id, "cursor": cursor, "limit": limit}
+        return self._conditional_get("/groups/members", params, "groups.members", etag)
+
     def delete_group(self, group_id: str) -> None:
-        r = self.session.delete(f"{self.base_url}/groups/{group_id}", headers=self._headers(), timeout=20)
+        r = self.transport.request("DELETE", f"{self.base_url}/groups/{group_id}", headers=self._headers(), endpoint="groups.delete", idempotent=True)
         r.raise_for_status()
 
     def join_group(self, group_id: str) -> Dict[str, Any]:
-        r = self.session.post(f"{self.base_url}/groups/{group_id}/join", headers=self._headers(), timeout=20)
+        r = self.transport.request("POST", f"{self.base_url}/groups/{group_id}/join", headers=self._headers(), endpoint="groups.join")
         r.raise_for_status()
         return r.json()
 
     def accept_request(self, group_id: str, user_id: str) -> Dict[str, Any]:
-        r = self.session.post(
+        r = self.transport.request(
+            "POST",
             f"{self.base_url}/groups/{group_id}/requests/{user_id}/accept",
             headers=self._headers(),
-            timeout=20,
+            endpoint="groups.accept",
         )
         r.raise_for_status()
         return r.json()
 
     def reject_request(self, group_id: str, user_id: str) -> Dict[str, Any]:
-        r = self.session.post(
+        r = self.transport.request(
+            "POST",
             f"{self.base_url}/groups/{group_id}/requests/{user_id}/reject",
             headers=self._headers(),
-            timeout=20,
+            endpoint="groups.reject",
         )
         r.raise_for_status()
         return r.json()
 
     def leave_group(self, group_id: str) -> Dict[str, Any]:
-        r = self.session.post(f"{self.base_url}/groups/{group_id}/leave", headers=self._headers(), timeout=20)
+        r = self.transport.request("POST", f"{self.base_url}/groups/{group_id}/leave", headers=self._headers(), endpoint="groups.leave")
         r.raise_for_status()
         return r.json()
 
     # Group mailbox operations
     def group_push(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        r = self.session.post(
+        r = self.transport.request(
+            "POST",
             f"{self.base_url}/group-mailbox/push",
             json=payload,
             headers=self._headers(),
-            timeout=20,
+            endpoint="group_mailbox.push",
+            compact=True,
         )
         r.raise_for_status()
-        return r.json()
+        return self.transport.decode(r)
+
+    def group_push_many(self, payloads: List[Dict[str, Any]], ordered: bool = False) -> List[Dict[str, Any]]:
+        """Batch counterpart of group_push (each payload carries its groupId); same fallback and `ordered` as MailboxClient.push_many."""
+        url = f"{self.base_url}/group-mailbox/push-batch"
+        if len(payloads) > 1 and self.transport.supports(url, "batch"):
+            r = self.transport.request("POST", url, json={"items": payloads}, headers=self._headers(), endpoint="group_mailbox.push_batch")
+            if r.status_code not in UNSUPPORTED_STATUS:
+                r.raise_for_status()
+                return r.json().get("items", [])
+            self.transport.mark_unsupported(url, "batch")
+        if ordered:
+            return [self.group_push(payload) for payload in payloads]
+        return self.transport.map_concurrent(self.group_push, payloads)
 
     def group_pull(self, group_id: str, cursor: Optional[str], limit: int) -> Dict[str, Any]:
-        r = self.session.get(
+        r = self.transport.request(
+            "GET",
             f"{self.base_url}/group-mailbox/pull",
             params={"cursor": cursor, "limit": limit, "groupId": group_id},
             headers=self._headers(),
-            timeout=20,
+            endpoint="group_mailbox.pull",
+            idempotent=True,
+            compact=True,
         )
         r.raise_for_status()
-        return r.json()
+        return self.transport.decode(r)
+
+    def group_pull_stream(self, group_id: str, cursor: Optional[str], limit: int) -> StreamedPage:
+        """`group_pull`, but items are parsed off the wire one at a time; `nextCursor` is known once iterated."""
+        r = self.transport.request(
+            "GET",
+            f"{self.base_url}/group-mailbox/pull",
+            params={"cursor": cursor, "limit": limit, "groupId": group_id},
+            headers=self._headers(),
+            endpoint="group_mailbox.pull",
+            idempotent=True,
+            compact=True,
+            stream=True,
+        )
+        if not r.ok:
+            r.close()
+        r.raise_for_status()
+        return self.transport.decode_stream(r)
 
     def group_ack_delivered(self, ids: List[str]) -> None:
         if not ids:
             return
-        r = self.session.post(
+        r = self.transport.request(
+            "POST",
             f"{self.base_url}/group-mailbox/ack/delivered",
             json={"ids": ids},
             headers=self._headers(),
-            timeout=20,
+            endpoint="group_mailbox.ack_delivered",
+            idempotent=True,
         )
         r.raise_for_status()
 
     def group_ack_read(self, ids: List[str]) -> None:
         if not ids:
             return
-        r = self.session.post(
+        r = self.transport.request(
+            "POST",
             f"{self.base_url}/group-mailbox/ack/read",
             json={"ids": ids},
             headers=self._headers(),
-            timeout=20,
+            endpoint="group_mailbox.ack_read",
+            idempotent=True,
         )
         r.raise_for_status()
 
     def group_delete(self, ids: List[str]) -> None:
         if not ids:
             return
-        r = self.session.post(
+        r = self.transport.request(
+            "POST",
             f"{self.base_url}/group-mailbox/delete",
             json={"ids": ids},
             headers=self._headers(),
-            timeout=20,
+            endpoint="group_mailbox.delete",
+            idempotent=True,
         )
         r.raise_for_status()
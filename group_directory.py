@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from group_client import GroupClient
+from storage import load_cache, save_json_atomic
+
+
+def _gid(group: Dict[str, Any]) -> Optional[str]:
+    return group.get("groupId") or group.get("group_id") or group.get("id")
+
+
+@dataclass
+class GroupDirectory:
+    """
+    Local copy of `/groups/mine` and per-group member lists, persisted per user.
+
+    Entries younger than `max_age` are served without a request. Older ones are
+    revalidated with If-None-Match (a 304 costs no body), and the group list is
+    refreshed incrementally with `updatedSince` when the server supports it;
+    otherwise it is refetched page by page.
+    """
+
+    client: GroupClient
+    user_id: str
+    path: Path
+    max_age: float = 60.0
+    page_size: int = 200
+    _data: Dict[str, Any] = field(default_factory=dict, init=False)
+
+    def __post_init__(self) -> None:
+        data = load_cache(self.path)
+        if data.get("baseUrl") != self.client.base_url:
+            data = {}
+        data.setdefault("baseUrl", self.client.base_url)
+        data.setdefault("mine", None)
+        data.setdefault("members", {})
+        self._data = data
+
+    @classmethod
+    def for_user(cls, client: GroupClient, user_id: str, cache_dir: Path, max_age: float = 60.0) -> "GroupDirectory":
+        return cls(client, user_id, cache_dir / f"groups-{user_id}.json", max_age)
+
+    def _fresh(self, entry: Optional[Dict[str, Any]]) -> bool:
+        return entry is not None and time.time() - entry.get("fetchedAt", 0) < self.max_age
+
+    def _split(self, groups: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        owned = [g for g in groups if g.get("ownerUserId") == self.user_id]
+        return {"owned": owned, "memberOf": [g for g in groups if g.get("ownerUserId") != self.user_id]}
+
+    def _fetch_mine(self, entry: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        etag = entry.get("etag") if entry else None
+        since = entry.get("serverTime") if entry else None
+        data, new_etag = self.client.list_mine_page(limit=self.page_size, etag=etag, updated_since=since)
+        if data is None:
+            entry["fetchedAt"] = time.time()
+            return entry
+        if isinstance(data, list):  # older servers: one flat list, no paging
+            data = self._split(data)
+        incremental = entry is not None and since is not None and data.get("updatedSince") == since
+        owned = list(data.get("owned") or [])
+        member_of = list(data.get("memberOf") or [])
+        removed = set(data.get("removed") or [])
+        cursor = data.get("nextCursor")
+        while cursor:
+            page, _ = self.client.list_mine_page(cursor=cursor, limit=self.page_size, updated_since=since if incremental else None)
+            owned += page.get("owned") or []
+            member_of += page.get("memberOf") or []
+            removed.update(page.get("removed") or [])
+            cursor = page.get("nextCursor")
+        if incremental:
+            changed = {_gid(g) for g in owned + member_of}
+            removed |= changed
+            owned = [g for g in entry["owned"] if _gid(g) not in removed] + owned
+            member_of = [g for g in entry["memberOf"] if _gid(g) not in removed] + member_of
+            for gid in removed:
+                self._data["members"].pop(gid, None)  # membership may have changed
+        else:
+            self._data["members"] = {}
+        return {
+            "owned": owned,
+            "memberOf": member_of,
+            "etag": new_etag,
+            "serverTime": data.get("serverTime"),
+            "fetchedAt": time.time(),
+        }
+
+    def mine(self, refresh: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        entry = self._data["mine"]
+        if refresh or not self._fresh(entry):
+            entry = self._data["mine"] = self._fetch_mine(entry)
+            self.save()
+        return {"owned": entry["owned"], "memberOf": entry["memberOf"]}
+
+    def members(self, group_id: str, refresh: bool = False) -> Dict[str, Any]:
+        entry = self._data["members"].get(group_id)
+        if refresh or not self._fresh(entry):
+            data, etag = self.client.list_members_page(group_id, limit=self.page_size, etag=entry.get("etag") if entry else None)
+            if data is None:
+                entry["fetchedAt"] = time.time()
+            else:
+                cursor = data.get("nextCursor")
+                while cursor:
+                    page, _ = self.client.list_members_page(group_id, cursor=cursor, limit=self.page_size)
+                    data["members"] = (data.get("members") or []) + (page.get("members") or [])
+                    if "pending" in page:
+                        data["pending"] = (data.get("pending") or []) + page["pending"]
+                    cursor = page.get("nextCursor")
+                data.pop("nextCursor", None)
+                entry = {"result": data, "etag": etag, "fetchedAt": time.time()}
+            self._data["members"][group_id] = entry
+            self.save()
+        return entry["result"]
+
+    def invalidate(self, group_id: Optional[str] = None) -> None:
+        """Force revalidation after a local change (create/join/leave/accept/...)."""
+        if self._data["mine"]:
+            self._data["mine"]["fetchedAt"] = 0
+        if group_id is not None and group_id in self._data["members"]:
+            self._data["members"][group_id]["fetchedAt"] = 0
+        self.save()
+
+    def save(self) -> None:
+        save_json_atomic(self.path, self._data)
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from nacl.signing import SigningKey
+
+from delivery import sent_at
+from flows import login_flow
+from group_client import GroupClient
+from messaging import MailboxClient, make_plaintext_payload
+from metrics import percentiles_ms
+from realtime import AsyncRealtimeHub
+from storage import signing_key_from_file
+from transport import get_default_transport
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+        self.counts: Dict[str, int] = {}
+
+    def timed(self, op: str, fn: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            status = str(e.response.status_code) if isinstance(e, requests.HTTPError) and e.response is not None else type(e).__name__
+            with self._lock:
+                per_op = self.errors.setdefault(op, {})
+                per_op[status] = per_op.get(status, 0) + 1
+            return None
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies.setdefault(op, []).append(elapsed)
+        return result
+
+    def observe(self, op: str, seconds: float) -> None:
+        with self._lock:
+            self.latencies.setdefault(op, []).append(seconds)
+
+    def add(self, name: str, n: int) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def snapshot(self) -> Dict[str, int]:
+        """Copy of the counters, safe to read while workers keep adding to them."""
+        with self._lock:
+            return dict(self.counts)
+
+    def summary(self) -> Dict[str, Any]:
+        ops = {}
+        with self._lock:
+            for op in sorted(set(self.latencies) | set(self.errors)):
+                samples = self.latencies.get(op, [])
+                errors = self.errors.get(op, {})
+                total = len(samples) + sum(errors.values())
+                ops[op] = {
+                    "ok": len(samples),
+                    "errors": errors,
+                    "errorRate": round(sum(errors.values()) / total, 4) if total else 0.0,
+                    **percentiles_ms(samples),
+                }
+        return ops
+
+
+def _load_keys(key_dir: Optional[Path], users: int) -> List[SigningKey]:
+    """Reuse identities from `register --count` (index.json) when given, else generate throwaway keys."""
+    keys: List[SigningKey] = []
+    if key_dir is not None:
+        index = json.loads((key_dir / "index.json").read_text(encoding="utf-8"))
+        usable = [entry for entry in index["identities"] if entry.get("status", "registered") == "registered"]
+        for entry in usable[:users]:
+            keys.append(signing_key_from_file(Path(entry["keyFile"]))[0])
+    while len(keys) < users:
+        keys.append(SigningKey.generate())
+    return keys
+
+
+class _SocketFleet:
+    """An AsyncRealtimeHub for every simulated user, run on its own event-loop thread."""
+
+    def __init__(self, base_url: str, sessions: List[Dict[str, Any]], rec: _Recorder, log: Callable[[str], None]) -> None:
+        self.rec = rec
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+        self.hub: AsyncRealtimeHub = self._call(self._open(base_url, sessions, log))
+
+    def _call(self, coro: Any) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def _open(self, base_url: str, sessions: List[Dict[str, Any]], log: Callable[[str], None]) -> AsyncRealtimeHub:
+        hub = AsyncRealtimeHub(get_default_transport().resolve(base_url), on_log=log)
+        failed = await hub.add_many([(s["userId"], s["token"]) for s in sessions])
+        self.rec.add("socketConnectFailures", len(failed))
+        self._consumer = asyncio.ensure_future(self._consume(hub))
+        return hub
+
+    async def _consume(self, hub: AsyncRealtimeHub) -> None:
+        async for _, data in hub.events():
+            sent_at = data.get("sentAt") if isinstance(data, dict) else None
+            if sent_at is not None:
+                self.rec.observe("socket_wakeup", time.time() - sent_at)
+
+    def notify(self, from_user_id: str, to_user_id: str) -> None:
+        """Fire-and-forget wakeup; senders whose socket never connected (or dropped) are skipped and counted."""
+        if not self.hub.is_connected(from_user_id):
+            self.rec.add("socketNotifySkipped", 1)
+            return
+        future = asyncio.run_coroutine_threadsafe(self.hub.notify_send(from_user_id, to_user_id, {"sentAt": time.time()}), self.loop)
+        future.add_done_callback(self._notified)
+
+    def _notified(self, future: Future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            self.rec.add("socketNotifyErrors", 1)
+
+    def close(self) -> int:
+        online = len(self.hub)
+
+        async def shutdown() -> None:
+            self._consumer.cancel()
+            await self.hub.close()
+
+        self._call(shutdown())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+        return online
+
+
+def run_loadgen(
+    base_url: str,
+    users: int,
+    groups: int,
+    rate: float,
+    duration: float,
+    workers: int = 32,
+    group_ratio: float = 0.5,
+    drain_interval: float = 1.0,
+    limit: int = 50,
+    key_dir: Optional[Path] = None,
+    sockets: bool = False,
+    on_log: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Simulate `users` identities against a server:
+      - log everyone in concurrently and spread them over `groups` open groups
+      - push direct/group messages open-loop at `rate` msg/s for `duration` seconds
+      - drain every mailbox each `drain_interval` seconds (pull + ack + delete),
+        timing push-to-pull `delivery` from the send time stamped into each message
+      - with `sockets`, keep a websocket per user on one asyncio loop and time
+        the `app:direct` wake-up that follows each direct push
+    and report achieved throughput, latency percentiles and error rates.
+    """
+    log = on_log or (lambda _: None)
+    rec = _Recorder()
+    keys = _load_keys(key_dir, users)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        log(f"logging in {users} users")
+        logins = list(pool.map(lambda k: rec.timed("login", lambda: login_flow(base_url, k)), keys))
+        sessions = [
+            {"userId": out["keys"]["userId"], "token": out["auth"]["accessToken"]}
+            for out in logins
+            if out is not None
+        ]
+        if len(sessions) < 2:
+            raise RuntimeError(f"only {len(sessions)} of {users} users could log in")
+        for s in sessions:
+            s["mailbox"] = MailboxClient(base_url, s["token"])
+            s["groups"] = GroupClient(base_url, s["token"])
+            s["memberOf"] = []
+
+        group_ids: List[str] = []
+        for g in range(min(groups, len(sessions))):
+            members = sessions[g::groups] if groups else []
+            owner = members[0]
+            created = rec.timed(
+                "group_create",
+                lambda: owner["groups"].create_group(f"loadgen-{g}", [m["userId"] for m in members[1:]], True),
+            )
+            if created:
+                gid = created.get("groupId") or created.get("id")
+                group_ids.append(gid)
+                for m in members:
+                    m["memberOf"].append(gid)
+        fleet = _SocketFleet(base_url, sessions, rec, log) if sockets else None
+        log(f"{len(sessions)} users online, {len(group_ids)} groups" + (f", {len(fleet.hub)} sockets" if fleet else ""))
+
+        stop = threading.Event()
+        inflight = threading.Semaphore(workers * 4)  # bound queued work when the server falls behind
+
+        def send_one() -> None:
+            try:
+                sender = random.choice(sessions)
+                payload = make_plaintext_payload("loadgen", 60, stamp=True)
+                if sender["memberOf"] and random.random() < group_ratio:
+                    payload["groupId"] = random.choice(sender["memberOf"])
+                    if rec.timed("group_push", lambda: sender["groups"].group_push(payload)) is not None:
+                        rec.add("sent", 1)
+                else:
+                    target = random.choice(sessions)
+                    while target is sender:
+                        target = random.choice(sessions)
+                    if rec.timed("push", lambda: sender["mailbox"].push(target["userId"], payload)) is not None:
+                        rec.add("sent", 1)
+                        if fleet is not None:
+                            fleet.notify(sender["userId"], target["userId"])
+            finally:
+                inflight.release()
+
+        def observe_delivery(items: List[Dict[str, Any]]) -> None:
+            now = time.time()
+            for item in items:
+                stamp = sent_at(item)
+                if stamp is not None:
+                    rec.observe("delivery", max(0.0, now - stamp))
+
+        def drain_one(s: Dict[str, Any]) -> None:
+            try:
+                pulled = rec.timed("pull", lambda: s["mailbox"].pull(None, limit))
+                observe_delivery((pulled or {}).get("items", []))
+                ids = [i.get("id") for i in (pulled or {}).get("items", []) if i.get("id")]
+                if ids:
+                    rec.timed("ack_delivered", lambda: s["mailbox"].ack_delivered(ids))
+                    rec.timed("ack_read", lambda: s["mailbox"].ack_read(ids))
+                    rec.timed("delete", lambda: s["mailbox"].delete(ids))
+                    rec.add("received", len(ids))
+                for gid in s["memberOf"]:
+                    pulled = rec.timed("group_pull", lambda: s["groups"].group_pull(gid, None, limit))
+                    observe_delivery((pulled or {}).get("items", []))
+                    ids = [i.get("id") for i in (pulled or {}).get("items", []) if i.get("id")]
+                    if ids:
+                        rec.timed("group_ack_delivered", lambda: s["groups"].group_ack_delivered(ids))
+                        rec.timed("group_ack_read", lambda: s["groups"].group_ack_read(ids))
+                        rec.timed("group_delete", lambda: s["groups"].group_delete(ids))
+                        rec.add("received", len(ids))
+            finally:
+                inflight.release()
+
+        def drain_scheduler() -> None:
+            while not stop.wait(drain_interval):
+                for s in sessions:
+                    if stop.is_set():
+                        return
+                    inflight.acquire()
+                    pool.submit(drain_one, s)
+
+        drainer = threading.Thread(target=drain_scheduler, daemon=True)
+        started = time.perf_counter()
+        drainer.start()
+        scheduled = 0
+        lag_max = 0.0
+        while True:
+            due = started + scheduled / rate if rate > 0 else started + duration
+            now = time.perf_counter()
+            if due - started >= duration:
+                break
+            if due > now:
+                time.sleep(due - now)
+            else:
+                lag_max = max(lag_max, now - due)
+            inflight.acquire()
+            pool.submit(send_one)
+            scheduled += 1
+        stop.set()
+        drainer.join()
+    elapsed = time.perf_counter() - started
+    sockets_online = fleet.close() if fleet is not None else 0
+
+    counts = rec.snapshot()
+    return {
+        "users": len(sessions),
+        "groups": len(group_ids),
+        "targetRate": rate,
+        "durationSeconds": round(elapsed, 3),
+        "scheduled": scheduled,
+        "sent": counts.get("sent", 0),
+        "received": counts.get("received", 0),
+        "sendRatePerSecond": round(counts.get("sent", 0) / elapsed, 2) if elapsed else 0.0,
+        "receiveRatePerSecond": round(counts.get("received", 0) / elapsed, 2) if elapsed else 0.0,
+        "maxSchedulerLagMs": round(lag_max * 1000, 3),
+        "socketsOnline": sockets_online,
+        "socketConnectFailures": counts.get("socketConnectFailures", 0),
+        "socketNotifySkipped": counts.get("socketNotifySkipped", 0),
+        "socketNotifyErrors": counts.get("socketNotifyErrors", 0),
+        "operations": rec.summary(),
+    }
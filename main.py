@@ -1,17 +1,14 @@
 from __future__ import annotations
 
 import json
-from typing import Optional, Sequence
+import sys
+from typing import Any, Callable, Dict, Optional, Sequence
 
 from cli import parse_args
-from config import resolve_base_url
-from crypto_utils import derive_user_id, signing_key_from_b64
-from flows import login_flow, register_flow
-from storage import save_config, signing_key_from_file
-from console_chat import run_mailbox_console
-from group_client import GroupClient
-from group_chat import run_group_chat_console
-from messaging import make_plaintext_payload
+
+# Command modules are imported inside the handlers below so that each
+# subcommand only pays for what it uses (e.g. `init` never loads requests,
+# PyNaCl or Socket.IO). benchmarks/import_time.py guards this.
 
 
 MADELIN_ASCII_ART = r"""
@@ -23,105 +20,419 @@ MADELIN_ASCII_ART = r"""
 """
 
 
-def main(argv: Optional[Sequence[str]] = None) -> int:
-    args = parse_args(argv)
+def _configure_transport(args) -> None:
+    """Set up the shared transport once; `login` only does it when the agent can't serve the token."""
+    if getattr(args, "transport_configured", False):
+        return
+    args.transport_configured = True
+    from retry_policy import RetryPolicy
+    from transport import TransportConfig, configure_default_transport
+
+    policy = RetryPolicy(max_attempts=max(1, args.max_attempts))
+    policy.override_timeouts(args.connect_timeout, args.read_timeout)
+    # loadgen workers / bulk commands each hold a connection; don't let the pool throw them away
+    pool_size = max(args.pool_size, getattr(args, "workers", 0), getattr(args, "concurrency", 0))
+    configure_default_transport(
+        TransportConfig(
+            pool_maxsize=pool_size,
+            keep_alive=not args.no_keep_alive,
+            compact=args.compact,
+            rate_limit=args.rate_limit,
+            rate_burst=args.rate_burst,
+        ),
+        policy,
+    )
+
+
+def _login(args, base_url: str, refresh: bool = False) -> Dict[str, Any]:
+    """
+    login_flow output, served by the signing agent when one is running.
+    `refresh` is for a token the server rejected: the agent logs in again
+    instead of handing back its cached copy.
+    """
+    from agent_client import AgentUnavailable, agent_if_running
+
+    agent = None if args.no_agent else agent_if_running(args.agent_socket)
+    if agent is not None:
+        try:
+            if getattr(args, "signing_key_b64", None):
+                return agent.login(base_url, signing_key_b64=args.signing_key_b64, refresh=refresh)
+            return agent.login(base_url, key_file=args.key_file, refresh=refresh)
+        except AgentUnavailable:
+            pass
+
+    _configure_transport(args)
+    from crypto_utils import derive_user_id
+    from flows import login_flow
+
+    signing_key, material = _load_signing_key(args)
+    result = login_flow(base_url, signing_key)
+    if material:
+        derived = derive_user_id(signing_key.verify_key.encode())
+        if derived != material.user_id:
+            raise RuntimeError("Stored key mismatch after load: derived userId does not match stored userId")
+    return result
+
+
+def _load_signing_key(args):
+    from crypto_utils import signing_key_from_b64
+    from storage import signing_key_from_file
+
+    if getattr(args, "signing_key_b64", None):
+        return signing_key_from_b64(args.signing_key_b64), None
+    return signing_key_from_file(args.key_file)
+
+
+def _base_url(args) -> str:
+    from config import resolve_base_urls
+
+    urls = resolve_base_urls(args.base_url, args.config_file)
+    if len(urls) == 1:
+        return urls[0]
+    # Several replicas: clients keep the first URL and the transport routes it.
+    _configure_transport(args)
+    from transport import get_default_transport
+
+    return get_default_transport().use_endpoints(urls)
+
+
+def _cmd_init(args) -> Dict[str, Any]:
+    from endpoints import split_base_urls
+    from storage import save_config
+
+    urls = [url for value in args.base_url for url in split_base_urls(value)]
+    save_config(args.config_file, urls[0], urls)
+    return {"base_url": urls[0], "base_urls": urls, "storedAt": str(args.config_file)}
+
 
-    if args.command == "init":
-        save_config(args.config_file, args.base_url)
-        result = {"base_url": args.base_url, "storedAt": str(args.config_file)}
-    elif args.command == "register":
-        mnemonic = args.mnemonic
-        if getattr(args, "mnemonic_words", None):
-            mnemonic = " ".join(args.mnemonic_words)
-        result = register_flow(
-            base_url=resolve_base_url(args.base_url, args.config_file),
-            key_path=args.key_file,
-            mnemonic=mnemonic,
+def _cmd_endpoints(args) -> Dict[str, Any]:
+    from config import resolve_base_urls
+    from transport import get_default_transport
+
+    transport = get_default_transport()
+    transport.use_endpoints(resolve_base_urls(args.base_url, args.config_file))
+    return {"endpoints": transport.endpoints.status()}
+
+
+def _cmd_register(args) -> Dict[str, Any]:
+    if args.count > 1:
+        from provisioning import bulk_register_flow
+
+        if args.mnemonic or getattr(args, "mnemonic_words", None):
+            raise RuntimeError("--count cannot be combined with --mnemonic/--mnemonic-words")
+        return bulk_register_flow(
+            base_url=_base_url(args),
+            key_dir=args.key_dir,
+            count=args.count,
             store_mnemonic=args.store_mnemonic,
+            processes=args.processes,
+            concurrency=args.concurrency,
         )
-    elif args.command == "mailbox":
-        return run_mailbox_console(
-            base_url=resolve_base_url(args.base_url, args.config_file),
-            key_file=args.key_file,
-            self_user_id=args.user_id,
-            to_user_id=args.to_user_id,
-            limit=args.limit,
-            poll_interval=args.poll_interval,
-            ttl_seconds=args.ttl_seconds,
-            crypto_suite=args.crypto_suite,
-            use_socket=not args.no_socket,
-            signing_key_b64=getattr(args, "signing_key_b64", None),
-            debug=getattr(args, "debug", False),
-        )
-    elif args.command == "group":
-        signing_key = signing_key_from_b64(args.signing_key_b64) if getattr(args, "signing_key_b64", None) else None
-        if signing_key is None:
-            signing_key, _ = signing_key_from_file(args.key_file)
-        base_url = resolve_base_url(args.base_url, args.config_file)
-        login_data = login_flow(base_url, signing_key)
-        token = login_data["auth"]["accessToken"]
-        user_id = login_data["keys"]["userId"]
-        gc = GroupClient(base_url, token)
-
-        action = args.group_action
-        if action == "list":
-            result = gc.list_groups()
-        elif action == "list-mine":
-            result = gc.list_mine()
-        elif action == "members":
-            result = gc.list_members(args.group_id)
-        elif action == "create":
-            result = gc.create_group(args.name, args.members, args.is_open if hasattr(args, "is_open") else None)
-        elif action == "delete":
-            gc.delete_group(args.group_id)
-            result = {"deleted": args.group_id}
-        elif action == "join":
-            result = gc.join_group(args.group_id)
-        elif action == "accept":
-            result = gc.accept_request(args.group_id, args.user_id)
-        elif action == "reject":
-            result = gc.reject_request(args.group_id, args.user_id)
-        elif action == "leave":
-            result = gc.leave_group(args.group_id)
-        elif action == "push":
-            payload = make_plaintext_payload(args.text, args.ttl_seconds, crypto_suite=args.crypto_suite)
-            payload["groupId"] = args.group_id
-            result = gc.group_push(payload)
-        else:  # pull
-            pulled = gc.group_pull(args.group_id, args.cursor, args.limit)
-            # auto-ack/del/read/delete to mirror direct mailbox behaviour
-            items = pulled.get("items", [])
-            ids = [item.get("id") for item in items if item.get("id")]
-            if ids:
-                gc.group_ack_delivered(ids)
-                gc.group_ack_read(ids)
-                gc.group_delete(ids)
-            result = pulled
-        result = {"userId": user_id, "result": result}
-    elif args.command == "groupchat":
-        return run_group_chat_console(
-            base_url=resolve_base_url(args.base_url, args.config_file),
-            key_file=args.key_file,
-            group_id=args.group_id,
-            limit=args.limit,
-            poll_interval=args.poll_interval,
+
+    from flows import register_flow
+
+    mnemonic = args.mnemonic
+    if getattr(args, "mnemonic_words", None):
+        mnemonic = " ".join(args.mnemonic_words)
+    return register_flow(
+        base_url=_base_url(args),
+        key_path=args.key_file,
+        mnemonic=mnemonic,
+        store_mnemonic=args.store_mnemonic,
+    )
+
+
+def _cmd_mailbox(args) -> int:
+    from console_chat import run_mailbox_console
+
+    base_url = _base_url(args)
+    return run_mailbox_console(
+        base_url=base_url,
+        key_file=args.key_file,
+        self_user_id=args.user_id,
+        to_user_id=args.to_user_id,
+        limit=args.limit,
+        poll_interval=args.poll_interval,
+        ttl_seconds=args.ttl_seconds,
+        crypto_suite=args.crypto_suite,
+        use_socket=not args.no_socket,
+        signing_key_b64=getattr(args, "signing_key_b64", None),
+        debug=getattr(args, "debug", False),
+        outbox_dir=args.outbox_dir,
+        download_dir=args.download_dir,
+        chunk_size=args.chunk_size,
+        ui=args.ui,
+        coalesce_window=args.coalesce_ms / 1000.0,
+        stream=args.stream,
+        measure_latency=args.measure_latency,
+        stats_path=args.stats_file,
+        relogin=lambda: _login(args, base_url, refresh=True),
+    )
+
+
+def _cmd_group(args) -> Dict[str, Any]:
+    base_url = _base_url(args)
+    try:
+        return _group_action(args, base_url, _login(args, base_url))
+    except Exception as e:
+        if getattr(getattr(e, "response", None), "status_code", None) != 401:
+            raise
+    # The agent may have handed out a token the server has since revoked: log in afresh, once.
+    return _group_action(args, base_url, _login(args, base_url, refresh=True))
+
+
+def _group_action(args, base_url: str, login_data: Dict[str, Any]) -> Dict[str, Any]:
+    from group_client import GroupClient
+    from metrics import MESSAGES_RECEIVED, MESSAGES_SENT
+
+    token = login_data["auth"]["accessToken"]
+    user_id = login_data["keys"]["userId"]
+    gc = GroupClient(base_url, token)
+
+    def directory() -> "GroupDirectory":
+        # Only listings and membership changes touch the cache; push/pull never load it.
+        from group_directory import GroupDirectory
+
+        return GroupDirectory.for_user(gc, user_id, args.cache_dir, args.cache_max_age)
+
+    action = args.group_action
+    if action in {"list", "list-mine"}:
+        result = directory().mine(refresh=args.refresh)
+    elif action == "members":
+        result = directory().members(args.group_id, refresh=args.refresh)
+    elif action == "create":
+        result = gc.create_group(args.name, args.members, args.is_open if hasattr(args, "is_open") else None)
+        directory().invalidate()
+    elif action == "delete":
+        gc.delete_group(args.group_id)
+        directory().invalidate(args.group_id)
+        result = {"deleted": args.group_id}
+    elif action == "join" and args.groups_file:
+        from group_admin import bulk_group_action, read_id_file
+
+        result = bulk_group_action(read_id_file(args.groups_file), gc.join_group, args.concurrency)
+        directory().invalidate()
+    elif action == "join":
+        result = gc.join_group(args.group_id)
+        directory().invalidate(args.group_id)
+    elif action in {"accept", "reject"}:
+        decide = gc.accept_request if action == "accept" else gc.reject_request
+        if args.user_id:
+            result = decide(args.group_id, args.user_id)
+        else:
+            from group_admin import bulk_group_action, read_id_file
+
+            if args.all_pending:
+                user_ids = directory().members(args.group_id, refresh=True).get("pending") or []
+            else:
+                user_ids = read_id_file(args.users_file)
+            result = bulk_group_action(user_ids, lambda uid: decide(args.group_id, uid), args.concurrency)
+        directory().invalidate(args.group_id)
+    elif action == "leave":
+        result = gc.leave_group(args.group_id)
+        directory().invalidate(args.group_id)
+    elif action == "push" and args.file:
+        from attachments import send_attachment
+
+        result = send_attachment(
+            args.file,
+            lambda payload: gc.group_push({**payload, "groupId": args.group_id}),
+            target=args.group_id,
             ttl_seconds=args.ttl_seconds,
             crypto_suite=args.crypto_suite,
-            signing_key_b64=getattr(args, "signing_key_b64", None),
-            debug=getattr(args, "debug", False),
+            chunk_size=args.chunk_size,
+            concurrency=args.concurrency,
+            state_dir=args.outbox_dir / user_id / "attachments",
         )
-    else:
-        signing_key = signing_key_from_b64(args.signing_key_b64) if args.signing_key_b64 else None
-        material = None
-        if signing_key is None:
-            signing_key, material = signing_key_from_file(args.key_file)
-
-        base_url = resolve_base_url(args.base_url, args.config_file)
-        result = login_flow(base_url, signing_key)
-        if material:
-            derived = derive_user_id(signing_key.verify_key.encode())
-            if derived != material.user_id:
-                raise RuntimeError("Stored key mismatch after load: derived userId does not match stored userId")
+        if not result["failed"]:
+            MESSAGES_SENT.inc(kind="group")
+    elif action == "push":
+        from messaging import make_plaintext_payload
+
+        payload = make_plaintext_payload(args.text, args.ttl_seconds, crypto_suite=args.crypto_suite, stamp=args.measure_latency)
+        payload["groupId"] = args.group_id
+        result = gc.group_push(payload)
+        MESSAGES_SENT.inc(kind="group")
+    else:  # pull
+        from attachments import AttachmentAssembler
+        from delivery import DeliveryStats
+
+        pulled = gc.group_pull(args.group_id, args.cursor, args.limit)
+        delivery = DeliveryStats()
+        delivery.record(pulled.get("items", []), "group", "poll", lambda item: args.group_id)
+        # attachment chunks are written to --download-dir; the rest is returned as-is
+        rest, ids, completed = AttachmentAssembler(args.download_dir).absorb(pulled.get("items", []))
+        # auto-ack/del/read/delete to mirror direct mailbox behaviour
+        items = pulled.get("items", [])
+        ids += [item.get("id") for item in rest if item.get("id")]
+        if ids:
+            gc.group_ack_delivered(ids)
+            gc.group_ack_read(ids)
+            gc.group_delete(ids)
+        MESSAGES_RECEIVED.inc(len(items), kind="group")
+        result = {**pulled, "items": rest}
+        if completed:
+            result["attachments"] = completed
+        if delivery.summary():
+            result["delivery"] = delivery.summary()
+            delivery.save(args.stats_file)
+    return {"userId": user_id, "result": result}
+
+
+def _cmd_groupchat(args) -> int:
+    from group_chat import run_group_chat_console
+
+    base_url = _base_url(args)
+    return run_group_chat_console(
+        base_url=base_url,
+        key_file=args.key_file,
+        group_id=args.group_id,
+        limit=args.limit,
+        poll_interval=args.poll_interval,
+        ttl_seconds=args.ttl_seconds,
+        crypto_suite=args.crypto_suite,
+        signing_key_b64=getattr(args, "signing_key_b64", None),
+        debug=getattr(args, "debug", False),
+        outbox_dir=args.outbox_dir,
+        download_dir=args.download_dir,
+        chunk_size=args.chunk_size,
+        ui=args.ui,
+        coalesce_window=args.coalesce_ms / 1000.0,
+        stream=args.stream,
+        measure_latency=args.measure_latency,
+        stats_path=args.stats_file,
+        relogin=lambda: _login(args, base_url, refresh=True),
+    )
+
+
+def _cmd_login(args) -> Dict[str, Any]:
+    return _login(args, _base_url(args))
+
+
+def _cmd_agent(args) -> Dict[str, Any]:
+    from agent_client import AgentClient
+
+    client = AgentClient(args.agent_socket)
+    action = args.agent_action
+    if action == "start":
+        if args.detach:
+            import subprocess
+            import sys
+            import time
+
+            from agent_client import AgentUnavailable
+
+            argv = ["agent", "start", "--agent-socket", str(args.agent_socket), "--token-ttl", str(args.token_ttl)]
+            for key_file in args.add_keys:
+                argv += ["--add-key", str(key_file)]
+            proc = subprocess.Popen(
+                [sys.executable, __file__, *argv],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+            deadline = time.monotonic() + 10
+            while proc.poll() is None and time.monotonic() < deadline:
+                try:
+                    client.list()
+                    return {"pid": proc.pid, "socket": str(args.agent_socket)}
+                except AgentUnavailable:
+                    time.sleep(0.05)
+            raise RuntimeError("agent failed to start")
+
+        from agent import run_agent
+
+        run_agent(args.agent_socket, key_files=args.add_keys, token_ttl=args.token_ttl, debug=args.debug)
+        return {"stopped": str(args.agent_socket)}
+    if action == "stop":
+        client.stop()
+        return {"stopped": str(args.agent_socket)}
+    if action == "add":
+        if getattr(args, "signing_key_b64", None):
+            return {"userId": client.add(signing_key_b64=args.signing_key_b64)}
+        return {"userId": client.add(key_file=args.key_file)}
+    return {"identities": client.list()}
+
+
+def _cmd_loadgen(args) -> Dict[str, Any]:
+    from loadgen import run_loadgen
+
+    if args.users < 2:
+        raise RuntimeError("--users must be at least 2")
+    return run_loadgen(
+        base_url=_base_url(args),
+        users=args.users,
+        groups=args.groups,
+        rate=args.rate,
+        duration=args.duration,
+        workers=args.workers,
+        group_ratio=args.group_ratio,
+        drain_interval=args.drain_interval,
+        limit=args.limit,
+        key_dir=args.key_dir,
+        sockets=args.sockets,
+        on_log=lambda line: print(line, file=sys.stderr),  # stdout carries the report (--json)
+    )
+
+
+def _cmd_stats(args) -> Dict[str, Any]:
+    from delivery import load_stats
+
+    if args.reset:
+        args.stats_file.unlink(missing_ok=True)
+        return {"statsFile": str(args.stats_file), "series": []}
+    return {"statsFile": str(args.stats_file), "series": load_stats(args.stats_file).summary()}
+
+
+# Interactive commands return an exit code; the rest return a result to print.
+CONSOLE_COMMANDS: Dict[str, Callable[[Any], int]] = {
+    "mailbox": _cmd_mailbox,
+    "groupchat": _cmd_groupchat,
+}
+COMMANDS: Dict[str, Callable[[Any], Dict[str, Any]]] = {
+    "init": _cmd_init,
+    "register": _cmd_register,
+    "group": _cmd_group,
+    "login": _cmd_login,
+    "agent": _cmd_agent,
+    "loadgen": _cmd_loadgen,
+    "stats": _cmd_stats,
+    "endpoints": _cmd_endpoints,
+}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+
+    if args.command not in {"init", "stats", "login"}:
+        _configure_transport(args)
+    if getattr(args, "metrics_port", None):
+        from metrics import serve_prometheus
+
+        serve_prometheus(args.metrics_port)
+    profiler = None
+    if getattr(args, "trace", None) or getattr(args, "profile", None):
+        from tracing import TRACER, ProfileSession
+
+        if args.trace:
+            TRACER.enable()
+        if args.profile:
+            profiler = ProfileSession()
+            profiler.start()
+    try:
+        if args.command in CONSOLE_COMMANDS:
+            return CONSOLE_COMMANDS[args.command](args)
+        result = COMMANDS[args.command](args)
+    finally:
+        if profiler is not None:
+            profiler.stop(args.profile)
+        if getattr(args, "trace", None):
+            TRACER.write(args.trace)
+        if getattr(args, "metrics_json", None):
+            from metrics import REGISTRY
+
+            REGISTRY.dump_json(args.metrics_json)
 
     if getattr(args, "as_json", False):
         print(json.dumps(result, indent=2))
@@ -130,12 +441,48 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
             print(MADELIN_ASCII_ART)
             print("baseUrl stored at:", result["storedAt"])
             print("baseUrl:", result["base_url"])
+            if len(result["base_urls"]) > 1:
+                print("replicas:", ", ".join(result["base_urls"]))
+        elif args.command == "register" and "throughput" in result:
+            print(f"registered: {result['registered']}/{result['requested']}")
+            print("failed:", len(result["failed"]))
+            print("storedAt:", result["storedAt"])
+            for stage, seconds in result["timings"].items():
+                print(f"{stage}: {seconds}")
+            for stage, rate in result["throughput"].items():
+                print(f"{stage}: {rate}")
         elif args.command == "register":
             print("mnemonic:", result["mnemonic"])
             print("publicKey:", result["keys"]["public_key_b64"])
             print("privateKey:", result.get("privateKeyB64") or result["keys"]["signing_key_b64"])
             print("userId:", result["keys"]["user_id"])
             print("storedAt:", result["storedAt"])
+        elif args.command == "loadgen":
+            print(f"users: {result['users']}  groups: {result['groups']}  duration: {result['durationSeconds']}s")
+            print(f"sent: {result['sent']}/{result['scheduled']} ({result['sendRatePerSecond']}/s, target {result['targetRate']}/s)")
+            print(f"received: {result['received']} ({result['receiveRatePerSecond']}/s)")
+            if args.sockets:
+                print(f"sockets: {result['socketsOnline']} online, {result['socketConnectFailures']} failed to connect")
+            print(f"{'operation':20} {'ok':>7} {'err%':>6} {'p50ms':>9} {'p95ms':>9} {'p99ms':>9}")
+            for op, stats in result["operations"].items():
+                print(
+                    f"{op:20} {stats['ok']:>7} {stats['errorRate'] * 100:>6.2f} "
+                    f"{stats.get('p50Ms', '-'):>9} {stats.get('p95Ms', '-'):>9} {stats.get('p99Ms', '-'):>9}"
+                )
+                if stats["errors"]:
+                    print(" " * 21 + ", ".join(f"{k}: {v}" for k, v in stats["errors"].items()))
+        elif args.command == "endpoints":
+            for row in result["endpoints"]:
+                latency = f"{row['latencyMs']} ms" if row["latencyMs"] is not None else "unreachable"
+                print(f"{'*' if row['current'] else ' '} {row['url']:40} {latency}")
+        elif args.command == "stats":
+            from delivery import format_summary
+
+            for line in format_summary(result["series"]):
+                print(line)
+        elif args.command == "agent":
+            for key, value in result.items():
+                print(f"{key}:", value)
         elif args.command == "group":
             res = result.get("result", result)
             if args.group_action in {"list", "list-mine"}:
@@ -155,6 +502,11 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
                         gid = g.get("groupId") or g.get("group_id") or g.get("id")
                         if gid:
                             print(f"\033[36m{gid}\033[0m")  # member in cyan
+            elif isinstance(res, dict) and "items" in res and "succeeded" in res:
+                for item in res["items"]:
+                    status = "ok" if item["ok"] else f"FAILED {item['error']}"
+                    print(f"{item['id']}: {status}")
+                print(f"succeeded: {res['succeeded']}/{res['requested']}  failed: {res['failed']}  ({res['seconds']}s)")
             else:
                 print("userId:", result.get("userId"))
                 print("result:", res)
@@ -2,90 +2,156 @@ from __future__ import annotations
 
 import hashlib
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 from uuid import uuid4
 
 import requests
 
-from crypto_utils import b64d, b64e
+from codec import StreamedPage
+from crypto_utils import b64d, b64e, encode_aad_meta
+from metrics import DRAIN_BACKLOG, MESSAGES_RECEIVED
+from tracing import span
+from transport import UNSUPPORTED_STATUS, Transport, as_transport, get_default_transport
 
-_COLORS = ["\033[32m", "\033[36m", "\033[35m", "\033[33m", "\033[34m"]
+_COLORS = ["\033[32m", "\033[36m", "\033[35m", "\033[33m", "\033[34m"]  # green, cyan, magenta, yellow, blue
+PALETTE_SIZE = len(_COLORS)
 
 
-def _color_for_user(user_id: str) -> str:
+def color_index_for_user(user_id: str, palette_size: int = PALETTE_SIZE) -> int:
     if not user_id:
-        return _COLORS[0]
+        return 0
     h = hashlib.sha1(user_id.encode("utf-8")).digest()
-    idx = h[0] % len(_COLORS)
-    return _COLORS[idx]
+    return h[0] % palette_size
+
+
+def _color_for_user(user_id: str) -> str:
+    return _COLORS[color_index_for_user(user_id)]
 
 
 @dataclass
 class MailboxClient:
     base_url: str
     token: str
-    session: requests.Session = field(default_factory=requests.Session)
+    transport: Transport = field(default_factory=get_default_transport)
+    session: Optional[requests.Session] = None  # pre-Transport API; wrapped in a Transport of its own
+
+    def __post_init__(self) -> None:
+        self.transport = as_transport(self.session if self.session is not None else self.transport)
 
     def _headers(self) -> Dict[str, str]:
         return {"Authorization": f"Bearer {self.token}"}
 
     def pull(self, cursor: Optional[str], limit: int) -> Dict[str, Any]:
-        r = self.session.get(
+        r = self.transport.request(
+            "GET",
+            f"{self.base_url}/mailbox/pull",
+            params={"cursor": cursor, "limit": limit},
+            headers=self._headers(),
+            endpoint="mailbox.pull",
+            idempotent=True,
+            compact=True,
+        )
+        r.raise_for_status()
+        return self.transport.decode(r)
+
+    def pull_stream(self, cursor: Optional[str], limit: int) -> StreamedPage:
+        """`pull`, but items are parsed off the wire one at a time; `nextCursor` is known once iterated."""
+        r = self.transport.request(
+            "GET",
             f"{self.base_url}/mailbox/pull",
             params={"cursor": cursor, "limit": limit},
             headers=self._headers(),
-            timeout=20,
+            endpoint="mailbox.pull",
+            idempotent=True,
+            compact=True,
+            stream=True,
         )
+        if not r.ok:
+            r.close()
         r.raise_for_status()
-        return r.json()
+        return self.transport.decode_stream(r)
 
     def ack_delivered(self, ids: List[str]) -> None:
         if not ids:
             return
-        r = self.session.post(
+        r = self.transport.request(
+            "POST",
             f"{self.base_url}/mailbox/ack/delivered",
             json={"ids": ids},
             headers=self._headers(),
-            timeout=20,
+            endpoint="mailbox.ack_delivered",
+            idempotent=True,
         )
         r.raise_for_status()
 
     def ack_read(self, ids: List[str]) -> None:
         if not ids:
             return
-        r = self.session.post(
+        r = self.transport.request(
+            "POST",
             f"{self.base_url}/mailbox/ack/read",
             json={"ids": ids},
             headers=self._headers(),
-            timeout=20,
+            endpoint="mailbox.ack_read",
+            idempotent=True,
         )
         r.raise_for_status()
 
     def delete(self, ids: List[str]) -> None:
         if not ids:
             return
-        r = self.session.post(
+        r = self.transport.request(
+            "POST",
             f"{self.base_url}/mailbox/delete",
             json={"ids": ids},
             headers=self._headers(),
-            timeout=20,
+            endpoint="mailbox.delete",
+            idempotent=True,
         )
         r.raise_for_status()
 
     def push(self, recipient_user_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         body = {"recipientUserId": recipient_user_id, **payload}
-        r = self.session.post(
+        r = self.transport.request(
+            "POST",
             f"{self.base_url}/mailbox/push",
             json=body,
             headers=self._headers(),
-            timeout=20,
+            endpoint="mailbox.push",
+            compact=True,
         )
         r.raise_for_status()
-        return r.json()
+        return self.transport.decode(r)
+
+    def push_many(self, messages: Sequence[Tuple[str, Dict[str, Any]]], ordered: bool = False) -> List[Dict[str, Any]]:
+        """
+        Push (recipientUserId, payload) pairs in one request via /mailbox/push-batch;
+        servers without it get single pushes instead (remembered per host): one
+        after another with `ordered` (a chat burst must arrive as typed), else
+        concurrently.
+        """
+        url = f"{self.base_url}/mailbox/push-batch"
+        if len(messages) > 1 and self.transport.supports(url, "batch"):
+            r = self.transport.request(
+                "POST",
+                url,
+                json={"items": [{"recipientUserId": recipient, **payload} for recipient, payload in messages]},
+                headers=self._headers(),
+                endpoint="mailbox.push_batch",
+            )
+            if r.status_code not in UNSUPPORTED_STATUS:
+                r.raise_for_status()
+                return r.json().get("items", [])
+            self.transport.mark_unsupported(url, "batch")
+        if ordered:
+            return [self.push(*message) for message in messages]
+        return self.transport.map_concurrent(lambda message: self.push(*message), messages)
 
 
-def make_plaintext_payload(text: str, ttl_seconds: int, crypto_suite: int = 0) -> Dict[str, Any]:
+def make_plaintext_payload(text: str, ttl_seconds: int, crypto_suite: int = 0, stamp: bool = False) -> Dict[str, Any]:
+    """With `stamp`, the send time rides along in `aad` so receivers can measure delivery latency."""
     nonce = b64e(uuid4().bytes)
     ciphertext = b64e(text.encode("utf-8"))
     message_id = b64e(uuid4().bytes)
@@ -95,43 +161,140 @@ def make_plaintext_payload(text: str, ttl_seconds: int, crypto_suite: int = 0) -
         "threadId": thread_id,
         "nonce": nonce,
         "ciphertext": ciphertext,
-        "aad": "",
+        "aad": encode_aad_meta({"sentAt": round(time.time(), 3)}) if stamp else "",
         "cryptoSuite": crypto_suite,
         "ttlSeconds": ttl_seconds,
     }
 
 
-def process_pull_items(items: List[Dict[str, Any]]) -> List[str]:
+def decode_item(item: Dict[str, Any]) -> Tuple[Optional[str], str, str]:
+    """Turn one pulled item into (id, sender, text); this is where decryption plugs in."""
+    ciphertext = item.get("ciphertext")
+    text = ""
+    if ciphertext:
+        try:
+            text = b64d(ciphertext).decode("utf-8", errors="replace")
+        except Exception:
+            text = "<unable to decode>"
+    return item.get("id"), item.get("senderUserId", "unknown"), text
+
+
+def decode_items(items: List[Dict[str, Any]]) -> List[Tuple[Optional[str], str, str]]:
+    """
+    Decode a page in pull order. Deliberately serial: base64 and UTF-8 work
+    holds the GIL, so a thread pool only adds handoffs. drain_pages overlaps
+    it with the network instead.
+    """
+    with span("decode", items=len(items)):
+        return [decode_item(item) for item in items]
+
+
+def process_pull_items(items: List[Dict[str, Any]], emit: Optional[Callable[[str, str], None]] = None) -> List[str]:
+    """Render pulled items (to stdout, or to `emit(sender, text)`) and return their ids for acking."""
     ids = []
-    for idx, item in enumerate(items):
-        ids.append(item.get("id"))
-        ciphertext = item.get("ciphertext")
-        text = ""
-        if ciphertext:
-            try:
-                text = b64d(ciphertext).decode("utf-8", errors="replace")
-            except Exception:
-                text = "<unable to decode>"
-        sender = item.get("senderUserId", "unknown")
+    for idx, (item_id, sender, text) in enumerate(decode_items(items)):
+        ids.append(item_id)
+        if emit is not None:
+            emit(sender, text)
+            continue
         prefix = "\n" if idx == 0 else ""
         color = _color_for_user(sender)
         print(f"{prefix}{color}{sender}> {text}\033[0m", end="")
     return [i for i in ids if i]
 
 
-def process_group_pull_items(items: List[Dict[str, Any]]) -> List[str]:
+def process_group_pull_items(items: List[Dict[str, Any]], emit: Optional[Callable[[str, str], None]] = None) -> List[str]:
     ids = []
-    for idx, item in enumerate(items):
-        ids.append(item.get("id"))
-        ciphertext = item.get("ciphertext")
-        text = ""
-        if ciphertext:
-            try:
-                text = b64d(ciphertext).decode("utf-8", errors="replace")
-            except Exception:
-                text = "<unable to decode>"
-        sender = item.get("senderUserId", "unknown")
+    for idx, (item_id, sender, text) in enumerate(decode_items(items)):
+        ids.append(item_id)
+        if emit is not None:
+            emit(sender, text)
+            continue
         prefix = "\n" if idx == 0 else ""
         color = _color_for_user(sender)
         print(f"{prefix}{color}{sender}> {text}\033[0m")
     return [i for i in ids if i]
+
+
+def drain_pages(
+    pull: Callable[[Optional[str]], Any],
+    render: Callable[[List[Dict[str, Any]]], List[str]],
+    acks: Sequence[Callable[[List[str]], None]],
+    should_stop: Callable[[], bool] = lambda: False,
+    on_log: Optional[Callable[[str], None]] = None,
+    kind: str = "direct",
+    prefetch: bool = True,
+    stream: bool = False,
+) -> int:
+    """
+    Pull pages until the cursor runs out, rendering then acking each; returns items processed.
+
+    With `prefetch`, the next page is fetched while the current one is decoded,
+    rendered and acked, so network and CPU overlap; pages are still rendered
+    and acked strictly in order, and a page is acked only once it rendered.
+
+    With `stream`, `pull` returns a StreamedPage and each item is rendered as
+    soon as it is parsed, so memory holds one message rather than one page.
+    There is no prefetch then: the next cursor is only known at the page's end.
+    """
+    if stream:
+        return _drain_streamed(pull, render, acks, should_stop, on_log or (lambda _: None), kind)
+    log = on_log or (lambda _: None)
+    cursor = None
+    drained = 0
+    fetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch") if prefetch else None
+    try:
+        pending = fetcher.submit(pull, cursor) if fetcher else None
+        while not should_stop():
+            pulled = pending.result() if pending else pull(cursor)
+            items = pulled.get("items", [])
+            log(f"pulled {len(items)} items cursor={cursor} next={pulled.get('nextCursor')}")
+            cursor = pulled.get("nextCursor")
+            more = bool(cursor and items)
+            pending = fetcher.submit(pull, cursor) if fetcher and more else None
+            with span("render", items=len(items)):
+                ids = render(items)
+            if ids:
+                with span("ack", ids=len(ids)):
+                    for ack in acks:
+                        ack(ids)
+            drained += len(items)
+            MESSAGES_RECEIVED.inc(len(items), kind=kind)
+
+            if not more:
+                break
+    finally:
+        if fetcher:
+            fetcher.shutdown(wait=True)
+    DRAIN_BACKLOG.observe(drained, kind=kind)
+    return drained
+
+
+def _drain_streamed(
+    pull: Callable[[Optional[str]], StreamedPage],
+    render: Callable[[List[Dict[str, Any]]], List[str]],
+    acks: Sequence[Callable[[List[str]], None]],
+    should_stop: Callable[[], bool],
+    log: Callable[[str], None],
+    kind: str,
+) -> int:
+    cursor = None
+    drained = 0
+    while not should_stop():
+        ids: List[str] = []
+        with pull(cursor) as page:
+            with span("render", streamed=True):
+                for item in page:
+                    ids.extend(render([item]))
+        log(f"streamed {page.count} items cursor={cursor} next={page.get('nextCursor')}")
+        if ids:
+            with span("ack", ids=len(ids)):
+                for ack in acks:
+                    ack(ids)
+        drained += page.count
+        MESSAGES_RECEIVED.inc(page.count, kind=kind)
+        cursor = page.get("nextCursor")
+        if not (cursor and page.count):
+            break
+    DRAIN_BACKLOG.observe(drained, kind=kind)
+    return drained
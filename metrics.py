@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import bisect
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+def _key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def percentiles_ms(samples: Sequence[float], digits: int = 3) -> Dict[str, float]:
+    """Nearest-rank p50/p95/p99/max of `samples` (seconds), in milliseconds; empty when there are none."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+
+    def pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000, digits)
+
+    return {"p50Ms": pct(50), "p95Ms": pct(95), "p99Ms": pct(99), "maxMs": round(ordered[-1] * 1000, digits)}
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1.0, **labels: Any) -> None:
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_fmt_labels(k)} {_fmt_value(v)}" for k, v in sorted(self._values.items())]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"labels": dict(k), "value": v} for k, v in sorted(self._values.items())]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, Tuple[List[int], List[float]]] = {}  # key -> (bucket counts, [sum, count])
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, totals = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0, 0]))
+            counts[idx] += 1
+            totals[0] += value
+            totals[1] += 1
+
+    def render(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, (total, count)) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    lines.append(f"{self.name}_bucket{_fmt_labels(key, ('le', _fmt_value(bound)))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_fmt_labels(key, ('le', '+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{_fmt_labels(key)} {_fmt_value(total)}")
+                lines.append(f"{self.name}_count{_fmt_labels(key)} {count}")
+        return lines
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "labels": dict(key),
+                    "count": count,
+                    "sum": total,
+                    "buckets": {_fmt_value(b): n for b, n in zip(self.buckets, counts)} | {"+Inf": counts[-1]},
+                }
+                for key, (counts, (total, count)) in sorted(self._series.items())
+            ]
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {m.name: {"type": m.kind, "help": m.help, "series": m.snapshot()} for m in metrics}
+
+    def dump_json(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.snapshot(), indent=2), encoding="utf-8")
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter("madelin_http_requests_total", "HTTP requests sent, by endpoint and method (retries included)")
+HTTP_ERRORS = REGISTRY.counter("madelin_http_errors_total", "Failed HTTP attempts, by endpoint and status code or exception")
+HTTP_RETRIES = REGISTRY.counter("madelin_http_retries_total", "Automatic retries of idempotent requests, by endpoint")
+HTTP_THROTTLED = REGISTRY.counter("madelin_http_throttled_total", "429 Too Many Requests responses, by endpoint")
+RATE_LIMIT_WAIT = REGISTRY.histogram("madelin_rate_limit_wait_seconds", "Time requests were held back by the client-side rate limiter, by endpoint")
+HTTP_LATENCY = REGISTRY.histogram("madelin_http_request_seconds", "Latency of each HTTP attempt, by endpoint")
+LOGIN_LATENCY = REGISTRY.histogram("madelin_login_seconds", "Full register+challenge+verify login latency")
+AUTH_REFRESHES = REGISTRY.counter("madelin_auth_refresh_total", "Token refreshes triggered by a 401")
+MESSAGES_RECEIVED = REGISTRY.counter("madelin_messages_received_total", "Messages pulled and rendered, by kind")
+MESSAGES_SENT = REGISTRY.counter("madelin_messages_sent_total", "Messages accepted by the server, by kind")
+DELIVERY_LATENCY = REGISTRY.histogram(
+    "madelin_delivery_seconds",
+    "Push-to-render latency of timestamped messages, by kind and trigger (socket/poll)",
+)
+DRAIN_BACKLOG = REGISTRY.histogram("madelin_drain_backlog_items", "Messages drained per pull cycle, by kind", COUNT_BUCKETS)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = REGISTRY
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] not in {"/", "/metrics"}:
+            self.send_error(404)
+            return
+        body = self.registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve_prometheus(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Expose REGISTRY at http://host:port/metrics from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from rate_limit import RateLimitedError
+from retry_policy import CircuitOpenError, is_retryable_error
+from storage import load_spool_entries, save_json_atomic
+from tracing import span
+
+
+class Outbox:
+    """
+    Durable outbound queue:
+      - every message is spooled to disk before it is sent
+      - a background thread sends entries in order
+      - 5xx/timeouts are retried with exponential backoff, resending the
+        same payload (and thus the same client-generated messageId)
+      - entries rejected for good are moved to `failed/` instead of dropped
+      - with `send_many`, entries arriving within `coalesce_window` seconds of
+        each other go out together (up to `max_batch`); a batch rejected for
+        good is retried entry by entry so one bad message can't sink the rest
+    """
+
+    def __init__(
+        self,
+        spool_dir: Path,
+        send: Callable[[Dict[str, Any]], Any],
+        on_sent: Optional[Callable[[Dict[str, Any]], None]] = None,
+        on_log: Optional[Callable[[str], None]] = None,
+        base_backoff: float = 0.5,
+        max_backoff: float = 60.0,
+        send_many: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+        coalesce_window: float = 0.05,
+        max_batch: int = 50,
+    ) -> None:
+        self._spool_dir = spool_dir
+        self._send = send
+        self._send_many = send_many
+        self._coalesce_window = coalesce_window
+        self._max_batch = max(1, max_batch)
+        self._on_sent = on_sent or (lambda _: None)
+        self._log = on_log or (lambda _: None)
+        self._base_backoff = base_backoff
+        self._max_backoff = max_backoff
+        self._queue: Deque[Tuple[Path, Dict[str, Any]]] = deque()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._seq = 0
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def start(self) -> None:
+        pending = load_spool_entries(self._spool_dir)
+        if pending:
+            self._log(f"outbox resuming {len(pending)} spooled messages from {self._spool_dir}")
+        with self._cond:
+            self._queue.extend(pending)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def enqueue(self, entry: Dict[str, Any]) -> None:
+        with self._cond:
+            self._seq += 1
+            name = f"{time.time_ns():020d}-{self._seq:06d}.json"
+            path = self._spool_dir / name
+            save_json_atomic(path, entry)
+            self._queue.append((path, entry))
+            self._cond.notify()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the queue is empty; returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(timeout=remaining)
+        return True
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        remaining = len(self)
+        if remaining:
+            self._log(f"outbox stopped with {remaining} messages spooled in {self._spool_dir}")
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self._max_backoff, self._base_backoff * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _next_batch(self, limit: int) -> List[Tuple[Path, Dict[str, Any]]]:
+        """Head of the queue, plus whatever else arrives within the coalescing window."""
+        with self._cond:
+            while not self._queue and not self._stop.is_set():
+                self._cond.wait()
+            if self._stop.is_set():
+                return []
+            if limit > 1 and self._coalesce_window > 0:
+                deadline = time.monotonic() + self._coalesce_window
+                while len(self._queue) < limit and not self._stop.is_set():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(timeout=remaining)
+            return [self._queue[i] for i in range(min(limit, len(self._queue)))]
+
+    def _deliver(self, batch: List[Tuple[Path, Dict[str, Any]]], attempt: int) -> None:
+        with span("outbox_send", attempt=attempt, entries=len(batch)):
+            if len(batch) == 1:
+                self._send(batch[0][1])
+            else:
+                self._send_many([entry for _, entry in batch])
+
+    def _run(self) -> None:
+        attempt = 0
+        solo = 0  # entries to send one by one after a batch was rejected
+        while not self._stop.is_set():
+            limit = self._max_batch if self._send_many is not None and not solo else 1
+            batch = self._next_batch(limit)
+            if not batch:
+                return
+
+            try:
+                self._deliver(batch, attempt)
+            except Exception as e:
+                if is_retryable_error(e) or isinstance(e, (CircuitOpenError, RateLimitedError)):
+                    delay = self._backoff(attempt)
+                    attempt += 1
+                    self._log(f"outbox send failed ({e}); retry #{attempt} in {delay:.1f}s")
+                    self._stop.wait(delay)
+                    continue
+                if len(batch) > 1:
+                    self._log(f"outbox batch of {len(batch)} rejected ({e}); resending one by one")
+                    solo = len(batch)
+                    continue
+                rejected: Optional[Exception] = e
+            else:
+                rejected = None
+
+            try:
+                if rejected is not None:
+                    self._move_to_failed(batch[0][0], rejected)
+                else:
+                    for path, entry in batch:
+                        path.unlink(missing_ok=True)
+                        self._report_sent(entry)
+            except OSError as e:
+                self._log(f"outbox could not clean up spool files ({e})")
+            finally:
+                attempt = 0
+                solo = max(0, solo - len(batch))
+                with self._cond:
+                    for _ in batch:
+                        self._queue.popleft()
+                    self._cond.notify_all()
+
+    def _move_to_failed(self, path: Path, error: Exception) -> None:
+        self._log(f"outbox send rejected ({error}); moved to {self._spool_dir / 'failed'}")
+        failed = self._spool_dir / "failed" / path.name
+        failed.parent.mkdir(parents=True, exist_ok=True)
+        path.replace(failed)
+
+    def _report_sent(self, entry: Dict[str, Any]) -> None:
+        # A failing callback must not take the sender thread down with it.
+        try:
+            self._on_sent(entry)
+        except Exception as e:
+            self._log(f"outbox on_sent callback failed ({e})")
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from api_client import MadelinClient
+from crypto_utils import b64e, generate_signing_key_from_mnemonic, signing_key_from_b64
+from models import KeyMaterial
+from storage import load_cache, save_key_index, save_key_material
+
+
+def _derive_one(_: int) -> Tuple[str, str]:
+    # Runs in a worker process: BIP-39 to_seed is 2048 rounds of PBKDF2-HMAC-SHA512.
+    phrase, _seed, signing_key = generate_signing_key_from_mnemonic(None)
+    return phrase, b64e(signing_key.encode())
+
+
+def _rate(n: int, seconds: float) -> float:
+    return round(n / seconds, 2) if seconds > 0 else 0.0
+
+
+def bulk_register_flow(
+    base_url: str,
+    key_dir: Path,
+    count: int,
+    store_mnemonic: bool,
+    processes: Optional[int] = None,
+    concurrency: int = 16,
+) -> Dict[str, Any]:
+    """
+    Provision `count` identities:
+      - derive keys across a process pool
+      - register them with `concurrency` parallel requests on the shared transport
+      - write each key file as soon as its identity is registered, so an
+        interrupted run keeps what it already has
+      - add every identity to `index.json`, failed ones marked "failed";
+        entries from earlier runs into the same directory are kept
+    """
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        derived = list(pool.map(_derive_one, range(count), chunksize=max(1, count // 64)))
+    materials = [
+        KeyMaterial.from_signing_key(signing_key_from_b64(sk_b64), mnemonic=phrase if store_mnemonic else None)
+        for phrase, sk_b64 in derived
+    ]
+    t1 = time.perf_counter()
+
+    client = MadelinClient(base_url=base_url)
+
+    def register(material: KeyMaterial) -> Dict[str, str]:
+        try:
+            client.register(material.public_key_b64)
+        except Exception as e:
+            return {"userId": material.user_id, "status": "failed", "error": repr(e)}
+        path = key_dir / f"{material.user_id}.json"
+        save_key_material(path, material, store_mnemonic=store_mnemonic)
+        return {"userId": material.user_id, "status": "registered", "keyFile": str(path)}
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        index = list(pool.map(register, materials))
+    t2 = time.perf_counter()
+
+    index_path = key_dir / "index.json"
+    fresh = {entry["userId"] for entry in index}
+    earlier = [entry for entry in load_cache(index_path).get("identities", []) if entry.get("userId") not in fresh]
+    save_key_index(index_path, earlier + index)
+    t3 = time.perf_counter()
+    registered = sum(1 for entry in index if entry["status"] == "registered")
+    failed = [{"userId": entry["userId"], "error": entry["error"]} for entry in index if entry["status"] == "failed"]
+
+    return {
+        "requested": count,
+        "registered": registered,
+        "failed": failed,
+        "storedAt": str(key_dir),
+        "timings": {
+            "deriveSeconds": round(t1 - t0, 3),
+            "registerSeconds": round(t2 - t1, 3),
+            "writeSeconds": round(t3 - t2, 3),
+            "totalSeconds": round(t3 - t0, 3),
+        },
+        "throughput": {
+            "derivePerSecond": _rate(count, t1 - t0),
+            "registerPerSecond": _rate(count, t2 - t1),
+            "overallPerSecond": _rate(registered, t3 - t0),
+        },
+    }
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Deque, Dict, Optional, Tuple
+
+
+# Longest a request will wait for its bucket; a longer Retry-After fails fast with RateLimitedError.
+MAX_WAIT = 300.0
+
+
+class RateLimitedError(RuntimeError):
+    """The server asked us to hold off for longer than the caller is willing to wait."""
+
+    def __init__(self, endpoint: str, seconds: float) -> None:
+        super().__init__(f"{endpoint} rate limited for another {seconds:.0f}s")
+        self.seconds = seconds
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """
+    Token bucket whose rate adapts to the server (AIMD):
+      - unlimited (`rate=None`) until the first 429, then set just under the
+        rate we were actually sending at
+      - every 429 halves the rate and pauses until Retry-After has passed
+      - every success adds back roughly `increase` requests/s per second, so the
+        rate creeps up to the server's limit instead of bouncing off it
+    A request that would have to wait longer than `max_wait` raises
+    RateLimitedError instead of sleeping.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: float = 10.0,
+        min_rate: float = 0.5,
+        decrease: float = 0.5,
+        increase: float = 1.0,
+        max_rate: float = 1000.0,
+        max_wait: float = MAX_WAIT,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.decrease = decrease
+        self.increase = increase
+        self.max_rate = max_rate
+        self.max_wait = max_wait
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._recent: Deque[float] = deque()  # send times within the last second
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        if self.rate is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, name: str = "request") -> float:
+        """Block until a request may be sent; returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    delay = self._blocked_until - now
+                elif self.rate is None or self._tokens >= 1:
+                    if self.rate is not None:
+                        self._tokens -= 1
+                    self._recent.append(now)
+                    while self._recent and self._recent[0] < now - 1.0:
+                        self._recent.popleft()
+                    return waited
+                else:
+                    delay = (1 - self._tokens) / self.rate
+            if waited + delay > self.max_wait:
+                raise RateLimitedError(name, delay)
+            time.sleep(delay)
+            waited += delay
+
+    def on_throttled(self, retry_after: Optional[float]) -> None:
+        with self._lock:
+            now = time.monotonic()
+            # Requests already in flight when the first 429 arrived come back
+            # throttled too; count that as one signal, not one halving each.
+            if now >= self._blocked_until:
+                current = self.rate if self.rate is not None else max(float(len(self._recent)), self.min_rate)
+                self.rate = max(self.min_rate, current * self.decrease)
+                self._tokens = min(self._tokens, 0.0)
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self._blocked_until = max(self._blocked_until, now + pause)
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self.rate is None:
+                return
+            self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+
+class RateLimiter:
+    """One adaptive TokenBucket per (host, endpoint), shared by every client on a Transport."""
+
+    def __init__(self, initial_rate: Optional[float] = None, burst: float = 10.0, max_wait: float = MAX_WAIT) -> None:
+        self.initial_rate = initial_rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host: str, endpoint: str) -> TokenBucket:
+        key = (host, endpoint)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.initial_rate, self.burst, max_wait=self.max_wait)
+            return bucket
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import Callable, Optional
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
 
 
 def get_socketio_client():
@@ -11,6 +12,15 @@ def get_socketio_client():
     return socketio
 
 
+def get_async_socketio_client():
+    socketio = get_socketio_client()
+    try:
+        import aiohttp  # type: ignore  # noqa: F401  (AsyncClient's websocket transport)
+    except ImportError as exc:  # pragma: no cover - dependency notice
+        raise RuntimeError("Dependency missing: install 'python-socketio[asyncio_client]'") from exc
+    return socketio
+
+
 class RealtimeClient:
     def __init__(self, base_url: str, user_id: str, token: str, on_direct: Callable[[object], None], on_log: Optional[Callable[[str], None]] = None) -> None:
         socketio = get_socketio_client()
@@ -56,3 +66,102 @@ class RealtimeClient:
             self._sio.disconnect()
         except Exception:
             pass
+
+
+class AsyncRealtimeHub:
+    """
+    Realtime connections for many identities on one asyncio loop:
+      - websocket-only, so no long-polling handshake and upgrade round trips
+      - one AsyncClient per identity (the server authenticates per connection),
+        but no threads per identity
+      - `app:direct` events from every identity land on one bounded queue,
+        read with `async for user_id, data in hub.events()`
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        on_log: Optional[Callable[[str], None]] = None,
+        max_pending: int = 10000,
+        connect_timeout: float = 10.0,
+    ) -> None:
+        self._socketio = get_async_socketio_client()
+        self._base_url = base_url
+        self._log = on_log or (lambda _: None)
+        self._connect_timeout = connect_timeout
+        self._clients: Dict[str, Any] = {}
+        self._queue: "asyncio.Queue[Tuple[str, Any]]" = asyncio.Queue(maxsize=max_pending)
+
+    def __len__(self) -> int:
+        return sum(1 for sio in self._clients.values() if sio.connected)
+
+    def is_connected(self, user_id: str) -> bool:
+        sio = self._clients.get(user_id)
+        return sio is not None and sio.connected
+
+    async def add(self, user_id: str, token: str) -> None:
+        """Connect and register `user_id`; re-registers by itself after reconnects."""
+        if user_id in self._clients:
+            return
+        sio = self._socketio.AsyncClient(reconnection=True)
+
+        @sio.event
+        async def connect():  # type: ignore
+            await sio.emit("app:user:register", {"userId": user_id})
+
+        @sio.event
+        async def disconnect():  # type: ignore
+            if user_id in self._clients:  # not one we closed on purpose
+                self._log(f"socket {user_id} disconnected")
+
+        @sio.on("app:direct")
+        async def _on_direct(data):  # type: ignore
+            await self._queue.put((user_id, data))  # backpressure instead of unbounded buffering
+
+        self._clients[user_id] = sio
+        try:
+            await sio.connect(
+                self._base_url,
+                auth={"token": token},
+                headers={"Authorization": f"Bearer {token}"},
+                transports=["websocket"],
+                wait_timeout=self._connect_timeout,
+            )
+        except Exception:
+            self._clients.pop(user_id, None)
+            raise
+
+    async def add_many(self, identities: Sequence[Tuple[str, str]], concurrency: int = 50) -> List[str]:
+        """Connect (user_id, token) pairs with at most `concurrency` handshakes at once; returns the ids that failed."""
+        gate = asyncio.Semaphore(max(1, concurrency))
+        failed: List[str] = []
+
+        async def one(user_id: str, token: str) -> None:
+            async with gate:
+                try:
+                    await self.add(user_id, token)
+                except Exception as e:
+                    self._log(f"socket {user_id} connect failed: {e}")
+                    failed.append(user_id)
+
+        await asyncio.gather(*(one(user_id, token) for user_id, token in identities))
+        return failed
+
+    async def notify_send(self, from_user_id: str, to_user_id: str, payload: object) -> None:
+        sio = self._clients[from_user_id]
+        await sio.emit("app:user:send", {"toUserId": to_user_id, "event": "app:direct", "data": payload})
+
+    async def events(self) -> AsyncIterator[Tuple[str, Any]]:
+        while True:
+            yield await self._queue.get()
+
+    async def remove(self, user_id: str) -> None:
+        sio = self._clients.pop(user_id, None)
+        if sio is not None:
+            try:
+                await sio.disconnect()
+            except Exception:
+                pass
+
+    async def close(self) -> None:
+        await asyncio.gather(*(self.remove(user_id) for user_id in list(self._clients)))
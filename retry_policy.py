@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+import requests
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# (connect, read) seconds per endpoint name; anything else uses RetryPolicy.default_timeout.
+DEFAULT_ENDPOINT_TIMEOUTS: Dict[str, Tuple[float, float]] = {
+    "auth.register": (5.0, 10.0),
+    "auth.challenge": (5.0, 10.0),
+    "auth.verify": (5.0, 10.0),
+    "mailbox.pull": (5.0, 30.0),
+    "group_mailbox.pull": (5.0, 30.0),
+}
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    if isinstance(exc, (requests.Timeout, requests.ConnectionError)):
+        return True
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code in RETRYABLE_STATUS
+    return False
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 3
+    base_backoff: float = 0.25
+    max_backoff: float = 5.0
+    default_timeout: Tuple[float, float] = (5.0, 20.0)
+    endpoint_timeouts: Dict[str, Tuple[float, float]] = field(default_factory=lambda: dict(DEFAULT_ENDPOINT_TIMEOUTS))
+
+    def timeout_for(self, endpoint: str) -> Tuple[float, float]:
+        return self.endpoint_timeouts.get(endpoint, self.default_timeout)
+
+    def override_timeouts(self, connect: Optional[float] = None, read: Optional[float] = None) -> None:
+        """Replace the given component(s) everywhere; the other keeps its per-endpoint value."""
+
+        def merged(timeout: Tuple[float, float]) -> Tuple[float, float]:
+            return (connect or timeout[0], read or timeout[1])
+
+        self.default_timeout = merged(self.default_timeout)
+        self.endpoint_timeouts = {name: merged(t) for name, t in self.endpoint_timeouts.items()}
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given 0-based attempt."""
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Fails fast after `failure_threshold` consecutive failures; after
+    `reset_timeout` seconds a single trial request is let through (half-open)
+    and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_request(self, name: str) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                raise CircuitOpenError(f"circuit open for {name} after {self._failures} consecutive failures")
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
@@ -7,3 +7,9 @@ from pathlib import Path
 PREFIX = b"madelin-auth-v1"
 DEFAULT_CONFIG_PATH = Path(os.environ.get("MADELIN_CONFIG_PATH", Path.home() / ".madelin" / "config.json"))
 DEFAULT_KEY_PATH = Path(os.environ.get("MADELIN_KEY_PATH", Path.home() / ".madelin" / "keys.json"))
+DEFAULT_OUTBOX_DIR = Path(os.environ.get("MADELIN_OUTBOX_DIR", Path.home() / ".madelin" / "outbox"))
+DEFAULT_POOL_SIZE = int(os.environ.get("MADELIN_POOL_SIZE", "16"))
+DEFAULT_AGENT_SOCKET = Path(os.environ.get("MADELIN_AGENT_SOCK", Path.home() / ".madelin" / "agent.sock"))
+DEFAULT_CACHE_DIR = Path(os.environ.get("MADELIN_CACHE_DIR", Path.home() / ".madelin" / "cache"))
+DEFAULT_DOWNLOAD_DIR = Path(os.environ.get("MADELIN_DOWNLOAD_DIR", Path.home() / ".madelin" / "downloads"))
+DEFAULT_STATS_PATH = Path(os.environ.get("MADELIN_STATS_PATH", Path.home() / ".madelin" / "delivery-stats.json"))
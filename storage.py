@@ -4,12 +4,12 @@ import json
 import os
 from dataclasses import asdict
 from pathlib import Path
-from typing import Any, Dict, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
-from nacl.signing import SigningKey
+if TYPE_CHECKING:  # key modules pull in nacl; config/cache/spool helpers must not
+    from nacl.signing import SigningKey
 
-from crypto_utils import derive_user_id, signing_key_from_b64
-from models import KeyMaterial
+    from models import KeyMaterial
 
 
 def ensure_parent_dir(path: Path) -> None:
@@ -23,8 +23,11 @@ def _write_json_secure(path: Path, payload: Dict[str, Any]) -> None:
         json.dump(payload, f, indent=2)
 
 
-def save_config(path: Path, base_url: str) -> None:
-    _write_json_secure(path, {"base_url": base_url})
+def save_config(path: Path, base_url: str, base_urls: Optional[List[str]] = None) -> None:
+    config: Dict[str, Any] = {"base_url": base_url}
+    if base_urls and len(base_urls) > 1:
+        config["base_urls"] = base_urls  # replicas; base_url stays the first for older readers
+    _write_json_secure(path, config)
 
 
 def load_config(path: Path) -> Dict[str, Any]:
@@ -41,7 +44,13 @@ def save_key_material(path: Path, material: KeyMaterial, store_mnemonic: bool =
     _write_json_secure(path, payload)
 
 
+def save_key_index(path: Path, identities: List[Dict[str, str]]) -> None:
+    save_json_atomic(path, {"identities": identities})
+
+
 def load_key_material(path: Path) -> KeyMaterial:
+    from models import KeyMaterial
+
     if not path.exists():
         raise FileNotFoundError(f"key file not found: {path}")
     with path.open("r", encoding="utf-8") as f:
@@ -55,6 +64,8 @@ def load_key_material(path: Path) -> KeyMaterial:
 
 
 def signing_key_from_file(path: Path) -> Tuple[SigningKey, KeyMaterial]:
+    from crypto_utils import derive_user_id, signing_key_from_b64
+
     material = load_key_material(path)
     signing_key = signing_key_from_b64(material.signing_key_b64)
     pk = signing_key.verify_key.encode()
@@ -62,3 +73,28 @@ def signing_key_from_file(path: Path) -> Tuple[SigningKey, KeyMaterial]:
     if derived_user_id != material.user_id:
         raise RuntimeError("Stored key mismatch: derived userId does not match stored userId")
     return signing_key, material
+
+
+def save_json_atomic(path: Path, payload: Dict[str, Any]) -> None:
+    """Write `payload` (0600) next to `path` and rename it into place, so readers never see half a file."""
+    tmp = path.with_suffix(".tmp")
+    _write_json_secure(tmp, payload)
+    os.replace(tmp, path)
+
+
+def load_cache(path: Path) -> Dict[str, Any]:
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def load_spool_entries(directory: Path) -> List[Tuple[Path, Dict[str, Any]]]:
+    if not directory.exists():
+        return []
+    entries = []
+    for path in sorted(directory.glob("*.json")):
+        with path.open("r", encoding="utf-8") as f:
+            entries.append((path, json.load(f)))
+    return entries
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import json
+import socket
+import stat
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, List
+
+import pytest
+from nacl.signing import SigningKey
+
+import main
+from agent import TOKEN_REFRESH_MARGIN, SigningAgent, run_agent
+from agent_client import AgentClient, AgentUnavailable
+from cli import parse_args
+from models import KeyMaterial
+from storage import save_key_material
+
+ROOT = Path(__file__).resolve().parent
+
+
+@pytest.fixture
+def key_file(tmp_path: Path) -> Path:
+    path = tmp_path / "keys.json"
+    save_key_material(path, KeyMaterial.from_signing_key(SigningKey.generate()))
+    return path
+
+
+@pytest.fixture
+def agent_socket(tmp_path: Path) -> Iterator[Path]:
+    """A real agent (run_agent) listening on a socket under tmp_path."""
+    path = tmp_path / "agent.sock"
+    thread = threading.Thread(target=run_agent, args=(path,), daemon=True)
+    thread.start()
+    client = AgentClient(path, timeout=2.0)
+    deadline = time.monotonic() + 5
+    while True:
+        try:
+            client.list()
+            break
+        except AgentUnavailable:
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+    try:
+        yield path
+    finally:
+        client.stop()
+        thread.join(timeout=5)
+
+
+def _logins(fake_server) -> int:
+    return fake_server.state.counters.get("POST /auth/challenge", 0)
+
+
+def test_socket_is_private_and_tokens_are_cached(fake_server, agent_socket: Path, key_file: Path) -> None:
+    assert stat.S_IMODE(agent_socket.stat().st_mode) == 0o600
+    agent = AgentClient(agent_socket)
+    first = agent.login(fake_server.base_url, key_file=key_file)
+    before = _logins(fake_server)
+    again = agent.login(fake_server.base_url, key_file=key_file)
+    assert again["auth"]["accessToken"] == first["auth"]["accessToken"] and _logins(fake_server) == before
+    refreshed = agent.login(fake_server.base_url, key_file=key_file, refresh=True)
+    assert refreshed["auth"]["accessToken"] != first["auth"]["accessToken"] and _logins(fake_server) == before + 1
+    (identity,) = agent.list()
+    assert identity["userId"] == first["keys"]["userId"] and identity["keyFiles"] == [str(key_file)]
+
+
+def test_remove_drops_key_and_tokens(fake_server, agent_socket: Path, key_file: Path) -> None:
+    agent = AgentClient(agent_socket)
+    user_id = agent.login(fake_server.base_url, key_file=key_file)["keys"]["userId"]
+    agent.remove(user_id)
+    assert agent.list() == []
+    before = _logins(fake_server)
+    agent.login(fake_server.base_url, key_file=key_file)
+    assert _logins(fake_server) == before + 1
+
+
+def test_token_renewed_near_expiry(fake_server, key_file: Path) -> None:
+    agent = SigningAgent()
+    first = agent.login(fake_server.base_url, key_file=str(key_file))
+    cache_key = (first["keys"]["userId"], fake_server.base_url)
+    assert agent._tokens[cache_key][1] > time.time() + 3000  # the fake server's JWT exp
+    agent._tokens[cache_key] = (first, time.time() + TOKEN_REFRESH_MARGIN - 1)
+    renewed = agent.login(fake_server.base_url, key_file=str(key_file))
+    assert renewed["auth"]["accessToken"] != first["auth"]["accessToken"]
+
+
+def test_concurrent_logins_for_one_key_share_a_round_trip(fake_server, key_file: Path) -> None:
+    agent = SigningAgent()
+    agent.add(key_file=str(key_file))
+    before = _logins(fake_server)
+    tokens: List[str] = []
+    threads = [
+        threading.Thread(target=lambda: tokens.append(agent.login(fake_server.base_url, key_file=str(key_file))["auth"]["accessToken"]))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(tokens)) == 1 and _logins(fake_server) == before + 1
+
+
+def test_errors_come_back_as_agent_errors(agent_socket: Path) -> None:
+    from agent_client import AgentError
+
+    with pytest.raises(AgentError, match="unknown op"):
+        AgentClient(agent_socket).call("nope")
+
+
+def _args(fake_server, key_file: Path, agent_socket: Path):
+    return parse_args(["login", "--base-url", fake_server.base_url, "--key-file", str(key_file), "--agent-socket", str(agent_socket)])
+
+
+def _silent_listener(path: Path, reply: bytes) -> socket.socket:
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    server.listen(1)
+
+    def serve() -> None:
+        conn, _ = server.accept()
+        with conn:
+            conn.recv(65536)
+            if reply:
+                conn.sendall(reply)
+            time.sleep(1)
+
+    threading.Thread(target=serve, daemon=True).start()
+    return server
+
+
+@pytest.mark.parametrize("reply", [b"", b"not json\n", b"[1]\n"])
+def test_login_falls_back_when_agent_is_broken(fake_server, tmp_path: Path, key_file: Path, reply: bytes, monkeypatch) -> None:
+    path = tmp_path / "agent.sock"
+    monkeypatch.setattr("agent_client.agent_if_running", lambda socket_path: AgentClient(socket_path, timeout=0.3))
+    server = _silent_listener(path, reply)
+    try:
+        out = main._login(_args(fake_server, key_file, path), fake_server.base_url)
+    finally:
+        server.close()
+    assert out["auth"]["accessToken"]
+
+
+def test_login_without_agent(fake_server, tmp_path: Path, key_file: Path) -> None:
+    stale = tmp_path / "stale.sock"
+    stale.touch()  # left behind by a dead agent: connect is refused
+    for path in (tmp_path / "missing.sock", stale):
+        assert main._login(_args(fake_server, key_file, path), fake_server.base_url)["auth"]["accessToken"]
+
+
+def test_agent_login_skips_requests_and_nacl(fake_server, agent_socket: Path, key_file: Path) -> None:
+    AgentClient(agent_socket).login(fake_server.base_url, key_file=key_file)
+    probe = (
+        "import contextlib, io, json, sys, main\n"
+        "with contextlib.redirect_stdout(io.StringIO()):\n"
+        f"    main.main(['login', '--base-url', {fake_server.base_url!r}, '--key-file', {str(key_file)!r},"
+        f" '--agent-socket', {str(agent_socket)!r}])\n"
+        "print(json.dumps(sorted(m for m in ('requests', 'urllib3', 'nacl') if m in sys.modules)))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert json.loads(out.stdout.strip().splitlines()[-1]) == []
+
+
+def test_group_command_relogs_in_through_agent_after_401(fake_server, agent_socket: Path, key_file: Path, monkeypatch) -> None:
+    from benchmarks.fake_server import _make_token
+
+    agent = AgentClient(agent_socket)
+    cached = agent.login(fake_server.base_url, key_file=key_file)
+    args = parse_args(
+        ["group", "list-mine", "--base-url", fake_server.base_url, "--key-file", str(key_file), "--agent-socket", str(agent_socket)]
+    )
+    calls: List[bool] = []
+    real_login = main._login
+
+    def login(args, base_url, refresh=False):
+        calls.append(refresh)
+        out = real_login(args, base_url, refresh=refresh)
+        if not refresh:  # stand-in for a token the server has revoked
+            out = {**out, "auth": {**out["auth"], "accessToken": _make_token(out["keys"]["userId"], -60)}}
+        return out
+
+    monkeypatch.setattr(main, "_login", login)
+    assert main._cmd_group(args)["userId"] == cached["keys"]["userId"]
+    assert calls == [False, True]
+    assert agent.login(fake_server.base_url, key_file=key_file)["auth"]["accessToken"] != cached["auth"]["accessToken"]
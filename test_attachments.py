@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from attachments import MAX_CHUNK_SIZE, AttachmentAssembler, parse_attachment_aad, send_attachment
+from crypto_utils import b64e, decode_aad_meta, encode_aad_meta
+
+
+def _send(path: Path, tmp_path: Path, chunk_size: int = 1024, fail=lambda payload: False) -> List[Dict[str, Any]]:
+    pushed: List[Dict[str, Any]] = []
+
+    def push(payload: Dict[str, Any]) -> None:
+        if fail(payload):
+            raise ConnectionError("boom")
+        pushed.append({**payload, "id": f"m{len(pushed)}", "senderUserId": "alice"})
+
+    send_attachment(path, push, target="bob", ttl_seconds=0, chunk_size=chunk_size, state_dir=tmp_path / "state")
+    return pushed
+
+
+def _file(tmp_path: Path, size: int) -> Path:
+    path = tmp_path / "report.bin"
+    path.write_bytes(random.Random(size).randbytes(size))
+    return path
+
+
+def test_round_trip_in_any_order(tmp_path: Path) -> None:
+    source = _file(tmp_path, 10_000)
+    items = _send(source, tmp_path)
+    assert all(decode_aad_meta(item["aad"]) for item in items)  # base64 JSON, survives --compact
+    random.Random(1).shuffle(items)
+    assembler = AttachmentAssembler(tmp_path / "downloads")
+    plain = {"id": "p1", "aad": "", "ciphertext": b64e(b"hi")}
+    rest, consumed, completed = assembler.absorb(items + [plain])
+    assert rest == [plain]
+    assert sorted(consumed) == sorted(item["id"] for item in items)
+    assert len(completed) == 1 and (tmp_path / "downloads" / "report.bin").read_bytes() == source.read_bytes()
+    assert assembler.pending() == []
+
+
+def test_partial_download_resumes_across_assemblers(tmp_path: Path) -> None:
+    items = _send(_file(tmp_path, 5000), tmp_path)
+    chunks, manifest = items[:-1], items[-1]
+    AttachmentAssembler(tmp_path / "dl").absorb(chunks[:2] + [manifest])
+    assert AttachmentAssembler(tmp_path / "dl").pending()[0]["missing"] == [2, 3, 4]
+    _, _, completed = AttachmentAssembler(tmp_path / "dl").absorb(chunks[2:])
+    assert completed and "path" in completed[0]
+
+
+def test_interrupted_send_resumes_missing_chunks(tmp_path: Path) -> None:
+    source = _file(tmp_path, 4096)
+    first = _send(source, tmp_path, fail=lambda payload: decode_aad_meta(payload["aad"]).get("seq") == 2)
+    assert len(first) == 3  # chunks 0, 1, 3; no manifest yet
+    second = _send(source, tmp_path)
+    assert [decode_aad_meta(item["aad"]).get("seq") for item in second] == [2, None]
+
+
+def test_checksum_mismatch_is_discarded(tmp_path: Path) -> None:
+    items = _send(_file(tmp_path, 3000), tmp_path)
+    items[0]["ciphertext"] = b64e(b"x" * 1024)
+    _, _, completed = AttachmentAssembler(tmp_path / "dl").absorb(items)
+    assert completed[0]["error"] == "checksum mismatch"
+    assert list((tmp_path / "dl").glob("*.bin")) == []
+
+
+def _item(meta: Dict[str, Any], ciphertext: bytes = b"data", raw_aad: bool = False) -> Dict[str, Any]:
+    aad = json.dumps(meta) if raw_aad else encode_aad_meta(meta)
+    return {"id": "bad", "senderUserId": "mallory", "aad": aad, "ciphertext": b64e(ciphertext)}
+
+
+@pytest.mark.parametrize(
+    "item",
+    [
+        _item({"att": "ab"}),
+        _item({"att": "ab"}, raw_aad=True),
+        _item({"att": "ab", "manifest": 1}, ciphertext=b"not json"),
+        _item({"att": "ab", "manifest": 1}, ciphertext=b'{"name": "x"}'),
+        _item({"att": "ab", "seq": "0", "n": 1, "cs": 4}),
+        _item({"att": "ab", "seq": 2**40, "n": 2**41, "cs": MAX_CHUNK_SIZE}),
+        _item({"att": "ab", "seq": 0, "n": 1, "cs": MAX_CHUNK_SIZE + 1}),
+        _item({"att": "ab", "seq": 3, "n": 3, "cs": 4}),
+        _item({"att": "ab", "seq": 0, "n": 1, "cs": 2}),
+        _item({"att": "../../etc", "seq": 0, "n": 1, "cs": 4}),
+        _item({"att": 7, "seq": 0, "n": 1, "cs": 4}),
+    ],
+)
+def test_malformed_items_are_logged_and_acked(tmp_path: Path, item: Dict[str, Any]) -> None:
+    assert parse_attachment_aad(item["aad"]) is not None
+    logs: List[str] = []
+    rest, consumed, completed = AttachmentAssembler(tmp_path / "dl", on_log=logs.append).absorb([item])
+    assert (rest, consumed, completed) == ([], ["bad"], [])
+    assert logs and "dropped" in logs[0]
+    assert sum(p.stat().st_size for p in (tmp_path / "dl").rglob("*") if p.is_file()) < 1024
+
+
+def test_malformed_item_does_not_stop_the_rest_of_the_page(tmp_path: Path) -> None:
+    items = _send(_file(tmp_path, 2000), tmp_path)
+    _, consumed, completed = AttachmentAssembler(tmp_path / "dl").absorb([_item({"att": "ab"})] + items)
+    assert "bad" in consumed and len(completed) == 1
+
+
+def test_sender_rejects_oversized_chunks(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        send_attachment(_file(tmp_path, 10), lambda payload: None, "bob", 0, chunk_size=MAX_CHUNK_SIZE + 1)
+
+
+def test_resume_keeps_the_attachment_id_and_a_new_send_gets_a_fresh_one(tmp_path: Path) -> None:
+    source = _file(tmp_path, 4096)
+    first = _send(source, tmp_path, fail=lambda payload: decode_aad_meta(payload["aad"]).get("seq") == 1)
+    resumed = _send(source, tmp_path)
+    again = _send(source, tmp_path)
+    def att(items: List[Dict[str, Any]]) -> set:
+        return {decode_aad_meta(item["aad"])["att"] for item in items}
+
+    assert att(first) == att(resumed) and att(again) != att(first)
+    assert not {item["messageId"] for item in again} & {item["messageId"] for item in first + resumed}
+
+
+def test_sending_a_file_twice_delivers_it_twice(fake_server, make_user, tmp_path: Path) -> None:
+    from messaging import MailboxClient
+
+    alice, bob = make_user(), make_user()
+    sender = MailboxClient(fake_server.base_url, alice["token"])
+    source = _file(tmp_path, 3000)
+    for _ in range(2):
+        result = send_attachment(source, lambda payload: sender.push(bob["userId"], payload), "bob", 0, chunk_size=1024, state_dir=tmp_path / "state")
+        assert result["failed"] == []
+    items = MailboxClient(fake_server.base_url, bob["token"]).pull(None, 50)["items"]
+    assert len(items) == 8  # 3 chunks + manifest, twice: nothing was deduplicated away
+    _, _, completed = AttachmentAssembler(tmp_path / "dl").absorb(items)
+    assert sorted(Path(info["path"]).name for info in completed) == ["report (1).bin", "report.bin"]
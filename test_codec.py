@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import io
+import json
+from typing import Any, Dict, Iterator, List
+
+import pytest
+import requests
+
+from codec import MSGPACK_TYPE, PayloadCodec, _JsonItemStream
+from crypto_utils import b64e, encode_aad_meta
+
+
+@pytest.fixture
+def msgpack() -> Any:
+    return pytest.importorskip("msgpack")
+
+
+def _response(body: bytes, content_type: str) -> requests.Response:
+    r = requests.Response()
+    r.status_code = 200
+    r._content = body
+    r.headers["Content-Type"] = content_type
+    return r
+
+
+def _item(aad: str) -> dict:
+    return {
+        "messageId": b64e(b"\x01" * 16),
+        "threadId": b64e(b"\x02" * 16),
+        "nonce": b64e(b"\x03" * 16),
+        "ciphertext": b64e(bytes(range(256))),
+        "aad": aad,
+        "ttlSeconds": 60,
+    }
+
+
+def _round_trip(body: Any) -> Any:
+    codec = PayloadCodec(compact=True)
+    codec.mark("h", True)
+    encoded = codec.encode("h", body)
+    assert encoded["headers"]["Content-Type"] == MSGPACK_TYPE
+    return codec.decode(_response(encoded["data"], MSGPACK_TYPE))
+
+
+@pytest.mark.parametrize("aad", ["", encode_aad_meta({"sentAt": 1.5}), '{"att":"ab","seq":0}', "not base64!", "QR=="])
+def test_msgpack_round_trip_keeps_fields(msgpack: Any, aad: str) -> None:
+    item = _item(aad)
+    assert _round_trip(item) == item
+    assert _round_trip({"items": [item], "nextCursor": "c"}) == {"items": [item], "nextCursor": "c"}
+
+
+def test_binary_fields_travel_as_bytes(msgpack: Any) -> None:
+    codec = PayloadCodec(compact=True)
+    codec.mark("h", True)
+    wire = msgpack.unpackb(codec.encode("h", _item("x y"))["data"], raw=False)
+    assert wire["ciphertext"] == bytes(range(256))
+    assert wire["aad"] == "x y"
+
+
+def test_json_until_server_answers_msgpack(msgpack: Any) -> None:
+    codec = PayloadCodec(compact=True)
+    assert codec.encode("h", {"a": 1}) == {"json": {"a": 1}}
+    codec.observe("h", _response(b"", MSGPACK_TYPE))
+    assert codec.uses_msgpack("h")
+    assert PayloadCodec().decode(_response(json.dumps({"a": 1}).encode(), "application/json")) == {"a": 1}
+
+
+def _chunks(body: bytes, size: int) -> List[bytes]:
+    return [body[i : i + size] for i in range(0, len(body), size)]
+
+
+_PAGES = [
+    {"items": [_item(""), _item("x")], "nextCursor": "c1"},
+    {"nextCursor": None, "items": [], "more": False},
+    {"items": [{"text": 'quote " back\\slash \\" tail\\', "nested": {"a": [1, {"b": "}]"}]}}, "é✓𝄞", 3, -1.5e3, True, None]},
+    {"count": 2, "items": [{}, []], "extra": {"items": [1]}},
+    {},
+]
+
+
+@pytest.mark.parametrize("page", _PAGES)
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1 << 16])
+def test_json_stream_matches_json_loads(page: Dict[str, Any], size: int) -> None:
+    body = json.dumps(page, ensure_ascii=False, indent=1 if size == 3 else None).encode()
+    reader = _JsonItemStream(_chunks(body, size))
+    assert list(reader) == page.get("items", [])
+    assert reader.meta == {k: v for k, v in page.items() if k != "items"}
+
+
+def test_json_stream_yields_before_body_is_complete() -> None:
+    seen: List[int] = []
+
+    def chunks() -> Iterator[bytes]:
+        yield b'{"items": [{"n": 1}, '
+        seen.append(len(received))
+        yield b'{"n": 2}]}'
+
+    received: List[Any] = []
+    for item in _JsonItemStream(chunks()):
+        received.append(item)
+    assert received == [{"n": 1}, {"n": 2}] and seen == [1]
+
+
+def test_json_stream_other_field() -> None:
+    reader = _JsonItemStream([b'{"items": [1], "groups": [{"id": "g"}]}'], field="groups")
+    assert list(reader) == [{"id": "g"}] and reader.meta == {"items": [1]}
+
+
+@pytest.mark.parametrize(
+    "body",
+    [b"", b"[1, 2]", b'{"items": [{"a": 1}', b'{"items": [{"a": "unterminated', b'{"items": [1 2]}', b'{"items": [1]'],
+)
+def test_json_stream_rejects_truncated_or_malformed_bodies(body: bytes) -> None:
+    with pytest.raises(ValueError):
+        list(_JsonItemStream(_chunks(body, 4) or [b""]))
+
+
+def test_decode_stream_closes_response() -> None:
+    r = _response(b"", "application/json")
+    r._content = False
+    r.raw = io.BytesIO(json.dumps({"items": [1, 2], "nextCursor": "c"}).encode())
+    closed: List[bool] = []
+    r.close = lambda: closed.append(True)  # type: ignore[method-assign]
+    page = PayloadCodec().decode_stream(r, chunk_size=5)
+    assert list(page) == [1, 2] and page.get("nextCursor") == "c" and page.count == 2 and closed
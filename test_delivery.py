@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from crypto_utils import encode_aad_meta
+from delivery import DeliveryStats, format_summary, load_stats, sent_at
+from messaging import make_plaintext_payload
+from metrics import percentiles_ms
+
+
+def _stamped(age: float, sender: str = "alice") -> Dict[str, Any]:
+    return {"aad": encode_aad_meta({"sentAt": time.time() - age}), "senderUserId": sender}
+
+
+def _sender(item: Dict[str, Any]) -> str:
+    return item["senderUserId"]
+
+
+def test_sent_at_reads_the_stamp_only() -> None:
+    assert abs(sent_at(make_plaintext_payload("hi", 0, stamp=True)) - time.time()) < 5
+    assert sent_at(make_plaintext_payload("hi", 0)) is None
+    assert sent_at({"aad": encode_aad_meta({"sentAt": "yesterday"})}) is None
+    assert sent_at({"aad": "not base64 json"}) is None
+
+
+def test_percentiles_ms_nearest_rank() -> None:
+    assert percentiles_ms([]) == {}
+    samples = [i / 1000 for i in range(100, 0, -1)]  # 1..100 ms, unsorted
+    assert percentiles_ms(samples) == {"p50Ms": 51.0, "p95Ms": 95.0, "p99Ms": 99.0, "maxMs": 100.0}
+    assert percentiles_ms([0.00123456], digits=1) == {"p50Ms": 1.2, "p95Ms": 1.2, "p99Ms": 1.2, "maxMs": 1.2}
+
+
+def test_record_groups_by_kind_peer_and_trigger() -> None:
+    stats = DeliveryStats()
+    items = [_stamped(0.2), _stamped(0.4), _stamped(0.3, "bob"), {"aad": "", "senderUserId": "carol"}]
+    assert stats.record(items, "direct", "poll", _sender) == 3
+    assert stats.record([_stamped(-5)], "direct", "socket", lambda item: None) == 1  # sender clock ahead
+    rows = {(row["peer"], row["trigger"]): row for row in stats.summary()}
+    assert set(rows) == {("alice", "poll"), ("bob", "poll"), ("unknown", "socket")}
+    assert rows[("alice", "poll")]["count"] == 2 and 390 <= rows[("alice", "poll")]["maxMs"] < 1000
+    assert rows[("unknown", "socket")]["maxMs"] == 0.0
+
+
+def test_window_keeps_newest_samples() -> None:
+    stats = DeliveryStats(window=3)
+    for age in (9.0, 8.0, 0.1, 0.1, 0.1):
+        stats.record([_stamped(age)], "direct", "poll", _sender)
+    (row,) = stats.summary()
+    assert row["count"] == 3 and row["maxMs"] < 1000
+
+
+def test_save_merges_with_previous_sessions(tmp_path: Path) -> None:
+    path = tmp_path / "stats" / "delivery-stats.json"
+    first = DeliveryStats()
+    first.record([_stamped(0.1)], "group", "socket", lambda item: "g1")
+    first.save(path)
+    second = DeliveryStats()
+    second.record([_stamped(0.2), _stamped(0.3)], "group", "socket", lambda item: "g1")
+    second.save(path)
+    (row,) = load_stats(path).summary()
+    assert (row["kind"], row["peer"], row["trigger"], row["count"]) == ("group", "g1", "socket", 3)
+    assert load_stats(tmp_path / "missing.json").summary() == []
+
+
+def test_format_summary() -> None:
+    assert "--measure-latency" in format_summary([])[0]
+    stats = DeliveryStats()
+    stats.record([_stamped(0.25)], "direct", "poll", _sender)
+    header, line = format_summary(stats.summary())
+    assert header.split()[:3] == ["kind", "trigger", "count"]
+    assert line.split()[:3] == ["direct", "poll", "1"] and line.endswith("alice")
+
+
+def test_histogram_is_not_labeled_per_peer() -> None:
+    from metrics import DELIVERY_LATENCY
+
+    DeliveryStats().record([_stamped(0.1, "sender-with-unique-id")], "direct", "poll", _sender)
+    assert all("peer" not in series["labels"] for series in DELIVERY_LATENCY.snapshot())
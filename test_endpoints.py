@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import socket
+import time
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+
+from endpoints import EndpointPool, split_base_urls
+from messaging import MailboxClient, make_plaintext_payload
+from transport import Transport
+
+A, B, C = "http://a", "http://b", "http://c"
+
+
+def _pool(latency: Dict[str, Optional[float]], **kwargs: float) -> Tuple[EndpointPool, List[Tuple[str, str]]]:
+    def probe(url: str) -> float:
+        seconds = latency[url]
+        if seconds is None:
+            raise ConnectionError(url)
+        return seconds
+
+    pool = EndpointPool([A, B, C], probe, **kwargs)
+    switches: List[Tuple[str, str]] = []
+    pool.on_switch(lambda old, new: switches.append((old, new)))
+    return pool, switches
+
+
+def test_split_base_urls() -> None:
+    assert split_base_urls(" https://a/, https://b,,https://a ") == ["https://a", "https://b"]
+
+
+def test_requires_a_url() -> None:
+    with pytest.raises(ValueError):
+        EndpointPool([], lambda url: 0.0)
+
+
+def test_rewrite_only_owns_the_logical_base() -> None:
+    pool, _ = _pool({A: 0.1, B: 0.1, C: 0.1})
+    assert pool.owns(A) and pool.owns(A + "/mailbox/pull")
+    assert not pool.owns("http://ab/mailbox") and not pool.owns(B + "/x")
+    assert pool.rewrite(A + "/mailbox/pull?limit=5", B) == B + "/mailbox/pull?limit=5"
+
+
+def test_probe_switches_to_clearly_faster_replica_only() -> None:
+    latency: Dict[str, Optional[float]] = {A: 0.10, B: 0.08, C: None}
+    pool, switches = _pool(latency)
+    pool.probe_all()
+    assert pool.current() == A and switches == []  # 20% faster is inside the switch margin
+    latency[B] = 0.01
+    for _ in range(10):
+        pool.probe_all()
+    assert pool.current() == B and switches == [(A, B)]
+    assert [row["url"] for row in pool.status()] == [B, A, C]
+    assert pool.status()[2]["up"] is False and pool.status()[2]["latencyMs"] is None
+
+
+def test_candidates_put_current_first_and_down_replicas_last() -> None:
+    pool, _ = _pool({A: 0.3, B: 0.1, C: 0.2})
+    pool.probe_all()
+    assert pool.candidates() == [B, C, A]
+    pool.mark_failed(C)
+    assert pool.candidates() == [B, A, C]
+
+
+def test_mark_failed_moves_off_current_and_mark_ok_recovers() -> None:
+    pool, switches = _pool({A: 0.1, B: 0.2, C: 0.3})
+    pool.probe_all()
+    pool.mark_failed(A)
+    assert pool.current() == B and switches == [(A, B)]
+    pool.mark_ok(A)  # A answers again, but B is still up: stay put
+    assert pool.current() == B
+    pool.mark_failed(B)
+    assert pool.current() == C  # probed replicas rank before the unprobed A
+    pool.mark_failed(C)
+    pool.mark_failed(A)
+    assert pool.current() == A  # everything is down: back to configured order
+    pool.mark_ok(C)
+    assert pool.current() == C and switches[-1] == (A, C)
+
+
+def test_maybe_reprobe_runs_once_per_interval() -> None:
+    calls: List[str] = []
+    pool = EndpointPool([A, B], lambda url: calls.append(url) or 0.1, probe_interval=60.0)
+    pool.maybe_reprobe()
+    deadline = time.monotonic() + 5
+    while len(calls) < 2:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    pool.maybe_reprobe()
+    time.sleep(0.05)
+    assert calls == [A, B]
+
+
+def _dead_url() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+def test_transport_fails_over_pushes_and_pulls(fake_server, make_user) -> None:
+    alice, bob = make_user(), make_user()
+    dead = _dead_url()
+    transport = Transport()
+    transport.endpoints = EndpointPool([dead, fake_server.base_url], lambda url: 0.01)  # dead is current, unprobed
+    sender = MailboxClient(dead, alice["token"], transport=transport)
+    sender.push(bob["userId"], make_plaintext_payload("hello", 0))  # connection refused: never sent, so it moves on
+    assert transport.endpoints.current() == fake_server.base_url
+    items = MailboxClient(dead, bob["token"], transport=transport).pull(None, 10)["items"]
+    assert len(items) == 1
+
+
+def test_use_endpoints_skips_unreachable_replica(fake_server) -> None:
+    transport = Transport()
+    logical = transport.use_endpoints([_dead_url(), fake_server.base_url])
+    assert transport.resolve(logical + "/mailbox/pull") == fake_server.base_url + "/mailbox/pull"
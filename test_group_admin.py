@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from group_admin import bulk_group_action, read_id_file
+from group_client import GroupClient
+
+
+def _client(fake_server, user) -> GroupClient:
+    return GroupClient(fake_server.base_url, user["token"])
+
+
+def test_read_id_file(tmp_path: Path) -> None:
+    path = tmp_path / "ids.txt"
+    path.write_text("g1\n\n# comment\ng2  # trailing\ng1\n", encoding="utf-8")
+    assert read_id_file(path) == ["g1", "g2"]
+
+
+def test_bulk_join_reports_each_group(fake_server, make_user) -> None:
+    owner, joiner = make_user(), make_user()
+    admin = _client(fake_server, owner)
+    open_id = admin.create_group("open", None, True)["groupId"]
+    closed_id = admin.create_group("closed", None, False)["groupId"]
+
+    result = bulk_group_action([open_id, "missing", closed_id], _client(fake_server, joiner).join_group, concurrency=3)
+    assert (result["requested"], result["succeeded"], result["failed"]) == (3, 2, 1)
+    assert isinstance(result["seconds"], float)
+    rows = result["items"]
+    assert [row["id"] for row in rows] == [open_id, "missing", closed_id]  # input order, whatever finished first
+    assert rows[0]["ok"] and rows[0]["result"]["status"] == "member"
+    assert rows[2]["ok"] and rows[2]["result"]["status"] == "pending"
+    assert rows[1] == {"id": "missing", "ok": False, "error": rows[1]["error"]} and rows[1]["error"].startswith("HTTP 404")
+
+
+def test_bulk_accept_and_reject_pending(fake_server, make_user) -> None:
+    owner, first, second, outsider = make_user(), make_user(), make_user(), make_user()
+    admin = _client(fake_server, owner)
+    group_id = admin.create_group("closed", None, False)["groupId"]
+    for user in (first, second):
+        _client(fake_server, user).join_group(group_id)
+
+    accepted = bulk_group_action([first["userId"], outsider["userId"]], lambda uid: admin.accept_request(group_id, uid))
+    assert [row["ok"] for row in accepted["items"]] == [True, False]
+    assert "no pending request" in accepted["items"][1]["error"]
+    rejected = bulk_group_action([second["userId"]], lambda uid: admin.reject_request(group_id, uid))
+    assert rejected["succeeded"] == 1
+
+    listing = admin.list_members(group_id)
+    assert first["userId"] in listing["members"] and second["userId"] not in listing["members"]
+    assert listing.get("pending", []) == []
+
+
+def test_bulk_action_with_no_ids() -> None:
+    assert bulk_group_action([], lambda item: item)["items"] == []
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import main
+from crypto_utils import b64e
+from group_client import GroupClient
+from group_directory import GroupDirectory
+
+
+def _gets(server, path: str) -> int:
+    return server.state.counters.get(f"GET {path}", 0)
+
+
+def test_mine_is_cached_and_revalidated(fake_server, make_user, tmp_path: Path) -> None:
+    owner, member = make_user(), make_user()
+    owner_client = GroupClient(fake_server.base_url, owner["token"])
+    created = owner_client.create_group("g", [member["userId"]], True)
+    gid = created.get("groupId") or created.get("id")
+
+    directory = GroupDirectory.for_user(owner_client, owner["userId"], tmp_path)
+    mine = directory.mine()
+    assert [g.get("groupId") or g.get("id") for g in mine["owned"]] == [gid]
+    assert mine["memberOf"] == []
+
+    before = _gets(fake_server, "/groups/mine")
+    assert GroupDirectory.for_user(owner_client, owner["userId"], tmp_path).mine() == mine  # from disk
+    assert _gets(fake_server, "/groups/mine") == before
+
+    member_dir = GroupDirectory.for_user(GroupClient(fake_server.base_url, member["token"]), member["userId"], tmp_path)
+    assert [g.get("groupId") or g.get("id") for g in member_dir.mine()["memberOf"]] == [gid]
+
+    before = _gets(fake_server, "/groups/mine")
+    directory.invalidate()
+    assert directory.mine() == mine
+    assert _gets(fake_server, "/groups/mine") == before + 1
+
+
+def test_group_list_prints_owned_and_member_groups(fake_server, make_user, tmp_path: Path, capsys) -> None:
+    owner, member = make_user(), make_user()
+    created = GroupClient(fake_server.base_url, owner["token"]).create_group("g", [member["userId"]], True)
+    gid = created.get("groupId") or created.get("id")
+    common = ["--base-url", fake_server.base_url, "--cache-dir", str(tmp_path)]
+
+    main.main(["group", "list", *common, "--signing-key-b64", b64e(owner["signingKey"].encode())])
+    assert capsys.readouterr().out == f"\033[32m{gid}\033[0m\n"  # owner in green
+    main.main(["group", "list", *common, "--signing-key-b64", b64e(member["signingKey"].encode())])
+    assert capsys.readouterr().out == f"\033[36m{gid}\033[0m\n"  # member in cyan
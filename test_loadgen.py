@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Dict, List
+
+import pytest
+import requests
+
+from loadgen import _Recorder, _SocketFleet, run_loadgen
+
+
+def test_recorder_counts_latencies_and_errors() -> None:
+    rec = _Recorder()
+    rec.add("sent", 2)
+    rec.add("sent", 1)
+    assert rec.timed("push", lambda: "ok") == "ok"
+
+    def fail() -> None:
+        response = requests.Response()
+        response.status_code = 503
+        raise requests.HTTPError(response=response)
+
+    assert rec.timed("push", fail) is None
+    assert rec.snapshot() == {"sent": 3}
+    push = rec.summary()["push"]
+    assert push["ok"] == 1 and push["errors"] == {"503": 1} and push["errorRate"] == 0.5
+
+
+def test_run_loadgen_against_fake_server(fake_server) -> None:
+    report = run_loadgen(fake_server.base_url, users=3, groups=1, rate=20, duration=1.0, workers=4, drain_interval=0.2)
+    assert report["users"] == 3 and report["groups"] == 1
+    assert report["sent"] > 0
+    assert "push" in report["operations"] or "group_push" in report["operations"]
+
+
+class _Hub:
+    def __init__(self, connected: bool, fail: bool = False) -> None:
+        self.connected = connected
+        self.fail = fail
+        self.sent: List[str] = []
+
+    def is_connected(self, user_id: str) -> bool:
+        return self.connected
+
+    async def notify_send(self, from_user_id: str, to_user_id: str, payload: object) -> None:
+        if self.fail:
+            raise KeyError(from_user_id)
+        self.sent.append(to_user_id)
+
+
+@pytest.mark.parametrize(
+    "hub, expected",
+    [
+        (_Hub(connected=False), {"socketNotifySkipped": 1}),
+        (_Hub(connected=True, fail=True), {"socketNotifyErrors": 1}),
+        (_Hub(connected=True), {}),
+    ],
+)
+def test_socket_notify_skips_offline_senders_and_counts_failures(hub: _Hub, expected: Dict[str, int]) -> None:
+    fleet = _SocketFleet.__new__(_SocketFleet)
+    fleet.rec = _Recorder()
+    fleet.loop = asyncio.new_event_loop()
+    fleet.hub = hub  # type: ignore[assignment]
+    thread = threading.Thread(target=fleet.loop.run_forever, daemon=True)
+    thread.start()
+    fleet.notify("alice", "bob")
+    deadline = time.monotonic() + 5
+    while expected and not fleet.rec.snapshot() or not expected and not hub.sent:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    time.sleep(0.05)  # let a late failure callback land before the counts are compared
+    fleet.loop.call_soon_threadsafe(fleet.loop.stop)
+    thread.join()
+    fleet.loop.close()
+    assert fleet.rec.snapshot() == expected
+    assert hub.sent == (["bob"] if expected == {} else [])
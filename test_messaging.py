@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from crypto_utils import b64d
+from group_client import GroupClient
+from messaging import MailboxClient, drain_pages, make_plaintext_payload
+
+
+def _texts(items) -> list:
+    return [b64d(item["ciphertext"]).decode() for item in items]
+
+
+@pytest.mark.parametrize("batch", [True, False])
+def test_push_many_ordered_keeps_typing_order(fake_server, make_user, batch: bool) -> None:
+    fake_server.batch = batch
+    fake_server.latency = 0.002  # enough for concurrent pushes to overtake each other
+    alice, bob = make_user(), make_user()
+    lines = [f"line {i}" for i in range(20)]
+    MailboxClient(fake_server.base_url, alice["token"]).push_many(
+        [(bob["userId"], make_plaintext_payload(line, 0)) for line in lines], ordered=True
+    )
+    pulled = MailboxClient(fake_server.base_url, bob["token"]).pull(None, 50)
+    assert _texts(pulled["items"]) == lines
+
+
+def test_push_many_unordered_delivers_everything(fake_server, make_user) -> None:
+    fake_server.batch = False
+    alice, bob = make_user(), make_user()
+    lines = [f"line {i}" for i in range(10)]
+    results = MailboxClient(fake_server.base_url, alice["token"]).push_many(
+        [(bob["userId"], make_plaintext_payload(line, 0)) for line in lines]
+    )
+    assert len(results) == 10
+    assert sorted(_texts(MailboxClient(fake_server.base_url, bob["token"]).pull(None, 50)["items"])) == sorted(lines)
+
+
+def test_group_push_many_ordered_without_batch_endpoint(fake_server, make_user) -> None:
+    fake_server.batch = False
+    fake_server.latency = 0.002
+    owner, member = make_user(), make_user()
+    created = GroupClient(fake_server.base_url, owner["token"]).create_group("g", [member["userId"]], True)
+    gid = created.get("groupId") or created.get("id")
+    lines = [f"line {i}" for i in range(15)]
+    GroupClient(fake_server.base_url, owner["token"]).group_push_many(
+        [{**make_plaintext_payload(line, 0), "groupId": gid} for line in lines], ordered=True
+    )
+    pulled = GroupClient(fake_server.base_url, member["token"]).group_pull(gid, None, 50)
+    assert _texts(pulled["items"]) == lines
+
+
+def _pages(count: int, size: int = 3):
+    return {
+        (f"c{n}" if n else None): {
+            "items": [{"id": f"p{n}-{i}", "senderUserId": "alice", "ciphertext": ""} for i in range(size)],
+            "nextCursor": f"c{n + 1}" if n + 1 < count else None,
+        }
+        for n in range(count)
+    }
+
+
+def _slow_pull(pages, log):
+    def pull(cursor):
+        log.append(("pull", cursor))
+        time.sleep(0.01 if cursor is None else 0.001)  # the first page is the slow one
+        return pages[cursor]
+
+    return pull
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_drain_pages_renders_and_acks_in_order(prefetch: bool) -> None:
+    pages = _pages(4)
+    log: list = []
+    rendered: list = []
+
+    def render(items):
+        time.sleep(0.005)  # long enough for the prefetch to finish first
+        rendered.extend(item["id"] for item in items)
+        return [item["id"] for item in items]
+
+    drained = drain_pages(_slow_pull(pages, log), render, [lambda ids: log.append(("ack", ids[0]))], prefetch=prefetch)
+    assert drained == 12
+    assert rendered == [item["id"] for page in pages.values() for item in page["items"]]
+    assert [entry[1] for entry in log if entry[0] == "ack"] == ["p0-0", "p1-0", "p2-0", "p3-0"]
+    assert [entry[1] for entry in log if entry[0] == "pull"] == [None, "c1", "c2", "c3"]
+
+
+def test_drain_pages_acks_only_rendered_pages() -> None:
+    pages = _pages(3)
+    acked: list = []
+
+    def render(items):
+        if items[0]["id"].startswith("p1"):
+            raise RuntimeError("terminal went away")
+        return [item["id"] for item in items]
+
+    with pytest.raises(RuntimeError):
+        drain_pages(_slow_pull(pages, []), render, [acked.extend, acked.extend], prefetch=True)
+    assert acked == ["p0-0", "p0-1", "p0-2"] * 2  # page 1 was prefetched but never acked
+
+    acked.clear()
+    stop = iter([False, True])
+    drained = drain_pages(_slow_pull(pages, []), lambda items: [i["id"] for i in items], [acked.extend], should_stop=lambda: next(stop))
+    assert drained == 3 and acked == ["p0-0", "p0-1", "p0-2"]
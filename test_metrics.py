@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import requests
+
+from metrics import MetricsRegistry, _MetricsHandler, serve_prometheus
+
+
+def _registry() -> MetricsRegistry:
+    registry = MetricsRegistry()
+    requests_total = registry.counter("t_requests_total", "Requests")
+    requests_total.inc(endpoint="pull")
+    requests_total.inc(2, endpoint="pull")
+    requests_total.inc(endpoint='we"ird\\path\n')
+    latency = registry.histogram("t_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, kind="direct")
+    return registry
+
+
+def test_same_name_returns_same_metric() -> None:
+    registry = MetricsRegistry()
+    assert registry.counter("c", "x") is registry.counter("c", "y")
+
+
+def test_render_prometheus() -> None:
+    lines = _registry().render_prometheus().splitlines()
+    assert lines[:2] == ["# HELP t_requests_total Requests", "# TYPE t_requests_total counter"]
+    assert 't_requests_total{endpoint="pull"} 3' in lines
+    assert 't_requests_total{endpoint="we\\"ird\\\\path\\n"} 1' in lines
+    assert "# TYPE t_seconds histogram" in lines
+    assert [line for line in lines if line.startswith("t_seconds")] == [
+        't_seconds_bucket{kind="direct",le="0.1"} 2',  # bounds are inclusive
+        't_seconds_bucket{kind="direct",le="1"} 3',
+        't_seconds_bucket{kind="direct",le="+Inf"} 4',
+        't_seconds_sum{kind="direct"} 3.65',
+        't_seconds_count{kind="direct"} 4',
+    ]
+
+
+def test_snapshot_and_dump_json(tmp_path: Path) -> None:
+    registry = _registry()
+    snapshot = registry.snapshot()
+    assert snapshot["t_requests_total"]["type"] == "counter"
+    assert {"labels": {"endpoint": "pull"}, "value": 3.0} in snapshot["t_requests_total"]["series"]
+    (series,) = snapshot["t_seconds"]["series"]
+    assert series["labels"] == {"kind": "direct"} and series["count"] == 4
+    assert series["buckets"] == {"0.1": 2, "1": 1, "+Inf": 1}  # per bucket, not cumulative
+    path = tmp_path / "out" / "metrics.json"
+    registry.dump_json(path)
+    assert json.loads(path.read_text(encoding="utf-8")) == snapshot
+
+
+def test_serve_prometheus(monkeypatch) -> None:
+    monkeypatch.setattr(_MetricsHandler, "registry", _registry())
+    server = serve_prometheus(0)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        r = requests.get(base + "/metrics", timeout=5)
+        assert r.status_code == 200 and r.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert 't_requests_total{endpoint="pull"} 3' in r.text
+        assert requests.get(base + "/other", timeout=5).status_code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Any, Dict, List
+
+import requests
+
+from outbox import Outbox
+from storage import save_json_atomic
+
+
+def _http_error(status: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status} error", response=response)
+
+
+def _outbox(tmp_path: Path, send, **kwargs: Any) -> Outbox:
+    box = Outbox(tmp_path, send, base_backoff=0.001, max_backoff=0.01, coalesce_window=0, **kwargs)
+    box.start()
+    return box
+
+
+def test_sends_in_order_and_removes_spool_files(tmp_path: Path) -> None:
+    sent: List[str] = []
+    box = _outbox(tmp_path, lambda entry: sent.append(entry["id"]))
+    for i in range(5):
+        box.enqueue({"id": str(i)})
+    assert box.flush(timeout=5)
+    box.stop()
+    assert sent == ["0", "1", "2", "3", "4"]
+    assert list(tmp_path.glob("*.json")) == []
+
+
+def test_retries_retryable_errors_with_same_entry(tmp_path: Path) -> None:
+    calls: List[Dict[str, Any]] = []
+
+    def send(entry: Dict[str, Any]) -> None:
+        calls.append(entry)
+        if len(calls) < 3:
+            raise _http_error(503)
+
+    box = _outbox(tmp_path, send)
+    box.enqueue({"id": "m1"})
+    assert box.flush(timeout=5)
+    box.stop()
+    assert [c["id"] for c in calls] == ["m1", "m1", "m1"]
+
+
+def test_rejected_entry_moves_to_failed(tmp_path: Path) -> None:
+    sent: List[str] = []
+
+    def send(entry: Dict[str, Any]) -> None:
+        if entry["id"] == "bad":
+            raise _http_error(400)
+        sent.append(entry["id"])
+
+    box = _outbox(tmp_path, send)
+    box.enqueue({"id": "bad"})
+    box.enqueue({"id": "good"})
+    assert box.flush(timeout=5)
+    box.stop()
+    assert sent == ["good"]
+    assert len(list((tmp_path / "failed").glob("*.json"))) == 1
+    assert list(tmp_path.glob("*.json")) == []
+
+
+def test_failing_on_sent_does_not_stop_sender(tmp_path: Path) -> None:
+    sent: List[str] = []
+    logs: List[str] = []
+
+    def on_sent(entry: Dict[str, Any]) -> None:
+        raise ValueError("render failed")
+
+    box = _outbox(tmp_path, lambda entry: sent.append(entry["id"]), on_sent=on_sent, on_log=logs.append)
+    box.enqueue({"id": "a"})
+    box.enqueue({"id": "b"})
+    assert box.flush(timeout=5)
+    box.stop()
+    assert sent == ["a", "b"]
+    assert any("on_sent callback failed" in line for line in logs)
+
+
+def test_resumes_spooled_entries(tmp_path: Path) -> None:
+    save_json_atomic(tmp_path / "00000000000000000001-000001.json", {"id": "old"})
+    sent: List[str] = []
+    box = _outbox(tmp_path, lambda entry: sent.append(entry["id"]))
+    box.enqueue({"id": "new"})
+    assert box.flush(timeout=5)
+    box.stop()
+    assert sent == ["old", "new"]
+
+
+def test_rejected_batch_is_resent_one_by_one(tmp_path: Path) -> None:
+    batches: List[List[str]] = []
+    singles: List[str] = []
+    gate = threading.Event()
+
+    def send(entry: Dict[str, Any]) -> None:
+        gate.wait(5)
+        if entry["id"] == "bad":
+            raise _http_error(422)
+        singles.append(entry["id"])
+
+    def send_many(entries: List[Dict[str, Any]]) -> None:
+        batches.append([e["id"] for e in entries])
+        raise _http_error(422)
+
+    box = Outbox(tmp_path, send, send_many=send_many, coalesce_window=0.2, base_backoff=0.001)
+    box.start()
+    for entry_id in ("a", "bad", "c"):
+        box.enqueue({"id": entry_id})
+    gate.set()
+    assert box.flush(timeout=5)
+    box.stop()
+    assert batches == [["a", "bad", "c"]]
+    assert singles == ["a", "c"]
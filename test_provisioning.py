@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from provisioning import bulk_register_flow
+
+
+def _index(key_dir: Path) -> list:
+    return json.loads((key_dir / "index.json").read_text(encoding="utf-8"))["identities"]
+
+
+def test_registers_and_writes_key_files(fake_server, tmp_path: Path) -> None:
+    result = bulk_register_flow(fake_server.base_url, tmp_path, count=3, store_mnemonic=False, processes=1)
+    assert result["registered"] == 3 and result["failed"] == []
+    index = _index(tmp_path)
+    assert [entry["status"] for entry in index] == ["registered"] * 3
+    for entry in index:
+        assert Path(entry["keyFile"]).exists()
+
+
+def test_failed_identities_stay_in_index(fake_server, tmp_path: Path) -> None:
+    fake_server.fail_rate = 1.0
+    result = bulk_register_flow(fake_server.base_url, tmp_path, count=2, store_mnemonic=False, processes=1)
+    assert result["registered"] == 0 and len(result["failed"]) == 2
+    index = _index(tmp_path)
+    assert [entry["status"] for entry in index] == ["failed", "failed"]
+    assert all("error" in entry and "keyFile" not in entry for entry in index)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["index.json"]
+
+
+def test_later_runs_extend_the_index(fake_server, tmp_path: Path) -> None:
+    bulk_register_flow(fake_server.base_url, tmp_path, count=2, store_mnemonic=False, processes=1)
+    first = [entry["userId"] for entry in _index(tmp_path)]
+    bulk_register_flow(fake_server.base_url, tmp_path, count=1, store_mnemonic=False, processes=1)
+    index = _index(tmp_path)
+    assert len(index) == 3 and [entry["userId"] for entry in index[:2]] == first
+    assert len(list(tmp_path.glob("*.json"))) == 4  # three key files plus the index
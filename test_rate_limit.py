@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from rate_limit import RateLimitedError, RateLimiter, TokenBucket, parse_retry_after
+
+
+def test_parse_retry_after() -> None:
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after("soon") is None
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < parse_retry_after(later) <= 30
+
+
+def test_unlimited_until_first_throttle() -> None:
+    bucket = TokenBucket()
+    assert all(bucket.acquire() == 0.0 for _ in range(100))
+    assert bucket.rate is None
+
+
+def test_throttle_halves_observed_rate_once_per_window() -> None:
+    bucket = TokenBucket(min_rate=0.5)
+    for _ in range(40):
+        bucket.acquire()
+    bucket.on_throttled(0.05)
+    assert bucket.rate == 20.0  # 40 sent in the last second, halved
+    for _ in range(5):  # the rest of an in-flight burst coming back 429
+        bucket.on_throttled(0.05)
+    assert bucket.rate == 20.0
+
+
+def test_pause_honours_retry_after() -> None:
+    bucket = TokenBucket(rate=1000.0, burst=5)
+    bucket.on_throttled(0.1)
+    started = time.monotonic()
+    waited = bucket.acquire()
+    assert waited >= 0.09 and time.monotonic() - started >= 0.09
+
+
+def test_success_creeps_back_up() -> None:
+    bucket = TokenBucket(rate=4.0, increase=1.0, max_rate=5.0)
+    bucket.on_success()
+    assert bucket.rate == pytest.approx(4.25)
+    for _ in range(100):
+        bucket.on_success()
+    assert bucket.rate == 5.0
+
+
+def test_rate_paces_requests() -> None:
+    bucket = TokenBucket(rate=50.0, burst=1)
+    started = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - started >= 0.09
+
+
+def test_long_retry_after_fails_fast() -> None:
+    bucket = TokenBucket(max_wait=1.0)
+    bucket.on_throttled(3600)
+    started = time.monotonic()
+    with pytest.raises(RateLimitedError) as info:
+        bucket.acquire("mailbox.push")
+    assert time.monotonic() - started < 0.5
+    assert info.value.seconds > 3500 and "mailbox.push" in str(info.value)
+
+
+def test_limiter_keeps_one_bucket_per_host_and_endpoint() -> None:
+    limiter = RateLimiter(initial_rate=5.0, max_wait=7.0)
+    a = limiter.bucket("h", "push")
+    assert limiter.bucket("h", "push") is a
+    assert limiter.bucket("h", "pull") is not a
+    assert a.rate == 5.0 and a.max_wait == 7.0
+
+
+def test_transport_surfaces_long_throttle(fake_server, make_user) -> None:
+    from messaging import MailboxClient, make_plaintext_payload
+    from transport import Transport
+
+    alice, bob = make_user(), make_user()
+    transport = Transport()
+    transport.limiter.max_wait = 0.5
+    fake_server.rate_limit = 1  # fixed one-second window: the second push is told Retry-After: 1
+    client = MailboxClient(fake_server.base_url, alice["token"], transport=transport)
+    client.push(bob["userId"], make_plaintext_payload("one", 0))
+    with pytest.raises(RateLimitedError):
+        client.push(bob["userId"], make_plaintext_payload("two", 0))
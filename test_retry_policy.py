@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+import requests
+
+from retry_policy import DEFAULT_ENDPOINT_TIMEOUTS, CircuitBreaker, CircuitOpenError, RetryPolicy, is_retryable_error
+from transport import Transport
+
+
+def _open(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        breaker.before_request("x")
+        breaker.record_failure()
+
+
+def test_breaker_opens_after_threshold_and_fails_fast() -> None:
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    _open(breaker)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request("x")
+
+
+def test_breaker_half_open_lets_one_trial_through() -> None:
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.01)
+    _open(breaker)
+    time.sleep(0.02)
+    breaker.before_request("x")  # the trial
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request("x")
+    breaker.record_success()
+    breaker.before_request("x")  # closed again
+
+
+def test_breaker_failed_trial_reopens() -> None:
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    _open(breaker)
+    time.sleep(0.06)
+    breaker.before_request("x")
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request("x")
+
+
+def test_unexpected_error_during_trial_does_not_wedge_breaker(monkeypatch: pytest.MonkeyPatch) -> None:
+    transport = Transport(retry_policy=RetryPolicy(max_attempts=1))
+    url = "http://replica.invalid/mailbox/pull"
+    breaker = transport._breaker(url)
+    breaker.reset_timeout = 0.01
+    _open(breaker)
+    time.sleep(0.02)
+
+    def broken(*args, **kwargs):
+        raise requests.exceptions.ChunkedEncodingError("connection broken mid-body")
+
+    monkeypatch.setattr(transport, "_send", broken)
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        transport.request("GET", url, endpoint="mailbox.pull", idempotent=True)
+    time.sleep(0.02)
+    breaker.before_request("x")  # a new trial is allowed instead of CircuitOpenError forever
+
+
+def test_override_one_timeout_component_keeps_endpoint_defaults() -> None:
+    policy = RetryPolicy()
+    policy.override_timeouts(read=42.0)
+    assert policy.timeout_for("mailbox.pull") == (DEFAULT_ENDPOINT_TIMEOUTS["mailbox.pull"][0], 42.0)
+    assert policy.timeout_for("anything") == (policy.default_timeout[0], 42.0)
+
+    policy = RetryPolicy()
+    policy.override_timeouts(connect=1.5)
+    assert policy.timeout_for("mailbox.pull") == (1.5, DEFAULT_ENDPOINT_TIMEOUTS["mailbox.pull"][1])
+
+    policy = RetryPolicy()
+    policy.override_timeouts()
+    assert policy.endpoint_timeouts == DEFAULT_ENDPOINT_TIMEOUTS
+
+
+def test_retryable_errors() -> None:
+    response = requests.Response()
+    response.status_code = 503
+    assert is_retryable_error(requests.HTTPError(response=response))
+    response.status_code = 400
+    assert not is_retryable_error(requests.HTTPError(response=response))
+    assert is_retryable_error(requests.ConnectTimeout())
+    assert not is_retryable_error(ValueError())
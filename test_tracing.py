@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import cProfile
+import json
+import pstats
+import threading
+from pathlib import Path
+
+import pytest
+
+import tracing
+from tracing import ProfileSession, Tracer
+
+
+def _busy_in_thread() -> int:
+    return sum(i * i for i in range(20000))
+
+
+def test_profile_session_covers_worker_threads(tmp_path: Path) -> None:
+    session = ProfileSession()
+    session.start()
+    results = []
+    worker = threading.Thread(target=lambda: results.append(_busy_in_thread()))
+    worker.start()
+    worker.join(5)
+    session.stop(tmp_path / "out.pstats")
+    assert results, "worker thread died under the profiler"
+    names = {func[2] for func in pstats.Stats(str(tmp_path / "out.pstats")).stats}
+    assert "_busy_in_thread" in names
+
+
+class _OneSlotProfile(cProfile.Profile):
+    """Mimics 3.12+, where a second enabled profiler raises ValueError."""
+
+    active = 0
+
+    def enable(self, *args, **kwargs) -> None:
+        if _OneSlotProfile.active:
+            raise ValueError("Another profiling tool is already active")
+        _OneSlotProfile.active += 1
+        super().enable(*args, **kwargs)
+
+
+def test_worker_thread_survives_when_profiler_slot_is_taken(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setattr(tracing, "_SHARED_PROFILER", False)
+    monkeypatch.setattr(tracing.cProfile, "Profile", _OneSlotProfile)
+    session = ProfileSession()
+    session.start()
+    results = []
+    worker = threading.Thread(target=lambda: results.append(_busy_in_thread()))
+    worker.start()
+    worker.join(5)
+    session.stop(tmp_path / "out.pstats")
+    assert results == [_busy_in_thread()]
+
+
+def test_start_refuses_when_another_profiler_is_active(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(tracing.cProfile, "Profile", _OneSlotProfile)
+    monkeypatch.setattr(_OneSlotProfile, "active", 1)
+    with pytest.raises(RuntimeError, match="--profile unavailable"):
+        ProfileSession().start()
+
+
+def test_tracer_writes_nested_spans(tmp_path: Path) -> None:
+    tracer = Tracer()
+    tracer.enable()
+    with tracer.span("outer"):
+        with tracer.span("inner", "http", attempt=1):
+            pass
+    tracer.write(tmp_path / "trace.json")
+    events = json.loads((tmp_path / "trace.json").read_text())
+    events = events["traceEvents"] if isinstance(events, dict) else events
+    assert {e["name"] for e in events if e.get("ph") == "X"} >= {"outer", "inner"}
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import requests
+
+from api_client import MadelinClient
+from group_client import GroupClient
+from messaging import MailboxClient
+from transport import Transport, get_default_transport
+
+
+def test_clients_share_the_default_transport() -> None:
+    assert MailboxClient("http://x", "t").transport is get_default_transport()
+    assert GroupClient("http://x", "t").transport is get_default_transport()
+    assert MadelinClient("http://x").transport is get_default_transport()
+
+
+def test_legacy_session_argument_is_wrapped() -> None:
+    session = requests.Session()
+    by_keyword = MailboxClient("http://x", "t", session=session)
+    positional = GroupClient("http://x", "t", session)
+    for client in (by_keyword, positional, MadelinClient("http://x", session=session)):
+        assert isinstance(client.transport, Transport)
+        assert client.transport.session is session
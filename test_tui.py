@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from messaging import PALETTE_SIZE
+from tui import _CURSES_COLORS, ChatScreen
+
+
+def _texts(screen: ChatScreen, width: int = 10, rows: int = 3) -> list:
+    return [text for _, text in screen._visible(width, rows)]
+
+
+def test_bottom_view_wraps_long_lines() -> None:
+    screen = ChatScreen("t", "> ")
+    screen.append("first")
+    screen.append("0123456789abcdef")
+    assert _texts(screen) == ["first", "0123456789", "abcdef"]
+
+
+def test_scroll_counts_wrapped_rows() -> None:
+    screen = ChatScreen("t", "> ")
+    for i in range(5):
+        screen.append(f"line{i}")
+    screen.append("0123456789abcdef")  # two rows at width 10
+    _texts(screen)
+    screen._scroll_by(1)
+    assert _texts(screen) == ["line3", "line4", "0123456789"]
+
+
+def test_appending_while_scrolled_keeps_viewport_still() -> None:
+    screen = ChatScreen("t", "> ")
+    for i in range(10):
+        screen.append(f"line{i}")
+    _texts(screen)
+    screen._scroll_by(4)
+    before = _texts(screen)
+    screen.append("a\nb")  # two lines in one call
+    screen.append("x" * 25)  # three wrapped rows
+    assert _texts(screen) == before
+
+
+def test_scroll_is_clamped_at_oldest_row() -> None:
+    screen = ChatScreen("t", "> ")
+    for i in range(4):
+        screen.append(f"line{i}")
+    screen._scroll_by(100)
+    assert _texts(screen) == ["line0", "line1", "line2"]
+    screen._scroll_by(-100)
+    assert _texts(screen) == ["line1", "line2", "line3"]
+
+
+def test_curses_palette_matches_console_palette() -> None:
+    assert len(_CURSES_COLORS) == PALETTE_SIZE
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class Tracer:
+    """
+    Collects nested, timestamped spans per thread and writes them in Chrome
+    trace-event format (load in chrome://tracing or https://ui.perfetto.dev).
+    Disabled tracers cost one attribute check per span.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+
+    def enable(self) -> None:
+        self._origin = time.perf_counter()
+        self.enabled = True
+
+    @contextmanager
+    def span(self, name: str, category: str = "client", **args: Any) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            args["error"] = repr(e)
+            raise
+        finally:
+            end = time.perf_counter()
+            thread = threading.current_thread()
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round((start - self._origin) * 1e6, 3),
+                "dur": round((end - start) * 1e6, 3),
+                "pid": self._pid,
+                "tid": thread.ident,
+                "args": {k: str(v) for k, v in args.items()},
+            }
+            with self._lock:
+                self._events.append(event)
+
+    def write(self, path: Path) -> None:
+        with self._lock:
+            events = list(self._events)
+        names = {t.ident: t.name for t in threading.enumerate()}
+        meta = [
+            {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": names.get(tid, str(tid))}}
+            for tid in {e["tid"] for e in events}
+        ]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"traceEvents": meta + events, "displayTimeUnit": "ms"}), encoding="utf-8")
+
+
+TRACER = Tracer()
+
+
+def span(name: str, category: str = "client", **args: Any):
+    return TRACER.span(name, category, **args)
+
+
+# From 3.12 cProfile sits on sys.monitoring, which is interpreter-wide: one
+# enabled profiler already sees every thread, and enabling a second raises.
+_SHARED_PROFILER = sys.version_info >= (3, 12)
+
+
+class ProfileSession:
+    """cProfile over the main thread and every thread started after `start()`."""
+
+    def __init__(self) -> None:
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._main: Optional[cProfile.Profile] = None
+
+    def _bootstrap_thread(self, frame: Any, event: str, arg: Any) -> None:
+        # Runs once per new thread (before 3.12), then cProfile's own hook replaces it.
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # another profiler owns this thread; never let that kill it
+            sys.setprofile(None)
+            return
+        with self._lock:
+            self._profiles.append(profile)
+
+    def start(self) -> None:
+        self._main = cProfile.Profile()
+        try:
+            self._main.enable()
+        except ValueError as exc:
+            raise RuntimeError(f"--profile unavailable: {exc}") from exc
+        self._profiles.append(self._main)
+        if not _SHARED_PROFILER:
+            threading.setprofile(self._bootstrap_thread)
+
+    def stop(self, path: Path) -> None:
+        if not _SHARED_PROFILER:
+            threading.setprofile(None)  # type: ignore[arg-type]
+        if self._main:
+            self._main.disable()
+        with self._lock:
+            profiles = list(self._profiles)
+        for profile in profiles:
+            profile.disable()
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            try:
+                stats.add(profile)
+            except TypeError:  # thread never produced any samples
+                pass
+        path.parent.mkdir(parents=True, exist_ok=True)
+        stats.dump_stats(str(path))
@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import NewConnectionError
+from urllib3.util.retry import Retry
+
+from codec import PayloadCodec, StreamedPage
+from endpoints import EndpointPool
+from metrics import HTTP_ERRORS, HTTP_LATENCY, HTTP_REQUESTS, HTTP_RETRIES, HTTP_THROTTLED, RATE_LIMIT_WAIT
+from rate_limit import RateLimitedError, RateLimiter, parse_retry_after
+from retry_policy import RETRYABLE_STATUS, CircuitBreaker, CircuitOpenError, RetryPolicy
+from tracing import span
+
+# Status codes meaning "this server doesn't have that endpoint/feature"; callers fall back.
+UNSUPPORTED_STATUS = {404, 405, 501}
+
+
+@dataclass
+class TransportConfig:
+    pool_connections: int = 4  # distinct hosts kept in the pool
+    pool_maxsize: int = 16  # connections kept per host
+    keep_alive: bool = True
+    connect_retries: int = 2  # retries for failed TCP connects only (request never reached the server)
+    compact: bool = False  # offer MessagePack bodies for pull/push
+    rate_limit: Optional[float] = None  # starting requests/s per endpoint; None = unlimited until a 429
+    rate_burst: float = 10.0
+
+
+class _PooledAdapter(HTTPAdapter):
+    def __init__(self, config: TransportConfig) -> None:
+        self._keep_alive = config.keep_alive
+        super().__init__(
+            pool_connections=config.pool_connections,
+            pool_maxsize=config.pool_maxsize,
+            max_retries=Retry(total=None, connect=config.connect_retries, read=0, redirect=0, status=0),
+            pool_block=False,
+        )
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        if self._keep_alive:
+            kwargs["socket_options"] = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        super().init_poolmanager(*args, **kwargs)
+
+
+class Transport:
+    """
+    One pooled `requests.Session` shared by MadelinClient, MailboxClient and
+    GroupClient so auth and data calls reuse warm TCP+TLS connections.
+
+    Every request goes through the same policy: per-endpoint timeouts,
+    jittered retries for idempotent calls only, a per-host circuit breaker,
+    and an adaptive per-endpoint rate limit learned from 429/Retry-After.
+    With `use_endpoints`, requests are routed to the best of several replicas
+    and fail over when one cannot be reached.
+    """
+
+    def __init__(
+        self,
+        config: Optional[TransportConfig] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        session: Optional[requests.Session] = None,
+    ) -> None:
+        """A caller-supplied `session` is used as-is: its adapters and headers are left alone."""
+        self.config = config or TransportConfig()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._breakers_lock = threading.Lock()
+        self.limiter = RateLimiter(self.config.rate_limit, self.config.rate_burst)
+        if session is not None:
+            self.session = session
+        else:
+            self.session = requests.Session()
+            adapter = _PooledAdapter(self.config)
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+            if not self.config.keep_alive:
+                self.session.headers["Connection"] = "close"
+        self.codec = PayloadCodec(compact=self.config.compact)
+        self._unsupported: Set[Tuple[str, str]] = set()  # (host, feature) the server turned down
+        self._fan_out: Optional[ThreadPoolExecutor] = None
+        self._fan_out_lock = threading.Lock()
+        self.endpoints: Optional[EndpointPool] = None
+
+    def supports(self, url: str, feature: str) -> bool:
+        return (urlsplit(url).netloc, feature) not in self._unsupported
+
+    def mark_unsupported(self, url: str, feature: str) -> None:
+        self._unsupported.add((urlsplit(url).netloc, feature))
+
+    def map_concurrent(self, fn: Callable[[Any], Any], items: Iterable[Any]) -> List[Any]:
+        """
+        Run `fn` over `items` with up to one call per pooled connection in
+        flight; results come back in order and the first error is re-raised
+        once every call has finished.
+        """
+        with self._fan_out_lock:
+            if self._fan_out is None:
+                self._fan_out = ThreadPoolExecutor(max_workers=self.config.pool_maxsize, thread_name_prefix="fan-out")
+        futures = [self._fan_out.submit(fn, item) for item in items]
+        errors = [f.exception() for f in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+        return [f.result() for f in futures]
+
+    def use_endpoints(self, urls: List[str]) -> str:
+        """Route requests for `urls[0]` to the fastest reachable of `urls`; returns the URL clients should use."""
+        if self.endpoints is not None and self.endpoints.urls == list(urls):
+            return self.endpoints.logical
+        self.endpoints = EndpointPool(urls, self._probe)
+        self.endpoints.probe_all(self.map_concurrent)
+        return self.endpoints.logical
+
+    def resolve(self, url: str) -> str:
+        """Where `url` currently goes, e.g. for the Socket.IO connection that the transport doesn't carry."""
+        pool = self.endpoints
+        return pool.rewrite(url, pool.current()) if pool is not None and pool.owns(url) else url
+
+    def _probe(self, base_url: str) -> float:
+        """Round trip of a GET on the replica's root; any non-5xx answer counts as healthy."""
+        started = time.perf_counter()
+        r = self.session.get(base_url + "/", timeout=(2.0, 2.0))
+        r.close()
+        if r.status_code >= 500:
+            raise requests.HTTPError(f"probe answered {r.status_code}", response=r)
+        return time.perf_counter() - started
+
+    def _breaker(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).netloc
+        with self._breakers_lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker()
+            return breaker
+
+    def _encode(self, host: str, kwargs: Dict[str, Any], body: Any) -> Dict[str, Any]:
+        headers = dict(kwargs.get("headers") or {})
+        headers["Accept"] = self.codec.accept_header()
+        encoded = self.codec.encode(host, body) if body is not None else {}
+        headers.update(encoded.pop("headers", {}))
+        return {**kwargs, **encoded, "headers": headers}
+
+    def _send(self, method: str, url: str, compact: bool, kwargs: Dict[str, Any]) -> requests.Response:
+        if not compact:
+            return self.session.request(method, url, **kwargs)
+        host = urlsplit(url).netloc
+        body = kwargs.pop("json", None)
+        r = self.session.request(method, url, **self._encode(host, kwargs, body))
+        if r.status_code == 415 and body is not None and self.codec.uses_msgpack(host):
+            self.codec.mark(host, False)  # server rejected MessagePack bodies; fall back to JSON
+            r.close()
+            r = self.session.request(method, url, **self._encode(host, kwargs, body))
+        self.codec.observe(host, r)
+        return r
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        endpoint: str = "",
+        idempotent: bool = False,
+        compact: bool = False,
+        **kwargs: Any,
+    ) -> requests.Response:
+        pool = self.endpoints
+        if pool is None or not pool.owns(url):
+            return self._request(method, url, endpoint, idempotent, compact, **kwargs)
+        pool.maybe_reprobe(self.map_concurrent)
+        error: Optional[BaseException] = None
+        for base in pool.candidates():
+            try:
+                r = self._request(method, pool.rewrite(url, base), endpoint, idempotent, compact, **kwargs)
+            except (requests.ConnectionError, requests.Timeout, CircuitOpenError, RateLimitedError) as e:
+                # Pushes only move on when the request provably never left this client.
+                if not (idempotent or _never_sent(e)):
+                    raise
+                pool.mark_failed(base)
+                error = e
+                continue
+            pool.mark_ok(base)
+            return r
+        assert error is not None
+        raise error
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        endpoint: str = "",
+        idempotent: bool = False,
+        compact: bool = False,
+        **kwargs: Any,
+    ) -> requests.Response:
+        policy = self.retry_policy
+        kwargs.setdefault("timeout", policy.timeout_for(endpoint))
+        breaker = self._breaker(url)
+        label = endpoint or "other"
+        bucket = self.limiter.bucket(urlsplit(url).netloc, label)
+        # A 429 means the server did not act on the request, so even pushes may be resent.
+        attempts = policy.max_attempts
+        for attempt in range(attempts):
+            waited = bucket.acquire(endpoint or url)  # before the breaker, so a refusal can't strand a half-open trial
+            breaker.before_request(endpoint or url)
+            if waited:
+                RATE_LIMIT_WAIT.observe(waited, endpoint=label)
+            last_attempt = attempt == attempts - 1
+            HTTP_REQUESTS.inc(endpoint=label, method=method)
+            started = time.perf_counter()
+            try:
+                with span(f"http {label}", "http", method=method, attempt=attempt):
+                    r = self._send(method, url, compact, dict(kwargs))
+            except (requests.Timeout, requests.ConnectionError) as e:
+                HTTP_LATENCY.observe(time.perf_counter() - started, endpoint=label)
+                HTTP_ERRORS.inc(endpoint=label, status=type(e).__name__)
+                breaker.record_failure()
+                if last_attempt or not idempotent:
+                    raise
+            except Exception as e:
+                # Anything else (broken chunked body, codec error, ...) must still end a half-open trial.
+                HTTP_LATENCY.observe(time.perf_counter() - started, endpoint=label)
+                HTTP_ERRORS.inc(endpoint=label, status=type(e).__name__)
+                breaker.record_failure()
+                raise
+            else:
+                HTTP_LATENCY.observe(time.perf_counter() - started, endpoint=label)
+                if r.status_code >= 400:
+                    HTTP_ERRORS.inc(endpoint=label, status=r.status_code)
+                if r.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if r.status_code == 429:
+                    HTTP_THROTTLED.inc(endpoint=label)
+                    bucket.on_throttled(parse_retry_after(r.headers.get("Retry-After")))
+                    if last_attempt:
+                        return r
+                    r.close()
+                    HTTP_RETRIES.inc(endpoint=label)
+                    continue  # the bucket holds the next attempt back until Retry-After
+                bucket.on_success()
+                if r.status_code not in RETRYABLE_STATUS or last_attempt or not idempotent:
+                    return r
+                r.close()
+            HTTP_RETRIES.inc(endpoint=label)
+            time.sleep(policy.backoff(attempt))
+        raise AssertionError("unreachable")
+
+    def decode(self, r: requests.Response) -> Any:
+        return self.codec.decode(r)
+
+    def decode_stream(self, r: requests.Response, field: str = "items") -> StreamedPage:
+        return self.codec.decode_stream(r, field)
+
+    def close(self) -> None:
+        if self._fan_out is not None:
+            self._fan_out.shutdown(wait=False)
+        self.session.close()
+
+
+def _never_sent(e: BaseException) -> bool:
+    if isinstance(e, (requests.ConnectTimeout, CircuitOpenError, RateLimitedError)):
+        return True
+    reason = getattr(e.args[0], "reason", None) if e.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+_default_transport: Optional[Transport] = None
+_default_lock = threading.Lock()
+
+
+def configure_default_transport(config: TransportConfig, retry_policy: Optional[RetryPolicy] = None) -> Transport:
+    global _default_transport
+    with _default_lock:
+        if _default_transport is not None:
+            _default_transport.close()
+        _default_transport = Transport(config, retry_policy)
+        return _default_transport
+
+
+def get_default_transport() -> Transport:
+    global _default_transport
+    with _default_lock:
+        if _default_transport is None:
+            _default_transport = Transport()
+        return _default_transport
+
+
+def as_transport(value: Union[Transport, requests.Session]) -> Transport:
+    """Clients used to take a bare `requests.Session`; wrap one in a Transport of its own."""
+    return Transport(session=value) if isinstance(value, requests.Session) else value
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional, Tuple
+
+from messaging import PALETTE_SIZE, color_index_for_user
+
+# Same colours, in the same order, as the plain console's ANSI palette.
+_CURSES_COLORS = ("COLOR_GREEN", "COLOR_CYAN", "COLOR_MAGENTA", "COLOR_YELLOW", "COLOR_BLUE")
+
+
+def _wrap(sender: Optional[str], text: str, width: int) -> List[str]:
+    full = f"{sender}> {text}" if sender else text
+    return [full[i : i + width] for i in range(0, len(full), width)] or [""]
+
+
+def get_curses():
+    try:
+        import curses
+    except ImportError as exc:  # pragma: no cover - dependency notice
+        raise RuntimeError("Dependency missing: --ui needs the 'curses' module (on Windows: pip install windows-curses)") from exc
+    return curses
+
+
+class ChatScreen:
+    """
+    Full-screen chat: scrollback above, a status bar, and a private input line.
+
+    Other threads only `append()` to a bounded buffer; the UI thread repaints
+    at most `fps` times a second and only lays out the rows that fit on
+    screen, so bursts of messages cost one repaint instead of one write each.
+    """
+
+    def __init__(self, title: str, prompt: str, scrollback: int = 10000, fps: float = 20.0) -> None:
+        self.title = title
+        self.prompt = prompt
+        self.frame_interval = 1.0 / max(1.0, fps)
+        self._lines: Deque[Tuple[Optional[str], str]] = deque(maxlen=scrollback)
+        self._lock = threading.Lock()
+        self._dirty = True
+        self._scroll = 0  # screen rows (after wrapping) scrolled up from the bottom
+        self._width = 80  # wrap width of the last layout
+        self._input: List[str] = []
+        self.status = ""
+
+    def append(self, text: str, sender: Optional[str] = None) -> None:
+        """Thread-safe; `sender` picks the colour and is shown as `sender> text`."""
+        with self._lock:
+            lines = [(sender, line) for line in text.splitlines() or [""]]
+            self._lines.extend(lines)
+            if self._scroll:
+                # keep the viewport still while reading history
+                self._scroll += sum(len(_wrap(s, t, self._width)) for s, t in lines)
+            self._dirty = True
+
+    def set_status(self, status: str) -> None:
+        with self._lock:
+            self.status = status
+            self._dirty = True
+
+    def run(self, on_submit: Callable[[str], bool]) -> None:
+        """Drive the UI until `on_submit(line)` returns False or the user hits Ctrl-C/Ctrl-D."""
+        curses = get_curses()
+        curses.wrapper(lambda screen: self._loop(curses, screen, on_submit))
+
+    def _loop(self, curses: Any, screen: Any, on_submit: Callable[[str], bool]) -> None:
+        curses.use_default_colors()
+        for i, name in enumerate(_CURSES_COLORS):
+            curses.init_pair(i + 1, getattr(curses, name), -1)
+        screen.keypad(True)
+        screen.timeout(int(self.frame_interval * 1000))
+        last_paint = 0.0
+        while True:
+            try:
+                key = screen.get_wch()
+            except curses.error:
+                key = None  # timeout: nothing typed this frame
+            except KeyboardInterrupt:
+                return
+            if key is not None:
+                if key in ("\x04",):
+                    return
+                if key in ("\n", "\r", curses.KEY_ENTER):
+                    line = "".join(self._input).strip()
+                    self._input.clear()
+                    self._dirty = True
+                    if line and not on_submit(line):
+                        return
+                elif key in ("\x7f", "\b", curses.KEY_BACKSPACE):
+                    if self._input:
+                        self._input.pop()
+                elif key == "\x15":  # Ctrl-U
+                    self._input.clear()
+                elif key == curses.KEY_PPAGE:
+                    self._scroll_by(screen.getmaxyx()[0] - 3)
+                elif key == curses.KEY_NPAGE:
+                    self._scroll_by(-(screen.getmaxyx()[0] - 3))
+                elif key == curses.KEY_END:
+                    self._scroll_by(-self._scroll)
+                elif isinstance(key, str) and key.isprintable():
+                    self._input.append(key)
+                self._dirty = True
+            now = time.monotonic()
+            if self._dirty and now - last_paint >= self.frame_interval:
+                self._paint(curses, screen)
+                last_paint = now
+
+    def _scroll_by(self, rows: int) -> None:
+        with self._lock:
+            self._scroll = max(0, self._scroll + rows)  # the top is clamped at layout time
+            self._dirty = True
+
+    def _visible(self, width: int, rows: int) -> List[Tuple[Optional[str], str]]:
+        """Wrap only as many buffered lines (newest first) as are needed to fill `rows` above the scroll offset."""
+        newest_first: List[Tuple[Optional[str], str]] = []
+        with self._lock:
+            self._width = width
+            index = len(self._lines) - 1
+            while index >= 0 and len(newest_first) < self._scroll + rows:
+                sender, text = self._lines[index]
+                newest_first.extend((sender, part) for part in reversed(_wrap(sender, text, width)))
+                index -= 1
+            self._scroll = min(self._scroll, max(0, len(newest_first) - rows))  # can't scroll past the oldest row
+            page = newest_first[self._scroll : self._scroll + rows]
+            self._dirty = False
+        return page[::-1]
+
+    def _paint(self, curses: Any, screen: Any) -> None:
+        height, width = screen.getmaxyx()
+        if height < 3 or width < 10:
+            return
+        body_rows = height - 2
+        screen.erase()
+        for row, (sender, text) in enumerate(self._visible(width - 1, body_rows)):
+            attr = curses.color_pair(color_index_for_user(sender, PALETTE_SIZE) + 1) if sender else curses.A_DIM
+            screen.addnstr(row, 0, text, width - 1, attr)
+        scrolled = f" [+{self._scroll}]" if self._scroll else ""
+        bar = f" {self.title}{scrolled}  {self.status}".ljust(width - 1)
+        screen.addnstr(body_rows, 0, bar, width - 1, curses.A_REVERSE)
+        typed = "".join(self._input)
+        visible_input = (self.prompt + typed)[-(width - 1) :]
+        screen.addnstr(height - 1, 0, visible_input, width - 1)
+        screen.move(height - 1, min(len(visible_input), width - 1))
+        screen.refresh()